@@ -0,0 +1,105 @@
+"""Partition visits by month and add visit_rollups
+
+Revision ID: 353a00e7d044
+Revises: cc8df2e37523
+Create Date: 2026-10-18 12:40:09.733512
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '353a00e7d044'
+down_revision: Union[str, Sequence[str], None] = 'cc8df2e37523'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('visit_rollups',
+    sa.Column('url_id', sa.Integer(), nullable=False),
+    sa.Column('granularity', sa.String(length=8), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('visit_count', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['url_id'], ['urls.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('url_id', 'granularity', 'bucket_start')
+    )
+
+    # Move the old table and everything with a schema-wide name out of the way
+    op.execute("ALTER TABLE visits RENAME TO visits_legacy")
+    op.execute("ALTER TABLE visits_legacy RENAME CONSTRAINT visits_pkey TO visits_legacy_pkey")
+    op.execute("ALTER SEQUENCE visits_id_seq RENAME TO visits_legacy_id_seq")
+    op.drop_index('ix_visits_url_id', table_name='visits_legacy')
+    op.drop_index(op.f('ix_visits_id'), table_name='visits_legacy')
+
+    op.execute(
+        """
+        CREATE TABLE visits (
+            id BIGSERIAL NOT NULL,
+            url_id INTEGER NOT NULL REFERENCES urls (id),
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+        """
+    )
+    op.create_index('ix_visits_url_id_timestamp', 'visits', ['url_id', 'timestamp'], unique=False)
+    op.execute("CREATE TABLE visits_default PARTITION OF visits DEFAULT")
+
+    # One partition per month from the oldest visit up to MONTHS_AHEAD months from now
+    bind = op.get_bind()
+    oldest = bind.execute(sa.text("SELECT MIN(timestamp) FROM visits_legacy")).scalar() or datetime.now()
+    month = date(oldest.year, oldest.month, 1)
+    last = _add_months(date.today().replace(day=1), MONTHS_AHEAD)
+    while month <= last:
+        next_month = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE visits_y{month.year:04d}m{month.month:02d} PARTITION OF visits "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+        )
+        month = next_month
+
+    # Visits without a timestamp are filed under their URL's creation time
+    op.execute(
+        """
+        INSERT INTO visits (id, url_id, timestamp)
+        SELECT v.id, v.url_id, COALESCE(v.timestamp, u.created_at, now())
+        FROM visits_legacy v JOIN urls u ON u.id = v.url_id
+        """
+    )
+    op.execute("SELECT setval('visits_id_seq', COALESCE((SELECT MAX(id) FROM visits), 0) + 1, false)")
+    op.drop_table('visits_legacy')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE visits RENAME TO visits_partitioned")
+    op.execute("ALTER SEQUENCE visits_id_seq RENAME TO visits_partitioned_id_seq")
+    op.drop_index('ix_visits_url_id_timestamp', table_name='visits_partitioned')
+
+    op.create_table('visits',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('url_id', sa.Integer(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['url_id'], ['urls.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_visits_id'), 'visits', ['id'], unique=False)
+    op.create_index('ix_visits_url_id', 'visits', ['url_id'], unique=False)
+    op.execute("INSERT INTO visits (id, url_id, timestamp) SELECT id, url_id, timestamp FROM visits_partitioned")
+    op.execute("SELECT setval('visits_id_seq', COALESCE((SELECT MAX(id) FROM visits), 0) + 1, false)")
+
+    # Dropping the parent drops every partition; rolled-up history cannot be restored as raw visits
+    op.execute("DROP TABLE visits_partitioned")
+    op.drop_table('visit_rollups')
@@ -0,0 +1,46 @@
+"""Per-URL visit counters
+
+Revision ID: 6fcd3f4f6275
+Revises: d02d21754393
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6fcd3f4f6275'
+down_revision: Union[str, Sequence[str], None] = 'd02d21754393'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('url_stats',
+    sa.Column('url_id', sa.Integer(), nullable=False),
+    sa.Column('visit_count', sa.BigInteger(), nullable=False),
+    sa.Column('last_visit', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['url_id'], ['urls.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('url_id')
+    )
+    op.create_index('ix_url_stats_visit_count', 'url_stats', [sa.text('visit_count DESC')], unique=False)
+
+    # Backfill counters from the visits recorded so far
+    op.execute(
+        """
+        INSERT INTO url_stats (url_id, visit_count, last_visit)
+        SELECT url_id, COUNT(*), MAX(timestamp)
+        FROM visits
+        GROUP BY url_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_url_stats_visit_count', table_name='url_stats')
+    op.drop_table('url_stats')
@@ -0,0 +1,39 @@
+"""Backfill hourly and daily visit_rollups
+
+Revision ID: 7e9c2045c256
+Revises: 353a00e7d044
+Create Date: 2026-10-18 13:52:30.417006
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e9c2045c256'
+down_revision: Union[str, Sequence[str], None] = '353a00e7d044'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # From here on visit_rollups is maintained as visits are written; seed it from the raw visits
+    # still on disk. Daily rows left by retention cover dropped months only, so nothing overlaps.
+    for granularity in ('hour', 'day'):
+        op.execute(
+            f"""
+            INSERT INTO visit_rollups (url_id, granularity, bucket_start, visit_count)
+            SELECT url_id, '{granularity}', date_trunc('{granularity}', timestamp), COUNT(*)
+            FROM visits
+            GROUP BY url_id, date_trunc('{granularity}', timestamp)
+            ON CONFLICT DO NOTHING
+            """
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM visit_rollups WHERE granularity = 'hour'")
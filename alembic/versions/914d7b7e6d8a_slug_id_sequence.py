@@ -0,0 +1,61 @@
+"""Replace slug_sequence row with a native sequence
+
+Revision ID: 914d7b7e6d8a
+Revises: 6fcd3f4f6275
+Create Date: 2026-10-18 10:03:17.502913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '914d7b7e6d8a'
+down_revision: Union[str, Sequence[str], None] = '6fcd3f4f6275'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match app.models.sequence.SLUG_ID_BLOCK_SIZE
+BLOCK_SIZE = 1000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    current_value = bind.execute(sa.text("SELECT COALESCE(MAX(current_value), 0) FROM slug_sequence")).scalar()
+    max_url_id = bind.execute(sa.text("SELECT COALESCE(MAX(id), 0) FROM urls")).scalar()
+
+    # urls.id is now assigned from the same sequence as the slug, so start past both counters
+    start = max(current_value, max_url_id) + 1
+    op.execute(f"CREATE SEQUENCE slug_id_seq START WITH {start} INCREMENT BY {BLOCK_SIZE}")
+
+    op.execute("ALTER TABLE urls ALTER COLUMN id DROP DEFAULT")
+    op.execute("DROP SEQUENCE IF EXISTS urls_id_seq")
+
+    op.drop_index(op.f('ix_slug_sequence_id'), table_name='slug_sequence')
+    op.drop_table('slug_sequence')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table('slug_sequence',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('current_value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_slug_sequence_id'), 'slug_sequence', ['id'], unique=False)
+
+    # Any id up to the end of the last leased block may be in use
+    bind = op.get_bind()
+    last_value, is_called = bind.execute(sa.text("SELECT last_value, is_called FROM slug_id_seq")).one()
+    current_value = last_value + BLOCK_SIZE - 1 if is_called else last_value - 1
+    max_url_id = bind.execute(sa.text("SELECT COALESCE(MAX(id), 0) FROM urls")).scalar()
+    current_value = max(current_value, max_url_id)
+    op.execute(sa.text("INSERT INTO slug_sequence (id, current_value) VALUES (1, :value)").bindparams(value=current_value))
+
+    op.execute(f"CREATE SEQUENCE urls_id_seq OWNED BY urls.id START WITH {current_value + 1}")
+    op.execute("ALTER TABLE urls ALTER COLUMN id SET DEFAULT nextval('urls_id_seq')")
+
+    op.execute("DROP SEQUENCE slug_id_seq")
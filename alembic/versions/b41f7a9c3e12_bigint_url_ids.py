@@ -0,0 +1,40 @@
+"""Widen URL ids to BIGINT
+
+Revision ID: b41f7a9c3e12
+Revises: 7e9c2045c256
+Create Date: 2026-10-18 15:21:44.093182
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41f7a9c3e12'
+down_revision: Union[str, Sequence[str], None] = '7e9c2045c256'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# urls.id and every column referencing it; slug_id_seq is already a bigint sequence
+URL_ID_COLUMNS = [
+    ('urls', 'id'),
+    ('visits', 'url_id'),
+    ('url_stats', 'url_id'),
+    ('visit_rollups', 'url_id'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Each ALTER rewrites its table (visits through every partition) under an ACCESS EXCLUSIVE lock
+    for table, column in URL_ID_COLUMNS:
+        op.alter_column(table, column, type_=sa.BigInteger(), existing_type=sa.Integer(), existing_nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Fails if an id past the INTEGER range has already been handed out
+    for table, column in reversed(URL_ID_COLUMNS):
+        op.alter_column(table, column, type_=sa.Integer(), existing_type=sa.BigInteger(), existing_nullable=False)
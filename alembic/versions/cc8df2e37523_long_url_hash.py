@@ -0,0 +1,71 @@
+"""Dedup urls on a long_url digest
+
+Revision ID: cc8df2e37523
+Revises: 914d7b7e6d8a
+Create Date: 2026-10-18 11:26:54.190377
+
+"""
+import hashlib
+from typing import Sequence, Union
+from urllib.parse import urlsplit, urlunsplit
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cc8df2e37523'
+down_revision: Union[str, Sequence[str], None] = '914d7b7e6d8a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def long_url_digest(long_url: str) -> bytes:
+    """The digest as of this revision: the whole netloc lowercased, userinfo included.
+
+    Copied rather than imported, so later changes to app.utils.url_hash do not alter this migration.
+    """
+    parts = urlsplit(long_url.strip())
+    normalized = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, parts.fragment))
+    return hashlib.sha256(normalized.encode("utf-8")).digest()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('urls', sa.Column('long_url_hash', sa.LargeBinary(length=32), nullable=True))
+
+    # Backfill in id order. When several existing rows normalize to the same URL, the oldest keeps
+    # the digest and the rest stay NULL: their slugs keep working but new requests map to the oldest.
+    bind = op.get_bind()
+    seen: set[bytes] = set()
+    last_id = -1
+    while True:
+        rows = bind.execute(
+            sa.text("SELECT id, long_url FROM urls WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for url_id, long_url in rows:
+            digest = long_url_digest(long_url)
+            if digest not in seen:
+                seen.add(digest)
+                updates.append({"id": url_id, "digest": digest})
+        if updates:
+            bind.execute(sa.text("UPDATE urls SET long_url_hash = :digest WHERE id = :id"), updates)
+        last_id = rows[-1].id
+
+    op.create_index('ux_urls_long_url_hash', 'urls', ['long_url_hash'], unique=True)
+    op.drop_index(op.f('ix_urls_long_url'), table_name='urls')
+    op.drop_index('ix_long_url', table_name='urls')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_long_url', 'urls', ['long_url'], unique=False)
+    op.create_index(op.f('ix_urls_long_url'), 'urls', ['long_url'], unique=False)
+    op.drop_index('ux_urls_long_url_hash', table_name='urls')
+    op.drop_column('urls', 'long_url_hash')
@@ -0,0 +1,70 @@
+"""Rehash long URLs with userinfo, which is no longer lowercased
+
+Revision ID: e5a1c7d93b20
+Revises: b41f7a9c3e12
+Create Date: 2026-10-18 18:02:11.418233
+
+"""
+import hashlib
+from typing import Sequence, Union
+from urllib.parse import urlsplit, urlunsplit
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1c7d93b20'
+down_revision: Union[str, Sequence[str], None] = 'b41f7a9c3e12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def long_url_digest(long_url: str) -> bytes:
+    """The digest as of this revision: only the host and port lowercased, userinfo kept as is.
+
+    Copied rather than imported, so later changes to app.utils.url_hash do not alter this migration.
+    """
+    parts = urlsplit(long_url.strip())
+    userinfo, at, hostport = parts.netloc.rpartition("@")
+    netloc = userinfo + at + hostport.lower()
+    normalized = urlunsplit((parts.scheme.lower(), netloc, parts.path, parts.query, parts.fragment))
+    return hashlib.sha256(normalized.encode("utf-8")).digest()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Only URLs with an '@' can carry userinfo; their digests were computed with it lowercased.
+    # A row whose corrected digest is already taken keeps NULL, like duplicates in the first backfill.
+    bind = op.get_bind()
+    last_id = -1
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, long_url, long_url_hash FROM urls "
+                "WHERE id > :last_id AND long_url LIKE '%@%' ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        for url_id, long_url, old_digest in rows:
+            digest = long_url_digest(long_url)
+            if digest == old_digest:
+                continue
+            taken = bind.execute(
+                sa.text("SELECT 1 FROM urls WHERE long_url_hash = :digest"), {"digest": digest}
+            ).first()
+            bind.execute(
+                sa.text("UPDATE urls SET long_url_hash = :digest WHERE id = :id"),
+                {"id": url_id, "digest": None if taken else digest},
+            )
+        last_id = rows[-1].id
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The corrected digests stay; the old normalization merged URLs that differ only in userinfo case
+    pass
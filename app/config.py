@@ -8,5 +8,118 @@ env_path = Path(__file__).parent.parent / env_file
 load_dotenv(dotenv_path=env_path, override=True)
 
 DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL")
+# Optional streaming replica for reads; when unset every statement goes to the primary
+DATABASE_REPLICA_URL = os.getenv("SQLALCHEMY_REPLICA_DATABASE_URL")
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
\ No newline at end of file
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+
+# Visit ingestion: redirects enqueue visits, a background task flushes them in batches
+VISIT_QUEUE_MAX_SIZE = int(os.getenv("VISIT_QUEUE_MAX_SIZE", 10000))
+VISIT_FLUSH_MAX_ROWS = int(os.getenv("VISIT_FLUSH_MAX_ROWS", 500))
+VISIT_FLUSH_INTERVAL_MS = int(os.getenv("VISIT_FLUSH_INTERVAL_MS", 200))
+VISIT_ENQUEUE_TIMEOUT_MS = int(os.getenv("VISIT_ENQUEUE_TIMEOUT_MS", 50))
+
+# Redis leaderboard reconciliation against url_stats
+LEADERBOARD_RECONCILE_INTERVAL_S = int(os.getenv("LEADERBOARD_RECONCILE_INTERVAL_S", 300))
+LEADERBOARD_RECONCILE_SAMPLE = int(os.getenv("LEADERBOARD_RECONCILE_SAMPLE", 100))
+
+# Per-worker in-process slug cache in front of Redis
+SLUG_L1_MAX_ENTRIES = int(os.getenv("SLUG_L1_MAX_ENTRIES", 10000))
+SLUG_L1_TTL_S = int(os.getenv("SLUG_L1_TTL_S", 60))
+
+# Maximum number of long URLs accepted by POST /shorten/batch
+SHORTEN_BATCH_MAX_URLS = int(os.getenv("SHORTEN_BATCH_MAX_URLS", 1000))
+
+# Monthly visits partitions: how far ahead to create them and how long raw visits are kept (0 = forever)
+VISIT_PARTITION_MONTHS_AHEAD = int(os.getenv("VISIT_PARTITION_MONTHS_AHEAD", 3))
+VISIT_RETENTION_MONTHS = int(os.getenv("VISIT_RETENTION_MONTHS", 13))
+PARTITION_MAINTENANCE_INTERVAL_S = int(os.getenv("PARTITION_MAINTENANCE_INTERVAL_S", 3600))
+
+# /stats/{slug}/timeseries: range limit, and cache TTL of closed days (hourly) or months (daily)
+TIMESERIES_MAX_BUCKETS = int(os.getenv("TIMESERIES_MAX_BUCKETS", 2000))
+TIMESERIES_CLOSED_TTL_S = int(os.getenv("TIMESERIES_CLOSED_TTL_S", 600))
+TIMESERIES_CLOSE_GRACE_S = int(os.getenv("TIMESERIES_CLOSE_GRACE_S", 300))
+
+# report:top_n:* cache: served fresh for the soft TTL, served stale (while one worker refreshes) until the hard TTL
+TOP_N_SOFT_TTL_S = int(os.getenv("TOP_N_SOFT_TTL_S", 30))
+TOP_N_HARD_TTL_S = int(os.getenv("TOP_N_HARD_TTL_S", 3600))
+# Largest `limit` accepted by GET /stats
+TOP_N_MAX_LIMIT = int(os.getenv("TOP_N_MAX_LIMIT", 100))
+
+# Bloom filter of existing slugs (rejects unknown slugs without Redis/DB) and negative cache for known misses
+SLUG_BLOOM_ENABLED = os.getenv("SLUG_BLOOM_ENABLED", "true").lower() == "true"
+SLUG_BLOOM_ERROR_RATE = float(os.getenv("SLUG_BLOOM_ERROR_RATE", 0.01))
+SLUG_BLOOM_MIN_CAPACITY = int(os.getenv("SLUG_BLOOM_MIN_CAPACITY", 100000))
+SLUG_BLOOM_REBUILD_INTERVAL_S = int(os.getenv("SLUG_BLOOM_REBUILD_INTERVAL_S", 3600))
+SLUG_NEGATIVE_CACHE_TTL_S = int(os.getenv("SLUG_NEGATIVE_CACHE_TTL_S", 60))
+
+# Serve GET /{slug} from a raw ASGI middleware in front of FastAPI routing
+FAST_REDIRECT_ENABLED = os.getenv("FAST_REDIRECT_ENABLED", "false").lower() == "true"
+
+# Connection pools, per engine; replica settings default to the primary's
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+DB_POOL_RECYCLE_S = int(os.getenv("DB_POOL_RECYCLE_S", -1))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))
+DB_REPLICA_POOL_SIZE = int(os.getenv("DB_REPLICA_POOL_SIZE", DB_POOL_SIZE))
+DB_REPLICA_MAX_OVERFLOW = int(os.getenv("DB_REPLICA_MAX_OVERFLOW", DB_MAX_OVERFLOW))
+DB_REPLICA_POOL_PRE_PING = os.getenv("DB_REPLICA_POOL_PRE_PING", str(DB_POOL_PRE_PING)).lower() == "true"
+DB_REPLICA_POOL_RECYCLE_S = int(os.getenv("DB_REPLICA_POOL_RECYCLE_S", DB_POOL_RECYCLE_S))
+DB_REPLICA_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_REPLICA_STATEMENT_TIMEOUT_MS", DB_STATEMENT_TIMEOUT_MS))
+
+# Where the visit writer sends batches: "db" inserts them directly, "stream" XADDs them to a Redis
+# Stream that `python -m app.workers.visits` consumes
+VISIT_SINK = os.getenv("VISIT_SINK", "db")
+VISIT_STREAM_BATCH_SIZE = int(os.getenv("VISIT_STREAM_BATCH_SIZE", 1000))
+VISIT_STREAM_BLOCK_MS = int(os.getenv("VISIT_STREAM_BLOCK_MS", 1000))
+VISIT_STREAM_CLAIM_IDLE_MS = int(os.getenv("VISIT_STREAM_CLAIM_IDLE_MS", 60000))
+VISIT_STREAM_MAX_DELIVERIES = int(os.getenv("VISIT_STREAM_MAX_DELIVERIES", 5))
+
+# Local spool for visit batches that cannot be written to Postgres, replayed once it recovers
+VISIT_SPOOL_ENABLED = os.getenv("VISIT_SPOOL_ENABLED", "true").lower() == "true"
+VISIT_SPOOL_DIR = os.getenv("VISIT_SPOOL_DIR", "/tmp/visit-spool")
+VISIT_SPOOL_SEGMENT_BYTES = int(os.getenv("VISIT_SPOOL_SEGMENT_BYTES", 16 * 1024 * 1024))
+VISIT_SPOOL_FSYNC_INTERVAL_MS = int(os.getenv("VISIT_SPOOL_FSYNC_INTERVAL_MS", 100))
+VISIT_SPOOL_REPLAY_BATCH = int(os.getenv("VISIT_SPOOL_REPLAY_BATCH", 5000))
+VISIT_SPOOL_REPLAY_INTERVAL_S = int(os.getenv("VISIT_SPOOL_REPLAY_INTERVAL_S", 5))
+
+# Redis timeouts and the circuit breaker that serves cache misses while Redis is failing
+REDIS_SOCKET_TIMEOUT_MS = int(os.getenv("REDIS_SOCKET_TIMEOUT_MS", 250))
+REDIS_CONNECT_TIMEOUT_MS = int(os.getenv("REDIS_CONNECT_TIMEOUT_MS", 250))
+REDIS_BREAKER_FAILURE_THRESHOLD = int(os.getenv("REDIS_BREAKER_FAILURE_THRESHOLD", 5))
+REDIS_BREAKER_RESET_S = float(os.getenv("REDIS_BREAKER_RESET_S", 5))
+
+# Serialization of cached values: "json" (stdlib) or "orjson" (optional dependency, same format)
+CACHE_CODEC = os.getenv("CACHE_CODEC", "json")
+
+# Cache warming: the CACHE_WARM_TOP_K most visited slugs of the last CACHE_WARM_WINDOW_HOURS are
+# loaded into Redis and L1 at startup (and by `python -m app.workers.cache_warmer`)
+CACHE_WARM_ENABLED = os.getenv("CACHE_WARM_ENABLED", "true").lower() == "true"
+CACHE_WARM_TOP_K = int(os.getenv("CACHE_WARM_TOP_K", 50000))
+CACHE_WARM_WINDOW_HOURS = int(os.getenv("CACHE_WARM_WINDOW_HOURS", 24))
+CACHE_WARM_BATCH_SIZE = int(os.getenv("CACHE_WARM_BATCH_SIZE", 1000))
+CACHE_WARM_RATE_PER_S = int(os.getenv("CACHE_WARM_RATE_PER_S", 20000))
+CACHE_WARM_READY_TIMEOUT_S = int(os.getenv("CACHE_WARM_READY_TIMEOUT_S", 120))
+
+# Required in the X-Admin-Token header of every /admin request except /admin/ready; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Prometheus-format metrics at GET /metrics, per worker process
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Slow-query log: statements over SLOW_QUERY_THRESHOLD_MS are logged and kept in a ring buffer at
+# GET /admin/slow-queries; a sampled fraction is explained (with ANALYZE for plain SELECTs only)
+SLOW_QUERY_LOG_ENABLED = os.getenv("SLOW_QUERY_LOG_ENABLED", "false").lower() == "true"
+SLOW_QUERY_THRESHOLD_MS = int(os.getenv("SLOW_QUERY_THRESHOLD_MS", 200))
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", 100))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 0.1))
+
+# Request profiling: requests to the redirect, shorten and stats routes carrying
+# `X-Profile: <PROFILING_TOKEN>`, or a PROFILING_SAMPLE_RATE fraction of them, are stack-sampled
+# every PROFILING_INTERVAL_MS; collapsed stacks are downloaded from GET /admin/profile
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_INTERVAL_MS = int(os.getenv("PROFILING_INTERVAL_MS", 5))
+PROFILING_MAX_STACKS = int(os.getenv("PROFILING_MAX_STACKS", 10000))
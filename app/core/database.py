@@ -1,14 +1,216 @@
 # app/core/database.py
 
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.orm import declarative_base
-from app.config import DATABASE_URL
+import functools
+import inspect
+import time
+from contextvars import ContextVar
+from sqlalchemy import Select, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.config import (
+    DATABASE_URL,
+    DATABASE_REPLICA_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE_S,
+    DB_STATEMENT_TIMEOUT_MS,
+    DB_REPLICA_POOL_SIZE,
+    DB_REPLICA_MAX_OVERFLOW,
+    DB_REPLICA_POOL_PRE_PING,
+    DB_REPLICA_POOL_RECYCLE_S,
+    DB_REPLICA_STATEMENT_TIMEOUT_MS,
+    SLOW_QUERY_LOG_ENABLED,
+    SLOW_QUERY_THRESHOLD_MS,
+    SLOW_QUERY_BUFFER_SIZE,
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+)
+from app.core.slow_queries import SlowQueryLog
+from app.utils.metrics import Histogram, Gauge, on_collect
 
-engine = create_async_engine(DATABASE_URL, echo=False, future=True)
-async_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds", "Statement execution time by handler function and engine", ("operation", "engine")
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection, including opening one", ("engine",)
+)
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out", ("engine",))
+
+class _TimedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long every checkout waited."""
+
+    role = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.labels(self.role).observe(time.perf_counter() - started)
+
+def _pool_class(role: str) -> type[AsyncAdaptedQueuePool]:
+    # A subclass per engine, so that the label survives pool.recreate()
+    return type(f"TimedPool_{role}", (_TimedPool,), {"role": role})
+
+def _create_engine(
+    role: str,
+    url: str,
+    pool_size: int,
+    max_overflow: int,
+    pool_pre_ping: bool,
+    pool_recycle_s: int,
+    statement_timeout_ms: int,
+) -> AsyncEngine:
+    connect_args = {}
+    if statement_timeout_ms > 0:
+        # asyncpg applies server_settings to every new connection
+        connect_args["server_settings"] = {"statement_timeout": str(statement_timeout_ms)}
+    return create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=pool_pre_ping,
+        pool_recycle=pool_recycle_s,
+        poolclass=_pool_class(role),
+        connect_args=connect_args,
+    )
+
+engine = _create_engine(
+    "primary", DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE_S, DB_STATEMENT_TIMEOUT_MS
+)
+replica_engine = _create_engine(
+    "replica",
+    DATABASE_REPLICA_URL,
+    DB_REPLICA_POOL_SIZE,
+    DB_REPLICA_MAX_OVERFLOW,
+    DB_REPLICA_POOL_PRE_PING,
+    DB_REPLICA_POOL_RECYCLE_S,
+    DB_REPLICA_STATEMENT_TIMEOUT_MS,
+) if DATABASE_REPLICA_URL else None
+
+slow_query_log = SlowQueryLog(
+    SLOW_QUERY_THRESHOLD_MS,
+    SLOW_QUERY_BUFFER_SIZE,
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    engines={"primary": engine, "replica": replica_engine},
+) if SLOW_QUERY_LOG_ENABLED else None
+
+# Session.info flag: route every remaining statement of the session to the primary
+USE_PRIMARY = "use_primary"
+
+class RoutingSession(Session):
+    """Sends plain SELECTs to the replica and everything else to the primary.
+
+    Once a session has written, or run a statement with `execution_options(use_primary=True)`
+    (e.g. a SELECT calling nextval()), its later reads stay on the primary so it sees its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if replica_engine is None or self.info.get(USE_PRIMARY):
+            return engine.sync_engine
+        if (
+            self._flushing
+            or not isinstance(clause, Select)
+            or clause._for_update_arg is not None
+            or clause.get_execution_options().get(USE_PRIMARY)
+        ):
+            self.info[USE_PRIMARY] = True
+            return engine.sync_engine
+        return replica_engine.sync_engine
+
+def stick_to_primary(session: AsyncSession) -> bool:
+    """Send the session's remaining statements to the primary. Returns False if they already go there."""
+    if replica_engine is None or session.info.get(USE_PRIMARY):
+        return False
+    session.info[USE_PRIMARY] = True
+    return True
+
+async_session = async_sessionmaker(
+    engine, expire_on_commit=False, class_=AsyncSession, sync_session_class=RoutingSession
+)
 
 Base = declarative_base()
 
+pool_stats = {"checkouts": 0}
+
+def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats["checkouts"] += 1
+
+# Name of the handler function whose statements are running, see db_operation
+current_operation: ContextVar[str] = ContextVar("db_operation", default="other")
+
+def db_operation(func):
+    """Attribute the statements a handler function runs to its name in `db_query_seconds`.
+
+    For async generators the name stays set in the caller between batches, which only matters if
+    the caller runs other queries while iterating.
+    """
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        async def generator_wrapper(*args, **kwargs):
+            previous = current_operation.get()
+            current_operation.set(func.__name__)
+            try:
+                async for item in func(*args, **kwargs):
+                    yield item
+            finally:
+                current_operation.set(previous)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = current_operation.set(func.__name__)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            current_operation.reset(token)
+    return wrapper
+
+def _time_statements(sync_engine, role: str) -> None:
+    # Engine events run inside SQLAlchemy's greenlet, which shares the calling task's context
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        operation = current_operation.get()
+        DB_QUERY_SECONDS.labels(operation, role).observe(elapsed)
+        if slow_query_log is not None and elapsed * 1000 >= slow_query_log.threshold_ms:
+            slow_query_log.record(operation, role, statement, parameters, executemany, elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def failed(exception_context):
+        if exception_context.connection is not None:
+            stack = exception_context.connection.info.get("query_started")
+            if stack:
+                stack.pop()
+
+for _role, _engine in (("primary", engine), ("replica", replica_engine)):
+    if _engine is not None:
+        event.listen(_engine.sync_engine, "checkout", _count_checkout)
+        _time_statements(_engine.sync_engine, _role)
+
+def _pool_status(pool) -> dict:
+    return {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": pool.overflow()}
+
+@on_collect
+def _export_pool_occupancy() -> None:
+    DB_POOL_CHECKED_OUT.labels("primary").set(engine.pool.checkedout())
+    if replica_engine is not None:
+        DB_POOL_CHECKED_OUT.labels("replica").set(replica_engine.pool.checkedout())
+
+def pool_snapshot() -> dict:
+    """Connection pool occupancy per engine and the number of checkouts since startup."""
+    snapshot = {"checkouts": pool_stats["checkouts"], "primary": _pool_status(engine.pool)}
+    if replica_engine is not None:
+        snapshot["replica"] = _pool_status(replica_engine.pool)
+    return snapshot
+
 # Dependency for FastAPI routes and services
 async def get_db() -> AsyncSession:
     async with async_session() as session:
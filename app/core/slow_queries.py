@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import random
+import re
+from collections import deque
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+MAX_PARAMETERS_LENGTH = 1000
+
+# Only plain reads are re-executed by EXPLAIN ANALYZE. Writes would run again in full and hold their
+# row locks meanwhile, and nextval() and implicit sequence defaults are not undone by a rollback.
+_PLAIN_SELECT = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+_NOT_PLAIN = re.compile(r"\bnextval\s*\(|\bFOR\s+(NO\s+KEY\s+)?(UPDATE|SHARE|KEY\s+SHARE)\b", re.IGNORECASE)
+
+
+def _explain_prefix(statement: str) -> str:
+    if _PLAIN_SELECT.match(statement) and not _NOT_PLAIN.search(statement):
+        return "EXPLAIN (ANALYZE, BUFFERS)"
+    return "EXPLAIN"
+
+
+def _format_parameters(parameters) -> str:
+    text = repr(parameters)
+    if len(text) > MAX_PARAMETERS_LENGTH:
+        return text[:MAX_PARAMETERS_LENGTH] + f"... ({len(text)} chars)"
+    return text
+
+
+class SlowQueryLog:
+    """Keeps the last `size` statements that took at least `threshold_ms`.
+
+    A `explain_sample_rate` fraction of them is explained in the background on a separate
+    connection of the same engine, one at a time, inside a transaction that is rolled back.
+    Plain SELECTs get `EXPLAIN (ANALYZE, BUFFERS)`. Writes, locking reads and statements calling
+    nextval() get a plain `EXPLAIN`, which plans the statement without running it.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: int,
+        size: int,
+        explain_sample_rate: float,
+        engines: dict[str, AsyncEngine | None] | None = None,
+    ):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self._engines = engines or {}
+        self._records: deque = deque(maxlen=size)
+        self._explaining: asyncio.Task | None = None
+        self.recorded = 0
+        self.explained = 0
+        self.explain_failures = 0
+
+    def record(self, operation: str, role: str, statement: str, parameters, executemany: bool, elapsed_s: float) -> None:
+        """Called from the engine's after_cursor_execute event for statements over the threshold."""
+        if statement.startswith("EXPLAIN"):
+            return  # Our own plans
+        entry = {
+            "at": datetime.now().isoformat(),
+            "duration_ms": round(elapsed_s * 1000, 1),
+            "operation": operation,
+            "engine": role,
+            "statement": statement,
+            "parameters": _format_parameters(parameters),
+            "plan": None,
+        }
+        self._records.append(entry)
+        self.recorded += 1
+        logger.warning(
+            f"Slow query in {operation} on {role} ({entry['duration_ms']}ms): {statement} "
+            f"parameters={entry['parameters']}"
+        )
+        engine = self._engines.get(role)
+        if engine is None or executemany or not self._should_explain():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # A sync caller such as an Alembic migration
+        self._explaining = loop.create_task(self._explain(engine, entry, statement, parameters), name="slow-query-explain")
+
+    def _should_explain(self) -> bool:
+        if self._explaining is not None and not self._explaining.done():
+            return False
+        return random.random() < self.explain_sample_rate
+
+    async def _explain(self, engine: AsyncEngine, entry: dict, statement: str, parameters) -> None:
+        explain = _explain_prefix(statement)
+        try:
+            async with engine.connect() as conn:
+                transaction = await conn.begin()
+                try:
+                    result = await conn.exec_driver_sql(f"{explain} {statement}", parameters)
+                    entry["plan"] = "\n".join(row[0] for row in result)
+                finally:
+                    await transaction.rollback()
+        except Exception as e:
+            self.explain_failures += 1
+            entry["plan"] = f"EXPLAIN failed: {e}"
+            logger.warning(f"Could not explain slow query in {entry['operation']}: {e}")
+            return
+        self.explained += 1
+        logger.warning(f"Plan for slow query in {entry['operation']}:\n{entry['plan']}")
+
+    def snapshot(self, limit: int | None = None) -> dict:
+        records = list(reversed(self._records))
+        return {
+            "threshold_ms": self.threshold_ms,
+            "explain_sample_rate": self.explain_sample_rate,
+            "recorded": self.recorded,
+            "explained": self.explained,
+            "explain_failures": self.explain_failures,
+            "records": records[:limit] if limit is not None else records,
+        }
@@ -0,0 +1,117 @@
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+from app.core.database import db_operation
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME_PATTERN = re.compile(r"^visits_y(\d{4})m(\d{2})$")
+DEFAULT_PARTITION = "visits_default"
+
+def partition_name(month_start: date) -> str:
+    """Name of the monthly visits partition starting at `month_start`."""
+    return f"visits_y{month_start.year:04d}m{month_start.month:02d}"
+
+@db_operation
+async def list_visit_partitions(db: AsyncSession) -> list[str]:
+    """Return the names of all monthly partitions attached to visits (the default partition excluded)."""
+    try:
+        result = await db.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'visits'::regclass ORDER BY c.relname"
+        ))
+        return [name for name in result.scalars().all() if PARTITION_NAME_PATTERN.match(name)]
+    except SQLAlchemyError as e:
+        logger.error(f"Error listing visit partitions: {e}")
+        raise RuntimeError("Database error while listing visit partitions")
+
+@db_operation
+async def create_visit_partition(db: AsyncSession, month_start: date, month_end: date) -> None:
+    """Create the visits partition covering [month_start, month_end) if it does not exist yet.
+
+    Postgres refuses to create a partition while the default partition holds rows in its range, so
+    such rows are moved into the new partition with the default partition detached, in one transaction.
+    """
+    name = partition_name(month_start)
+    bounds = {"start": month_start, "end": month_end}
+    create = text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF visits "
+        f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{month_end.isoformat()}')"
+    )
+    try:
+        stranded = (await db.execute(text(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end)"
+        ), bounds)).scalar()
+        if not stranded:
+            await db.execute(create)
+        else:
+            await db.execute(text(f"ALTER TABLE visits DETACH PARTITION {DEFAULT_PARTITION}"))
+            await db.execute(create)
+            moved = await db.execute(text(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end "
+                f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+            ), bounds)
+            await db.execute(text(f"ALTER TABLE visits ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+            logger.info(f"Moved {moved.rowcount} visits from {DEFAULT_PARTITION} into {name}")
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error creating visit partition '{name}': {e}")
+        raise RuntimeError("Database error while creating visit partition")
+
+async def _delete_hourly_rollups(db: AsyncSession, before: date) -> None:
+    await db.execute(
+        text("DELETE FROM visit_rollups WHERE granularity = 'hour' AND bucket_start < :before"), {"before": before}
+    )
+
+@db_operation
+async def rollup_and_drop_partition(db: AsyncSession, name: str, before: date) -> int:
+    """Fold a visits partition into daily visit_rollups, then drop it. Returns the number of rollup rows.
+
+    Hourly visit_rollups older than `before` are deleted in the same transaction.
+    """
+    if not PARTITION_NAME_PATTERN.match(name):
+        raise ValueError(f"Not a monthly visits partition: {name}")
+    try:
+        result = await db.execute(text(
+            "INSERT INTO visit_rollups (url_id, granularity, bucket_start, visit_count) "
+            f"SELECT url_id, 'day', date_trunc('day', timestamp), COUNT(*) FROM {name} "
+            "GROUP BY url_id, date_trunc('day', timestamp) "
+            "ON CONFLICT DO NOTHING"
+        ))
+        await _delete_hourly_rollups(db, before)
+        await db.execute(text(f"ALTER TABLE visits DETACH PARTITION {name}"))
+        await db.execute(text(f"DROP TABLE {name}"))
+        await db.commit()
+        return result.rowcount
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error rolling up visit partition '{name}': {e}")
+        raise RuntimeError("Database error while rolling up visit partition")
+
+@db_operation
+async def rollup_and_purge_default_partition(db: AsyncSession, before: date) -> int:
+    """Fold visits older than `before` in the default partition into daily visit_rollups and delete them,
+    along with hourly visit_rollups older than `before`.
+
+    Returns the number of visits deleted.
+    """
+    try:
+        await db.execute(text(
+            "INSERT INTO visit_rollups (url_id, granularity, bucket_start, visit_count) "
+            f"SELECT url_id, 'day', date_trunc('day', timestamp), COUNT(*) FROM {DEFAULT_PARTITION} "
+            "WHERE timestamp < :before GROUP BY url_id, date_trunc('day', timestamp) "
+            "ON CONFLICT DO NOTHING"
+        ), {"before": before})
+        result = await db.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :before"), {"before": before})
+        await _delete_hourly_rollups(db, before)
+        await db.commit()
+        return result.rowcount
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Error purging expired visits from '{DEFAULT_PARTITION}': {e}")
+        raise RuntimeError("Database error while purging the default visit partition")
@@ -1,49 +1,140 @@
+from datetime import datetime
 from sqlalchemy import select, func, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
+from app.core.database import db_operation
 from app.models.urls import URL
 from app.models.visit import Visit
+from app.models.url_stats import URLVisitStats
+from app.models.visit_rollup import VisitRollup
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def get_stats_for_slug(db: AsyncSession, slug: str):
-    """Return visit stats for a specific slug: total count and most recent visit."""
+def _visits_in_range(since: datetime | None, until: datetime | None):
+    """Aggregate visits within [since, until); the timestamp bounds let Postgres prune partitions."""
+    stmt = (
+        select(
+            URL.slug,
+            URL.long_url,
+            func.count(Visit.id).label('visits'),
+            func.max(Visit.timestamp).label('last_visit')
+        )
+        .join(Visit)
+        .group_by(URL.id)
+    )
+    if since is not None:
+        stmt = stmt.where(Visit.timestamp >= since)
+    if until is not None:
+        stmt = stmt.where(Visit.timestamp < until)
+    return stmt
+
+@db_operation
+async def get_stats_for_slug(
+    db: AsyncSession, slug: str, since: datetime | None = None, until: datetime | None = None
+):
+    """Return visit stats for a specific slug: total count and most recent visit.
+
+    Lifetime stats come from url_stats; a time range is aggregated from the matching visits partitions.
+    """
     try:
-        stmt = (
-            select(
-                URL.slug,
-                URL.long_url,
-                func.count(Visit.id).label('visits'),
-                func.max(Visit.timestamp).label('last_visit')
+        if since is None and until is None:
+            stmt = (
+                select(
+                    URL.slug,
+                    URL.long_url,
+                    URLVisitStats.visit_count.label('visits'),
+                    URLVisitStats.last_visit.label('last_visit')
+                )
+                .join(URLVisitStats, URLVisitStats.url_id == URL.id)
+                .where(URL.slug == slug)
             )
-            .join(Visit)
-            .where(URL.slug == slug)
-            .group_by(URL.id)
-        )
+        else:
+            stmt = _visits_in_range(since, until).where(URL.slug == slug)
         result = await db.execute(stmt)
         return result.first()
     except SQLAlchemyError as e:
         logger.error(f"Error fetching stats for slug '{slug}': {e}")
         raise RuntimeError("Database error while retrieving stats")
 
-async def get_top_urls(db: AsyncSession, limit: int = 10):
-    """Return top visited slugs, ordered by visit count."""
+@db_operation
+async def get_top_urls(
+    db: AsyncSession, limit: int = 10, since: datetime | None = None, until: datetime | None = None
+):
+    """Return top visited slugs, ordered by visit count, optionally within a time range."""
     try:
-        stmt = (
-            select(
-                URL.slug,
-                URL.long_url,
-                func.count(Visit.id).label('visits'),
-                func.max(Visit.timestamp).label('last_visit')
+        if since is None and until is None:
+            stmt = (
+                select(
+                    URL.slug,
+                    URL.long_url,
+                    URLVisitStats.visit_count.label('visits'),
+                    URLVisitStats.last_visit.label('last_visit')
+                )
+                .select_from(URLVisitStats)
+                .join(URL, URL.id == URLVisitStats.url_id)
+                .order_by(URLVisitStats.visit_count.desc())
+                .limit(limit)
             )
-            .join(Visit)
-            .group_by(URL.id)
-            .order_by(desc('visits'))
-            .limit(limit)
-        )
+        else:
+            stmt = _visits_in_range(since, until).order_by(desc('visits')).limit(limit)
         result = await db.execute(stmt)
         return result.all()
     except SQLAlchemyError as e:
         logger.error(f"Error fetching top {limit} URLs: {e}")
         raise RuntimeError("Database error while retrieving top URLs")
+
+def _url_counts_query():
+    return (
+        select(
+            URLVisitStats.url_id,
+            URL.slug,
+            URL.long_url,
+            URLVisitStats.visit_count.label('visits'),
+            URLVisitStats.last_visit.label('last_visit')
+        )
+        .select_from(URLVisitStats)
+        .join(URL, URL.id == URLVisitStats.url_id)
+    )
+
+@db_operation
+async def get_url_counts(db: AsyncSession, limit: int):
+    """Return the top `limit` url_stats rows including url_id, used to check the Redis leaderboard."""
+    try:
+        stmt = _url_counts_query().order_by(URLVisitStats.visit_count.desc()).limit(limit)
+        result = await db.execute(stmt)
+        return result.all()
+    except SQLAlchemyError as e:
+        logger.error(f"Error fetching top {limit} URL counts: {e}")
+        raise RuntimeError("Database error while retrieving URL counts")
+
+@db_operation
+async def stream_url_counts(db: AsyncSession, batch_size: int = 1000):
+    """Yield every url_stats row in batches using a server-side cursor."""
+    try:
+        result = await db.stream(_url_counts_query().execution_options(yield_per=batch_size))
+        async for partition in result.partitions():
+            yield partition
+    except SQLAlchemyError as e:
+        logger.error(f"Error streaming URL counts: {e}")
+        raise RuntimeError("Database error while streaming URL counts")
+
+@db_operation
+async def get_visit_buckets(db: AsyncSession, url_id: int, granularity: str, start: datetime, end: datetime):
+    """Return (bucket_start, visits) rollup rows for one URL in [start, end); empty buckets are absent."""
+    try:
+        stmt = (
+            select(VisitRollup.bucket_start, VisitRollup.visit_count.label('visits'))
+            .where(
+                VisitRollup.url_id == url_id,
+                VisitRollup.granularity == granularity,
+                VisitRollup.bucket_start >= start,
+                VisitRollup.bucket_start < end,
+            )
+            .order_by(VisitRollup.bucket_start)
+        )
+        result = await db.execute(stmt)
+        return result.all()
+    except SQLAlchemyError as e:
+        logger.error(f"Error fetching {granularity} buckets for url_id '{url_id}': {e}")
+        raise RuntimeError("Database error while retrieving visit buckets")
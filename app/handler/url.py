@@ -1,13 +1,29 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, func, any_, bindparam, LargeBinary
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError
+from app.core.database import db_operation
 from app.models.urls import URL
 from app.models.visit import Visit
-from app.models.sequence import SlugSequence
+from app.models.url_stats import URLVisitStats
+from app.models.visit_rollup import VisitRollup
+from app.models.sequence import slug_id_seq
+from app.utils.url_hash import long_url_digest
+from app.utils.time_buckets import GRANULARITIES, bucket_start
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Postgres caps a statement at 32767 bind parameters; multi-row inserts are split to stay under it
+MAX_BIND_PARAMS = 32767
+
+def _chunks(rows: list, params_per_row: int) -> list[list]:
+    size = MAX_BIND_PARAMS // params_per_row
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+@db_operation
 async def get_url_by_slug(db: AsyncSession, slug: str) -> URL | None:
     """Retrieve a URL object by its slug."""
     try:
@@ -17,65 +33,226 @@ async def get_url_by_slug(db: AsyncSession, slug: str) -> URL | None:
         logger.error(f"Error fetching slug '{slug}': {e}")
         raise RuntimeError("Database error while fetching slug")
 
+@db_operation
+async def get_url_by_id_and_slug(db: AsyncSession, url_id: int, slug: str) -> URL | None:
+    """Primary-key lookup for a decoded slug; the slug check guards against ids shared by two slugs."""
+    try:
+        result = await db.execute(select(URL).where(URL.id == url_id, URL.slug == slug))
+        return result.scalar_one_or_none()
+    except SQLAlchemyError as e:
+        logger.error(f"Error fetching url by id {url_id}: {e}")
+        raise RuntimeError("Database error while fetching URL by id")
+
+@db_operation
+async def count_urls(db: AsyncSession) -> int:
+    """Return the number of stored URLs."""
+    try:
+        result = await db.execute(select(func.count()).select_from(URL).execution_options(use_primary=True))
+        return result.scalar_one()
+    except SQLAlchemyError as e:
+        logger.error(f"Error counting urls: {e}")
+        raise RuntimeError("Database error while counting URLs")
+
+@db_operation
+async def stream_slugs(db: AsyncSession, batch_size: int = 10000):
+    """Yield every stored slug in batches using a server-side cursor."""
+    try:
+        # Read from the primary: a lagging replica would leave recent slugs out of the Bloom filter
+        result = await db.stream_scalars(select(URL.slug).execution_options(yield_per=batch_size, use_primary=True))
+        async for partition in result.partitions():
+            yield partition
+    except SQLAlchemyError as e:
+        logger.error(f"Error streaming slugs: {e}")
+        raise RuntimeError("Database error while streaming slugs")
+
+@db_operation
+async def stream_hot_urls(db: AsyncSession, since: datetime, limit: int, batch_size: int = 1000):
+    """Yield (id, slug, long_url) rows of the `limit` most visited URLs since `since`, busiest first,
+    in batches using a server-side cursor. Visits are counted from the hourly rollups."""
+    try:
+        hot = (
+            select(VisitRollup.url_id, func.sum(VisitRollup.visit_count).label("visits"))
+            .where(VisitRollup.granularity == "hour", VisitRollup.bucket_start >= bucket_start(since, "hour"))
+            .group_by(VisitRollup.url_id)
+            .order_by(func.sum(VisitRollup.visit_count).desc())
+            .limit(limit)
+            .subquery()
+        )
+        stmt = (
+            select(URL.id, URL.slug, URL.long_url)
+            .join(hot, hot.c.url_id == URL.id)
+            .order_by(hot.c.visits.desc())
+            .execution_options(yield_per=batch_size)
+        )
+        result = await db.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+    except SQLAlchemyError as e:
+        logger.error(f"Error streaming hot urls: {e}")
+        raise RuntimeError("Database error while streaming hot URLs")
+
+@db_operation
+async def get_urls_by_ids(db: AsyncSession, url_ids: list[int]) -> list[URL]:
+    """Retrieve the URL objects for a set of ids in one query."""
+    try:
+        result = await db.execute(select(URL).where(URL.id.in_(url_ids)))
+        return list(result.scalars().all())
+    except SQLAlchemyError as e:
+        logger.error(f"Error fetching urls by id: {e}")
+        raise RuntimeError("Database error while fetching URLs")
+
+@db_operation
 async def get_url_by_long_url(db: AsyncSession, long_url: str) -> URL | None:
-    """Retrieve a URL object by its original long URL."""
+    """Retrieve a URL object by its original long URL, using the unique digest index."""
     try:
-        result = await db.execute(select(URL).where(URL.long_url == long_url))
+        result = await db.execute(select(URL).where(URL.long_url_hash == long_url_digest(long_url)))
         return result.scalar_one_or_none()
     except SQLAlchemyError as e:
         logger.error(f"Error fetching long_url '{long_url}': {e}")
         raise RuntimeError("Database error while fetching long URL")
 
-async def create_url(db: AsyncSession, slug: str, long_url: str) -> URL:
-    """Create a new URL object."""
+@db_operation
+async def get_urls_by_long_urls(db: AsyncSession, long_urls: list[str]) -> list[URL]:
+    """Retrieve the URL objects for many long URLs with a single `long_url_hash = ANY(...)` query."""
+    try:
+        param = bindparam("digests", [long_url_digest(u) for u in long_urls], type_=ARRAY(LargeBinary))
+        result = await db.execute(select(URL).where(URL.long_url_hash == any_(param)))
+        return list(result.scalars().all())
+    except SQLAlchemyError as e:
+        logger.error(f"Error fetching {len(long_urls)} long URLs: {e}")
+        raise RuntimeError("Database error while fetching long URLs")
+
+@db_operation
+async def create_url(db: AsyncSession, url_id: int, slug: str, long_url: str) -> URL:
+    """Create a URL with a pre-allocated id, or return the row a concurrent request already created.
+
+    Uses INSERT ... ON CONFLICT (long_url_hash) DO NOTHING, so two racing requests for the same
+    long URL end up with the same row instead of a duplicate.
+    """
+    digest = long_url_digest(long_url)
     try:
-        db_url = URL(slug=slug, long_url=long_url)
-        db.add(db_url)
+        stmt = (
+            pg_insert(URL)
+            .values(id=url_id, slug=slug, long_url=long_url, long_url_hash=digest)
+            .on_conflict_do_nothing(index_elements=[URL.long_url_hash])
+            .returning(URL)
+        )
+        db_url = (await db.scalars(stmt)).one_or_none()
+        if db_url is None:
+            db_url = (await db.execute(select(URL).where(URL.long_url_hash == digest))).scalar_one()
         await db.commit()
-        await db.refresh(db_url)
         return db_url
     except SQLAlchemyError as e:
         await db.rollback()
         logger.error(f"Error creating URL for slug '{slug}': {e}")
         raise RuntimeError("Database error while creating URL")
 
-async def create_visit(db: AsyncSession, url_id: int) -> Visit:
-    """Create a visit record for a given URL."""
+@db_operation
+async def bulk_create_urls(db: AsyncSession, urls: list[tuple[int, str, str]]) -> list[URL]:
+    """Insert (id, slug, long_url) rows in one INSERT ... ON CONFLICT DO NOTHING RETURNING.
+
+    Rows that lost a race to a concurrent insert are replaced by the existing row for that long URL.
+    """
+    if not urls:
+        return []
     try:
-        visit = Visit(url_id=url_id)
-        db.add(visit)
+        rows = [
+            {"id": url_id, "slug": slug, "long_url": long_url, "long_url_hash": long_url_digest(long_url)}
+            for url_id, slug, long_url in urls
+        ]
+        stmt = (
+            pg_insert(URL)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[URL.long_url_hash])
+            .returning(URL)
+        )
+        created = list((await db.scalars(stmt)).all())
+        if len(created) < len(rows):
+            inserted = {url.long_url_hash for url in created}
+            lost = [row["long_url_hash"] for row in rows if row["long_url_hash"] not in inserted]
+            param = bindparam("digests", lost, type_=ARRAY(LargeBinary))
+            created.extend((await db.execute(select(URL).where(URL.long_url_hash == any_(param)))).scalars().all())
         await db.commit()
-        return visit
+        return created
     except SQLAlchemyError as e:
         await db.rollback()
-        logger.error(f"Error logging visit for url_id '{url_id}': {e}")
-        raise RuntimeError("Database error while creating visit")
+        logger.error(f"Error creating batch of {len(urls)} URLs: {e}")
+        raise RuntimeError("Database error while creating URLs")
 
-async def get_slug_sequence(db: AsyncSession, lock: bool = False) -> SlugSequence | None:
-    """Fetch the current slug sequence, with optional row locking."""
-    try:
-        stmt = select(SlugSequence)
-        if lock:
-            stmt = stmt.with_for_update()
-        result = await db.execute(stmt)
-        return result.scalar_one_or_none()
-    except SQLAlchemyError as e:
-        logger.error(f"Error fetching slug sequence: {e}")
-        raise RuntimeError("Database error while fetching slug sequence")
+async def _increment_url_stats(db: AsyncSession, visits: list[tuple[int, datetime]]) -> None:
+    """Fold a batch of visits into url_stats within the caller's transaction."""
+    totals: dict[int, list] = {}
+    for url_id, ts in visits:
+        entry = totals.setdefault(url_id, [0, ts])
+        entry[0] += 1
+        if ts > entry[1]:
+            entry[1] = ts
+    # Sorted so concurrent flushes lock url_stats rows in the same order
+    rows = [
+        {"url_id": url_id, "visit_count": count, "last_visit": last}
+        for url_id, (count, last) in sorted(totals.items())
+    ]
+    for chunk in _chunks(rows, 3):
+        stmt = pg_insert(URLVisitStats).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[URLVisitStats.url_id],
+            set_={
+                "visit_count": URLVisitStats.visit_count + stmt.excluded.visit_count,
+                "last_visit": func.greatest(URLVisitStats.last_visit, stmt.excluded.last_visit),
+            },
+        )
+        await db.execute(stmt)
 
-async def set_slug_sequence(db: AsyncSession, value: int) -> SlugSequence:
-    """Update or initialize the slug sequence counter."""
+async def _increment_visit_rollups(db: AsyncSession, visits: list[tuple[int, datetime]]) -> None:
+    """Fold a batch of visits into the hourly and daily visit_rollups within the caller's transaction."""
+    totals: dict[tuple[int, str, datetime], int] = {}
+    for url_id, ts in visits:
+        for granularity in GRANULARITIES:
+            key = (url_id, granularity, bucket_start(ts, granularity))
+            totals[key] = totals.get(key, 0) + 1
+    rows = [
+        {"url_id": url_id, "granularity": granularity, "bucket_start": start, "visit_count": count}
+        for (url_id, granularity, start), count in sorted(totals.items())
+    ]
+    for chunk in _chunks(rows, 4):
+        stmt = pg_insert(VisitRollup).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[VisitRollup.url_id, VisitRollup.granularity, VisitRollup.bucket_start],
+            set_={"visit_count": VisitRollup.visit_count + stmt.excluded.visit_count},
+        )
+        await db.execute(stmt)
+
+@db_operation
+async def bulk_create_visits(db: AsyncSession, visits: list[tuple[int, datetime]]) -> int:
+    """Insert a batch of (url_id, timestamp) visits and bump url_stats and visit_rollups in one commit."""
+    if not visits:
+        return 0
     try:
-        result = await db.execute(select(SlugSequence))
-        record = result.scalar_one_or_none()
-        if record:
-            record.current_value = value
-        else:
-            record = SlugSequence(current_value=value)
-            db.add(record)
+        for chunk in _chunks([{"url_id": url_id, "timestamp": ts} for url_id, ts in visits], 2):
+            await db.execute(insert(Visit).values(chunk))
+        await _increment_url_stats(db, visits)
+        await _increment_visit_rollups(db, visits)
         await db.commit()
-        return record
+        return len(visits)
     except SQLAlchemyError as e:
         await db.rollback()
-        logger.error(f"Error setting slug sequence to {value}: {e}")
-        raise RuntimeError
+        logger.error(f"Error logging batch of {len(visits)} visits: {e}")
+        raise RuntimeError("Database error while creating visits")
+
+@db_operation
+async def lease_id_blocks(db: AsyncSession, count: int = 1) -> list[int]:
+    """Lease `count` blocks of ids from slug_id_seq and return the first id of each block.
+
+    nextval() never blocks other sessions and is not rolled back, so no commit is needed.
+    """
+    try:
+        stmt = (
+            select(slug_id_seq.next_value())
+            .select_from(func.generate_series(1, count))
+            .execution_options(use_primary=True)
+        )
+        result = await db.execute(stmt)
+        return list(result.scalars().all())
+    except SQLAlchemyError as e:
+        logger.error(f"Error leasing {count} id blocks: {e}")
+        raise RuntimeError("Database error while leasing id blocks")
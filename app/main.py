@@ -1,6 +1,54 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routes import url, report
+from app.config import FAST_REDIRECT_ENABLED, METRICS_ENABLED, PROFILING_ENABLED, PROFILING_TOKEN, PROFILING_SAMPLE_RATE
+from app.middleware.fast_redirect import FastRedirectMiddleware, fixed_paths
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.routes import url, report, admin, metrics
+from app.services.visits import visit_writer
+from app.services.leaderboard import run_reconciler
+from app.services.slug_cache import run_invalidation_listener
+from app.services import slug_filter, cache_warmer
+from app.services.partitions import run_partition_maintenance
+from app.utils import cache
+from app.utils.profiler import sampler
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cache.init_client()
+    visit_writer.start()
+    tasks = [
+        asyncio.create_task(run_reconciler(), name="leaderboard-reconciler"),
+        asyncio.create_task(run_invalidation_listener(), name="slug-invalidation-listener"),
+        asyncio.create_task(run_partition_maintenance(), name="visit-partition-maintenance"),
+        asyncio.create_task(slug_filter.run_listener(), name="slug-filter-listener"),
+        asyncio.create_task(visit_writer.run_spool_replayer(), name="visit-spool-replayer"),
+        asyncio.create_task(cache_warmer.warm_at_startup(), name="cache-warmer"),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+    await visit_writer.stop()
+    await cache.close_client()
+
+app = FastAPI(lifespan=lifespan)
+app.include_router(admin.probe_router)
+app.include_router(admin.router)
+# Before the url router, whose /{slug} would otherwise take /metrics
+if METRICS_ENABLED:
+    app.include_router(metrics.router)
 app.include_router(report.router)
 app.include_router(url.router)
+
+# Must come after every include_router so that fixed paths such as /shorten are never taken for slugs
+if FAST_REDIRECT_ENABLED:
+    app.add_middleware(FastRedirectMiddleware, reserved_paths=fixed_paths(app))
+
+# Outside the fast redirect path, so that its redirects can be profiled too
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, sampler=sampler, token=PROFILING_TOKEN, sample_rate=PROFILING_SAMPLE_RATE)
+
+# Outermost, so that it also times requests answered by the fast redirect path
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
@@ -0,0 +1,55 @@
+import re
+from urllib.parse import quote
+from app.services import url as url_service
+
+# Single path segment that could be a slug (see app.utils.slug_codec); anything else goes to FastAPI
+SLUG_PATH = re.compile(r"/([0-9a-zA-Z]{7,20})")
+
+NOT_FOUND_BODY = b'{"detail":"Link not found"}'
+
+
+def fixed_paths(app) -> frozenset[str]:
+    """Paths of the app's parameterless routes, taken from its OpenAPI schema and docs settings."""
+    paths = {path for path in app.openapi()["paths"] if "{" not in path}
+    paths.update(path for path in (app.openapi_url, app.docs_url, app.redoc_url) if path)
+    return frozenset(paths)
+
+
+class FastRedirectMiddleware:
+    """Pure ASGI fast path for `GET /{slug}`.
+
+    Slug-shaped GET requests are resolved through the same service as the FastAPI route and
+    answered with a raw 307 (or the route's 404 body), skipping routing, dependency
+    resolution and Response objects. Every other request, including fixed routes that happen
+    to look like slugs (`reserved_paths`), is passed through untouched.
+    """
+
+    def __init__(self, app, reserved_paths: frozenset[str] = frozenset()):
+        self.app = app
+        self.reserved_paths = reserved_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        match = SLUG_PATH.fullmatch(scope["path"])
+        if match is None or scope["path"] in self.reserved_paths:
+            return await self.app(scope, receive, send)
+
+        url = await url_service.resolve_slug_and_record_visit(match.group(1))
+        if url is None or not url.long_url:
+            await send({
+                "type": "http.response.start",
+                "status": 404,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", b"%d" % len(NOT_FOUND_BODY))],
+            })
+            await send({"type": "http.response.body", "body": NOT_FOUND_BODY})
+            return
+
+        # Same escaping as starlette's RedirectResponse
+        location = quote(url.long_url, safe=":/%#?=@[]!$&'()*+,;").encode("latin-1")
+        await send({
+            "type": "http.response.start",
+            "status": 307,
+            "headers": [(b"location", location), (b"content-length", b"0")],
+        })
+        await send({"type": "http.response.body", "body": b""})
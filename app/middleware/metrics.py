@@ -0,0 +1,44 @@
+import time
+from app.middleware.fast_redirect import SLUG_PATH
+from app.utils.metrics import Histogram
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "Request latency by route template", ("method", "route", "status")
+)
+
+
+def _route_label(scope) -> str:
+    # Templates, not raw paths, so that every slug shares one label value
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    if scope["method"] == "GET" and SLUG_PATH.fullmatch(scope["path"]):
+        return "/{slug}"  # Answered by FastRedirectMiddleware before routing
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording the latency of every HTTP request in `http_request_seconds`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_SECONDS.labels(scope["method"], _route_label(scope), str(status)).observe(
+                time.perf_counter() - started
+            )
@@ -0,0 +1,57 @@
+import random
+import re
+from app.middleware.fast_redirect import SLUG_PATH
+from app.utils.profiler import StackSampler
+
+PROFILE_HEADER = b"x-profile"
+
+_STATS_SLUG = re.compile(r"/stats/[^/]+(/timeseries)?")
+
+
+def _route_label(method: str, path: str) -> str | None:
+    """Route template of a redirect, shorten or stats request, or None for any other request."""
+    if method == "POST" and path in ("/shorten", "/shorten/batch"):
+        return f"POST {path}"
+    if method != "GET":
+        return None
+    if path == "/stats":
+        return "GET /stats"
+    if match := _STATS_SLUG.fullmatch(path):
+        return f"GET /stats/{{slug}}{match.group(1) or ''}"
+    if SLUG_PATH.fullmatch(path):
+        return "GET /{slug}"
+    return None
+
+
+class ProfilingMiddleware:
+    """Stack-samples redirect, shorten and stats requests that are selected for profiling.
+
+    A request is profiled when it sends `X-Profile: <token>` (with a non-empty `token`) or is
+    picked with probability `sample_rate`. Other requests only pay for the path match.
+    """
+
+    def __init__(self, app, sampler: StackSampler, token: str = "", sample_rate: float = 0.0):
+        self.app = app
+        self.sampler = sampler
+        self.token = token.encode()
+        self.sample_rate = sample_rate
+
+    def _selected(self, scope) -> bool:
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        if not self.token:
+            return False
+        return any(name == PROFILE_HEADER and value == self.token for name, value in scope["headers"])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route = _route_label(scope["method"], scope["path"])
+        if route is None or not self._selected(scope):
+            return await self.app(scope, receive, send)
+
+        self.sampler.start_request(route)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.sampler.end_request()
@@ -1,5 +1,7 @@
 from app.models.urls import URL
 from app.models.visit import Visit
-from app.models.sequence import SlugSequence
+from app.models.sequence import slug_id_seq
+from app.models.url_stats import URLVisitStats
+from app.models.visit_rollup import VisitRollup
 
-__all__ = ["URL", "Visit", "SlugSequence"]
\ No newline at end of file
+__all__ = ["URL", "Visit", "slug_id_seq", "URLVisitStats", "VisitRollup"]
\ No newline at end of file
@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer
+from sqlalchemy import Sequence
 from app.core.database import Base
 
-class SlugSequence(Base):
-    __tablename__ = "slug_sequence"
+# Every nextval() leases a block of SLUG_ID_BLOCK_SIZE ids that a worker hands out from memory.
+# The increment is part of the schema, so changing it requires a migration.
+SLUG_ID_BLOCK_SIZE = 1000
 
-    id = Column(Integer, primary_key=True, index=True)
-    current_value = Column(Integer, nullable=False)
\ No newline at end of file
+slug_id_seq = Sequence("slug_id_seq", start=1, increment=SLUG_ID_BLOCK_SIZE, metadata=Base.metadata)
\ No newline at end of file
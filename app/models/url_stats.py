@@ -0,0 +1,15 @@
+from sqlalchemy import Column, BigInteger, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+
+class URLVisitStats(Base):
+    """Per-URL visit counters, maintained incrementally as visits are written."""
+    __tablename__ = "url_stats"
+
+    url_id = Column(BigInteger, ForeignKey("urls.id", ondelete="CASCADE"), primary_key=True)
+    visit_count = Column(BigInteger, nullable=False, default=0)
+    last_visit = Column(DateTime, nullable=True)
+
+    url = relationship("URL", back_populates="stats")
+
+    __table_args__ = (Index("ix_url_stats_visit_count", visit_count.desc()),)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy import Column, BigInteger, String, DateTime, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -6,14 +6,18 @@ from app.core.database import Base
 class URL(Base):
     __tablename__ = "urls"
 
-    id = Column(Integer, primary_key=True, index=True)
+    # Assigned from leased slug_id_seq blocks (see app.services.id_allocator), never by the DB
+    id = Column(BigInteger, primary_key=True, index=True, autoincrement=False)
     slug = Column(String(20), unique=True, index=True, nullable=False)
-    long_url = Column(String, nullable=False, index=True)
+    long_url = Column(String, nullable=False)
+    # SHA-256 of the normalized long_url (app.utils.url_hash). NULL only for legacy duplicates.
+    long_url_hash = Column(LargeBinary(32), nullable=True)
     created_at = Column(DateTime, default=datetime.now)
 
     visits = relationship("Visit", back_populates="url", cascade="all, delete")
+    stats = relationship("URLVisitStats", back_populates="url", uselist=False, cascade="all, delete")
 
     __table_args__ = (
         Index("ix_slug", "slug"),
-        Index("ix_long_url", "long_url"),
+        Index("ux_urls_long_url_hash", "long_url_hash", unique=True),
     )
\ No newline at end of file
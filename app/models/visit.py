@@ -1,15 +1,27 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+from sqlalchemy import Column, BigInteger, DateTime, ForeignKey, Index, DDL, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
 
 class Visit(Base):
+    """Raw visits, range-partitioned by month on `timestamp` (see app.services.partitions)."""
     __tablename__ = "visits"
 
-    id = Column(Integer, primary_key=True, index=True)
-    url_id = Column(Integer, ForeignKey("urls.id"), nullable=False)
-    timestamp = Column(DateTime, default=datetime.now)
+    # The partition key has to be part of the primary key
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    url_id = Column(BigInteger, ForeignKey("urls.id"), nullable=False)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.now)
 
     url = relationship("URL", back_populates="visits")
 
-    __table_args__ = (Index("ix_visits_url_id", "url_id"),)
\ No newline at end of file
+    __table_args__ = (
+        Index("ix_visits_url_id_timestamp", "url_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+# Catch-all partition so inserts never fail when no monthly partition covers a timestamp
+event.listen(
+    Visit.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS visits_default PARTITION OF visits DEFAULT"),
+)
\ No newline at end of file
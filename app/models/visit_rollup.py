@@ -0,0 +1,11 @@
+from sqlalchemy import Column, BigInteger, DateTime, String, ForeignKey
+from app.core.database import Base
+
+class VisitRollup(Base):
+    """Visit counts per URL and time bucket, kept after raw visit partitions are dropped."""
+    __tablename__ = "visit_rollups"
+
+    url_id = Column(BigInteger, ForeignKey("urls.id", ondelete="CASCADE"), primary_key=True)
+    granularity = Column(String(8), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    visit_count = Column(BigInteger, nullable=False)
\ No newline at end of file
@@ -0,0 +1,74 @@
+import hmac
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from app.config import ADMIN_TOKEN
+from app.services.visits import visit_writer
+from app.services import slug_cache, cache_warmer
+from app.core import database
+from app.core.database import pool_snapshot
+from app.utils import visit_stream
+from app.utils.profiler import sampler
+
+async def require_admin_token(x_admin_token: str | None = Header(None)) -> None:
+    """Reject requests without the configured admin token; with no ADMIN_TOKEN set, reject all of them."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API disabled: ADMIN_TOKEN is not set")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token")
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin_token)])
+# Unauthenticated, for load balancer readiness checks
+probe_router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/visit-writer")
+async def visit_writer_stats() -> dict:
+    return visit_writer.snapshot()
+
+@router.get("/visit-stream")
+async def visit_stream_stats() -> dict:
+    return await visit_stream.stats()
+
+@router.get("/db-pool")
+async def db_pool_stats() -> dict:
+    return pool_snapshot()
+
+@router.get("/slow-queries")
+async def slow_queries(limit: int = Query(20, ge=1)) -> dict:
+    """Most recent slow statements first, with their sampled plans."""
+    if database.slow_query_log is None:
+        return {"enabled": False, "records": []}
+    return {"enabled": True, **database.slow_query_log.snapshot(limit)}
+
+@router.get("/cache")
+async def cache_stats() -> dict:
+    return await slug_cache.stats()
+
+@router.delete("/cache/slug/{slug}", status_code=204)
+async def invalidate_slug(slug: str) -> None:
+    await slug_cache.invalidate_slug(slug)
+
+@probe_router.get("/ready")
+async def readiness() -> dict:
+    """200 once the startup cache warm finished, 503 before that."""
+    stats = cache_warmer.stats()
+    if not stats["ready"]:
+        raise HTTPException(status_code=503, detail=stats)
+    return stats
+
+@router.get("/profile")
+async def download_profile() -> Response:
+    """Collapsed stacks of all profiled requests, for flamegraph.pl or speedscope."""
+    filename = f"profile-{datetime.now():%Y%m%dT%H%M%S}.collapsed"
+    return Response(
+        content=sampler.collapsed(),
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/profile/stats")
+async def profile_stats() -> dict:
+    return sampler.stats()
+
+@router.delete("/profile", status_code=204)
+async def reset_profile() -> None:
+    sampler.reset()
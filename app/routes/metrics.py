@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Response
+from app.utils import metrics
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics")
+async def export_metrics() -> Response:
+    await metrics.collect_async()
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
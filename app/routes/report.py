@@ -1,19 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import TOP_N_MAX_LIMIT
 from app.core.database import get_db
-from app.schemas.schemas import URLStats
+from app.schemas.schemas import URLStats, URLTimeSeries
 from app.services import report as report_service
-from typing import List
+from typing import List, Literal, Optional
+from datetime import datetime
 
 router = APIRouter()
 
 @router.get("/stats", response_model=List[URLStats])
-async def stats(db: AsyncSession = Depends(get_db), limit: int = 10) -> List[URLStats]:
-    return await report_service.get_top_urls(db, limit)
+async def stats(
+    db: AsyncSession = Depends(get_db),
+    limit: int = Query(10, ge=1, le=TOP_N_MAX_LIMIT),
+    since: Optional[datetime] = Query(None, alias="from"),
+    until: Optional[datetime] = Query(None, alias="to"),
+) -> List[URLStats]:
+    return await report_service.get_top_urls(db, limit, since, until)
 
 @router.get("/stats/{slug}", response_model=URLStats)
-async def stats_for_slug(slug: str, db: AsyncSession = Depends(get_db)) -> URLStats:
-    stats = await report_service.get_url_stats(db, slug)
+async def stats_for_slug(
+    slug: str,
+    db: AsyncSession = Depends(get_db),
+    since: Optional[datetime] = Query(None, alias="from"),
+    until: Optional[datetime] = Query(None, alias="to"),
+) -> URLStats:
+    stats = await report_service.get_url_stats(db, slug, since, until)
     if not stats:
         raise HTTPException(status_code=404, detail="Slug not found or has no visits")
-    return stats
\ No newline at end of file
+    return stats
+
+@router.get("/stats/{slug}/timeseries", response_model=URLTimeSeries)
+async def stats_timeseries(
+    slug: str,
+    db: AsyncSession = Depends(get_db),
+    granularity: Literal["hour", "day"] = "hour",
+    since: Optional[datetime] = Query(None, alias="from"),
+    until: Optional[datetime] = Query(None, alias="to"),
+) -> URLTimeSeries:
+    try:
+        series = await report_service.get_url_timeseries(db, slug, granularity, since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not series:
+        raise HTTPException(status_code=404, detail="Slug not found")
+    return series
\ No newline at end of file
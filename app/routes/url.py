@@ -2,9 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
-from app.schemas.schemas import URLCreate, URLResponse
+from app.schemas.schemas import URLCreate, URLBatchCreate, URLResponse
 from app.services import url as url_service
 from app.core.config import settings
+from typing import List
 
 router = APIRouter()
 
@@ -13,9 +14,15 @@ async def shorten(payload: URLCreate, db: AsyncSession = Depends(get_db)) -> URL
     url = await url_service.create_or_get_short_url(db, payload.long_url)
     return URLResponse(slug=url.slug, short_url=f"{settings.BASE_URL}/{url.slug}")
 
+@router.post("/shorten/batch", response_model=List[URLResponse])
+async def shorten_batch(payload: URLBatchCreate, db: AsyncSession = Depends(get_db)) -> List[URLResponse]:
+    urls = await url_service.create_or_get_short_urls(db, payload.long_urls)
+    return [URLResponse(slug=url.slug, short_url=f"{settings.BASE_URL}/{url.slug}") for url in urls]
+
 @router.get("/{slug}")
-async def redirect(slug: str, db: AsyncSession = Depends(get_db)) -> RedirectResponse:
-    url = await url_service.resolve_slug_and_record_visit(db, slug)
+async def redirect(slug: str) -> RedirectResponse:
+    # No get_db dependency: the service opens a session itself, and only on a cache miss
+    url = await url_service.resolve_slug_and_record_visit(slug)
     if not url or not url.long_url:
         raise HTTPException(status_code=404, detail="Link not found")
     return RedirectResponse(url=url.long_url, status_code=307)
\ No newline at end of file
@@ -1,10 +1,14 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+from app.config import SHORTEN_BATCH_MAX_URLS
 
 class URLCreate(BaseModel):
     long_url: str
 
+class URLBatchCreate(BaseModel):
+    long_urls: List[str] = Field(..., min_length=1, max_length=SHORTEN_BATCH_MAX_URLS)
+
 class URLResponse(BaseModel):
     slug: str
     short_url: str
@@ -13,4 +17,13 @@ class URLStats(BaseModel):
     slug: str
     long_url: str
     visits: int
-    last_visit: Optional[datetime]
\ No newline at end of file
+    last_visit: Optional[datetime]
+
+class TimeSeriesPoint(BaseModel):
+    bucket_start: datetime
+    visits: int
+
+class URLTimeSeries(BaseModel):
+    slug: str
+    granularity: str
+    points: List[TimeSeriesPoint]
\ No newline at end of file
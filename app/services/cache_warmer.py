@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from app.config import (
+    CACHE_WARM_ENABLED,
+    CACHE_WARM_TOP_K,
+    CACHE_WARM_WINDOW_HOURS,
+    CACHE_WARM_BATCH_SIZE,
+    CACHE_WARM_RATE_PER_S,
+    CACHE_WARM_READY_TIMEOUT_S,
+)
+from app.core.database import async_session
+from app.handler import url as handler
+from app.services import slug_cache
+from app.utils.cache import acquire_lock
+
+logger = logging.getLogger(__name__)
+
+# Redis is warmed by the one worker that takes this lock; every worker warms its own L1
+WARM_LOCK = "cache-warm"
+
+warm_stats = {
+    "state": "pending",
+    "warmed": 0,
+    "warmed_local": 0,
+    "failures": 0,
+    "last_duration_s": None,
+    "last_slugs_per_s": None,
+}
+_started_at: float | None = None
+
+
+async def warm(
+    top_k: int = CACHE_WARM_TOP_K,
+    window_hours: int = CACHE_WARM_WINDOW_HOURS,
+    batch_size: int = CACHE_WARM_BATCH_SIZE,
+    rate_per_s: int = CACHE_WARM_RATE_PER_S,
+    redis: bool = True,
+    local: bool = True,
+) -> int:
+    """Load the `top_k` most visited slugs of the last `window_hours` into the caches. Returns the number loaded.
+
+    Rows are streamed busiest first and written with one Redis pipeline per batch, paced to at most
+    `rate_per_s` slugs per second (0 disables the limit). Only the first `maxsize` slugs go into L1,
+    so colder slugs never evict hotter ones.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    l1_room = slug_cache.slug_l1.maxsize if local else 0
+    if not redis:
+        top_k = min(top_k, l1_room)
+    since = datetime.now() - timedelta(hours=window_hours)
+    warmed = 0
+    warm_stats["state"] = "running"
+    async with async_session() as db:
+        async for rows in handler.stream_hot_urls(db, since, top_k, batch_size):
+            entries = [(row.slug, row.id, row.long_url) for row in rows]
+            if redis:
+                await slug_cache.set_slugs(entries, local=False)
+            local_entries = entries[:max(l1_room - warmed, 0)]
+            slug_cache.set_local(local_entries)
+            warmed += len(entries)
+            warm_stats["warmed"] += len(entries)
+            warm_stats["warmed_local"] += len(local_entries)
+            if rate_per_s > 0:
+                await asyncio.sleep(max(0.0, started + warmed / rate_per_s - loop.time()))
+
+    elapsed = loop.time() - started
+    warm_stats.update(
+        state="done",
+        last_duration_s=round(elapsed, 3),
+        last_slugs_per_s=round(warmed / elapsed, 1) if elapsed else None,
+    )
+    logger.info(f"Warmed {warmed} hot slugs in {elapsed:.1f}s")
+    return warmed
+
+
+async def warm_at_startup(retry_delay: float = 5.0) -> None:
+    """Warm the caches in the background, retrying until the database is reachable."""
+    global _started_at
+    _started_at = time.monotonic()
+    if not CACHE_WARM_ENABLED:
+        warm_stats["state"] = "disabled"
+        return
+    try:
+        redis = await acquire_lock(WARM_LOCK, CACHE_WARM_READY_TIMEOUT_S)
+    except Exception as e:
+        logger.warning(f"Could not take the cache warm lock, warming L1 only: {e}")
+        redis = False
+    while True:
+        try:
+            await warm(redis=redis)
+            return
+        except Exception as e:
+            warm_stats["state"] = "failed"
+            warm_stats["failures"] += 1
+            logger.warning(f"Cache warming failed: {e}")
+        await asyncio.sleep(retry_delay)
+
+
+def ready() -> bool:
+    """True once startup warming finished, or `CACHE_WARM_READY_TIMEOUT_S` after it started so that a
+    failing warm cannot keep the instance out of rotation forever."""
+    if warm_stats["state"] in ("done", "disabled"):
+        return True
+    return _started_at is not None and time.monotonic() - _started_at >= CACHE_WARM_READY_TIMEOUT_S
+
+
+def stats() -> dict:
+    return dict(warm_stats, ready=ready())
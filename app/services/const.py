@@ -1,2 +1,6 @@
 SLUG_CACHE_KEY_TEMPLATE = "slug:{}"
-TOP_N_SLUG_CACHE_KEY = "report:top_n"
\ No newline at end of file
+SLUG_MISS_CACHE_KEY_TEMPLATE = "slug:miss:{}"
+TOP_N_SLUG_CACHE_KEY = "report:top_n"
+SLUG_INVALIDATION_CHANNEL = "cache:invalidate:slug"
+SLUG_CREATED_CHANNEL = "bloom:add:slug"
+TIMESERIES_CACHE_KEY_TEMPLATE = "report:ts:{}:{}:{}"
\ No newline at end of file
@@ -0,0 +1,57 @@
+import asyncio
+from collections import deque
+from typing import Callable
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.handler import url as handler
+from app.models.sequence import SLUG_ID_BLOCK_SIZE
+from app.utils.slug_codec import is_canonical
+
+
+class IdAllocator:
+    """Hands out URL ids from blocks leased off the `slug_id_seq` sequence.
+
+    Each worker leases whole blocks with nextval(), so workers never contend on a
+    shared row; ids left in a block when the worker exits are simply skipped. Ids
+    rejected by `accept` are skipped as well.
+    """
+
+    def __init__(self, block_size: int = SLUG_ID_BLOCK_SIZE, accept: Callable[[int], bool] | None = None):
+        self._block_size = block_size
+        self._accept = accept
+        self._ranges: deque[range] = deque()
+        self._lock = asyncio.Lock()
+
+    @property
+    def available(self) -> int:
+        return sum(len(r) for r in self._ranges)
+
+    async def allocate(self, db: AsyncSession, count: int = 1) -> list[int]:
+        """Return `count` unique ids, leasing new blocks when the current ones run out."""
+        async with self._lock:
+            if count > self.available:
+                await self._lease(db, count - self.available)
+
+            ids: list[int] = []
+            while len(ids) < count:
+                if not self._ranges:
+                    await self._lease(db, count - len(ids))
+                current = self._ranges[0]
+                take = min(count - len(ids), len(current))
+                if self._accept is None:
+                    ids.extend(current[:take])
+                else:
+                    ids.extend(i for i in current[:take] if self._accept(i))
+                if take == len(current):
+                    self._ranges.popleft()
+                else:
+                    self._ranges[0] = current[take:]
+            return ids
+
+    async def _lease(self, db: AsyncSession, shortfall: int) -> None:
+        blocks = -(-shortfall // self._block_size)
+        for start in await handler.lease_id_blocks(db, blocks):
+            self._ranges.append(range(start, start + self._block_size))
+
+
+# Ids whose slug a smaller id already encodes to are never handed out, so every slug decodes to its own id
+id_allocator = IdAllocator(accept=is_canonical)
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import LEADERBOARD_RECONCILE_INTERVAL_S, LEADERBOARD_RECONCILE_SAMPLE
+from app.core.database import async_session
+from app.handler import report as report_handler
+from app.utils import leaderboard
+from app.utils.cache import acquire_lock
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild_leaderboard(db: AsyncSession, ttl: int = LEADERBOARD_RECONCILE_INTERVAL_S) -> int:
+    """Rebuild the Redis leaderboard from url_stats. Returns the number of URLs loaded.
+
+    Visits recorded while url_stats is scanned are staged alongside it, so the swap loses none.
+    """
+    await leaderboard.start_rebuild(ttl)
+    loaded = 0
+    async for rows in report_handler.stream_url_counts(db):
+        await leaderboard.load_rebuild_batch(rows)
+        loaded += len(rows)
+    await leaderboard.swap_rebuild()
+    logger.info(f"Rebuilt visit leaderboard with {loaded} URLs")
+    return loaded
+
+
+async def reconcile_leaderboard(db: AsyncSession, sample_size: int = LEADERBOARD_RECONCILE_SAMPLE) -> int:
+    """Compare the leaderboard with Postgres and repair it. Returns the number of corrected entries.
+
+    A leaderboard that was never built, or was flushed since (even if ZINCRBY recreated it), is
+    rebuilt in full; otherwise the top `sample_size` URLs by Postgres count are checked and any
+    drifted scores are overwritten.
+    """
+    if not await leaderboard.is_built():
+        return await rebuild_leaderboard(db)
+
+    rows = await report_handler.get_url_counts(db, sample_size)
+    if not rows:
+        return 0
+    scores = await leaderboard.get_scores([row.url_id for row in rows])
+    drifted = [row for row, score in zip(rows, scores) if score != row.visits]
+    if drifted:
+        await leaderboard.set_scores((row.url_id, row.visits) for row in drifted)
+        await leaderboard.set_url_meta({row.url_id: {"slug": row.slug, "long_url": row.long_url} for row in drifted})
+        logger.warning(f"Corrected {len(drifted)} drifted leaderboard entries")
+    return len(drifted)
+
+
+async def run_reconciler(interval_s: int = LEADERBOARD_RECONCILE_INTERVAL_S) -> None:
+    """Periodically reconcile the leaderboard; only one worker does the work per interval."""
+    while True:
+        try:
+            if await acquire_lock("leaderboard:reconcile", interval_s):
+                async with async_session() as db:
+                    await reconcile_leaderboard(db)
+        except Exception as e:
+            logger.error(f"Leaderboard reconciliation failed: {e}")
+        await asyncio.sleep(interval_s)
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from datetime import date, datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import (
+    VISIT_PARTITION_MONTHS_AHEAD,
+    VISIT_RETENTION_MONTHS,
+    PARTITION_MAINTENANCE_INTERVAL_S,
+)
+from app.core.database import async_session
+from app.handler import partitions as handler
+from app.utils.cache import acquire_lock
+
+logger = logging.getLogger(__name__)
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+async def ensure_partitions(
+    db: AsyncSession, months_ahead: int = VISIT_PARTITION_MONTHS_AHEAD, today: date | None = None
+) -> list[str]:
+    """Create monthly visits partitions from the current month up to `months_ahead` months out."""
+    current = month_start(today or datetime.now().date())
+    existing = set(await handler.list_visit_partitions(db))
+    created = []
+    for offset in range(months_ahead + 1):
+        start = add_months(current, offset)
+        name = handler.partition_name(start)
+        if name not in existing:
+            await handler.create_visit_partition(db, start, add_months(start, 1))
+            created.append(name)
+    return created
+
+
+async def apply_retention(
+    db: AsyncSession, retention_months: int = VISIT_RETENTION_MONTHS, today: date | None = None
+) -> list[str]:
+    """Roll up and drop partitions that ended more than `retention_months` months ago, and purge
+    visits and hourly rollups that old from the default partition and visit_rollups.
+
+    A retention of 0 keeps raw visits forever.
+    """
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(month_start(today or datetime.now().date()), -retention_months)
+    dropped = []
+    for name in await handler.list_visit_partitions(db):
+        year, month = handler.PARTITION_NAME_PATTERN.match(name).groups()
+        if add_months(date(int(year), int(month), 1), 1) <= cutoff:
+            rollups = await handler.rollup_and_drop_partition(db, name, cutoff)
+            logger.info(f"Dropped visit partition {name} after writing {rollups} daily rollups")
+            dropped.append(name)
+    purged = await handler.rollup_and_purge_default_partition(db, cutoff)
+    if purged:
+        logger.info(f"Purged {purged} expired visits from {handler.DEFAULT_PARTITION}")
+    return dropped
+
+
+async def run_partition_maintenance(interval_s: int = PARTITION_MAINTENANCE_INTERVAL_S) -> None:
+    """Periodically create upcoming partitions and apply retention; one worker per interval.
+
+    The two steps fail independently, so a partition that cannot be created never blocks retention.
+    """
+    while True:
+        try:
+            locked = await acquire_lock("visits:partitions", interval_s)
+        except Exception as e:
+            logger.error(f"Visit partition maintenance lock failed: {e}")
+            locked = False
+        if locked:
+            for step in (ensure_partitions, apply_retention):
+                try:
+                    async with async_session() as db:
+                        await step(db)
+                except Exception as e:
+                    logger.error(f"Visit partition maintenance step {step.__name__} failed: {e}")
+        await asyncio.sleep(interval_s)
@@ -1,31 +1,236 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.handler import report as report_handler
-from app.schemas.schemas import URLStats
+from app.handler import url as url_handler
+from app.schemas.schemas import URLStats, URLTimeSeries, TimeSeriesPoint
 from typing import List
-from app.services.const import TOP_N_SLUG_CACHE_KEY
-from app.utils.cache import get_cache, set_cache
-
-async def get_url_stats(db: AsyncSession, slug: str) -> URLStats:
-    """Service: Get detailed stats for a specific slug."""
-    return await report_handler.get_stats_for_slug(db, slug)
-
-async def get_top_urls(db: AsyncSession, limit: int = 10) -> List[URLStats]:
-    """Service: Get top visited slugs. If it is found in cache serve from there"""
-    cached = await get_cache(TOP_N_SLUG_CACHE_KEY)
-    if cached and isinstance(cached, list):
-        return [URLStats(**item) for item in cached]
-
-    # Fallback to DB
-    results = await report_handler.get_top_urls(db, limit)
-    data = [
+from datetime import datetime, timedelta
+from app.config import (
+    VISIT_SINK,
+    TIMESERIES_MAX_BUCKETS,
+    TIMESERIES_CLOSED_TTL_S,
+    TIMESERIES_CLOSE_GRACE_S,
+    TOP_N_SOFT_TTL_S,
+    TOP_N_HARD_TTL_S,
+)
+from app.services import slug_cache
+from app.services.const import TOP_N_SLUG_CACHE_KEY, TIMESERIES_CACHE_KEY_TEMPLATE
+from app.services.visits import visit_writer
+from app.utils.time_buckets import GRANULARITIES, bucket_start, bucket_ceil
+from app.utils.cache import get_many, set_many, get_or_refresh, breaker as redis_breaker, CACHE_LOOKUPS
+from app.utils import leaderboard, visit_stream
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def get_url_stats(
+    db: AsyncSession, slug: str, since: datetime | None = None, until: datetime | None = None
+) -> URLStats:
+    """Service: Get detailed stats for a specific slug, optionally within [since, until)."""
+    return await report_handler.get_stats_for_slug(db, slug, since, until)
+
+async def _top_urls_from_leaderboard(db: AsyncSession, entries: list[tuple[int, int]]) -> List[URLStats]:
+    """Build URLStats for leaderboard entries, loading any missing URL metadata from the DB."""
+    url_ids = [url_id for url_id, _ in entries]
+    last_visits, metas = await leaderboard.get_details(url_ids)
+
+    missing = [url_id for url_id, meta in zip(url_ids, metas) if meta is None]
+    if missing:
+        found = {
+            url.id: {"slug": url.slug, "long_url": url.long_url}
+            for url in await url_handler.get_urls_by_ids(db, missing)
+        }
+        await leaderboard.set_url_meta(found)
+        metas = [meta or found.get(url_id) for url_id, meta in zip(url_ids, metas)]
+
+    return [
+        URLStats(slug=meta["slug"], long_url=meta["long_url"], visits=visits, last_visit=last_visit)
+        for (url_id, visits), last_visit, meta in zip(entries, last_visits, metas)
+        if meta is not None
+    ]
+
+def _top_n_cache_key(limit: int, since: datetime | None, until: datetime | None) -> str | None:
+    """Cache key of a ranking, or None for an ad-hoc range that is not worth caching.
+
+    Ranges are cached when every bound is midnight, or when only `from` is given (a rolling
+    window, whose hour-truncated key changes at most once an hour).
+    """
+    key = f"{TOP_N_SLUG_CACHE_KEY}:{limit}"
+    if since is None and until is None:
+        return key
+    bounds = [ts for ts in (since, until) if ts is not None]
+    if until is not None and any(ts != bucket_start(ts, "day") for ts in bounds):
+        return None
+    return key + f":{since.isoformat() if since else ''}:{until.isoformat() if until else ''}"
+
+async def _top_urls_from_db(
+    db: AsyncSession, limit: int, since: datetime | None, until: datetime | None
+) -> list[dict]:
+    results = await report_handler.get_top_urls(db, limit, since=since, until=until)
+    return [
         URLStats(
             slug=row.slug,
             long_url=row.long_url,
             visits=row.visits,
             last_visit=row.last_visit,
-        )
+        ).model_dump(mode="json")
         for row in results
     ]
 
-    await set_cache(TOP_N_SLUG_CACHE_KEY, [d.model_dump() for d in data])
-    return data
+async def get_top_urls(
+    db: AsyncSession, limit: int = 10, since: datetime | None = None, until: datetime | None = None
+) -> List[URLStats]:
+    """Service: Get top visited slugs.
+
+    Lifetime rankings come from the Redis leaderboard. Time ranges, and lifetime rankings while the
+    leaderboard is unavailable, go through a stale-while-revalidate cache keyed by the parameters.
+    Ranges are widened to whole hours first, so that nearby timestamps share a key; ad-hoc ranges
+    (see _top_n_cache_key) are computed without caching.
+    """
+    if since is None and until is None and redis_breaker.closed:
+        try:
+            entries = await leaderboard.top(limit)
+            if entries:
+                return await _top_urls_from_leaderboard(db, entries)
+        except Exception as e:
+            logger.warning(f"Leaderboard unavailable, falling back to DB: {e}")
+
+    if since is not None:
+        since = bucket_start(_local_naive(since), "hour")
+    if until is not None:
+        until = bucket_ceil(_local_naive(until), "hour")
+    cache_key = _top_n_cache_key(limit, since, until)
+    if cache_key is None:
+        CACHE_LOOKUPS.labels(TOP_N_SLUG_CACHE_KEY, "bypass").inc()
+        return [URLStats(**item) for item in await _top_urls_from_db(db, limit, since, until)]
+
+    cached = await get_or_refresh(
+        cache_key,
+        lambda: _top_urls_from_db(db, limit, since, until),
+        soft_ttl=TOP_N_SOFT_TTL_S,
+        hard_ttl=TOP_N_HARD_TTL_S,
+        name=TOP_N_SLUG_CACHE_KEY,
+    )
+    return [URLStats(**item) for item in cached]
+
+DEFAULT_TIMESERIES_BUCKETS = {"hour": 24, "day": 30}
+
+def _local_naive(ts: datetime) -> datetime:
+    """Visits are stored as naive local time; convert aware inputs to match."""
+    return ts.astimezone().replace(tzinfo=None) if ts.tzinfo else ts
+
+async def _resolve_url_id(db: AsyncSession, slug: str) -> int | None:
+    cached = await slug_cache.get_slug(slug)
+    if cached is slug_cache.NOT_FOUND:
+        return None
+    if cached:
+        return cached[0]
+    url = await url_handler.get_url_by_slug(db, slug)
+    return url.id if url else None
+
+async def _bucket_counts(
+    db: AsyncSession, url_id: int, granularity: str, start: datetime, end: datetime
+) -> dict[datetime, int]:
+    rows = await report_handler.get_visit_buckets(db, url_id, granularity, start, end)
+    return {row.bucket_start: row.visits for row in rows}
+
+def _chunk_start(ts: datetime, granularity: str) -> datetime:
+    """Start of the day (hourly series) or month (daily series) holding `ts`; the unit cached under one key."""
+    day = bucket_start(ts, "day")
+    return day if granularity == "hour" else day.replace(day=1)
+
+def _next_chunk(chunk: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return chunk + timedelta(days=1)
+    return (chunk + timedelta(days=32)).replace(day=1)
+
+async def _visits_backlogged() -> bool:
+    """True while visits that may land in already closed buckets are still on their way to Postgres."""
+    if visit_writer.has_spooled_visits():
+        return True
+    if VISIT_SINK != "stream":
+        return False
+    try:
+        stream = await visit_stream.stats()
+    except Exception as e:
+        logger.warning(f"Could not read visit stream lag: {e}")
+        return True
+    return bool(stream.get("lag") or stream.get("pending"))
+
+async def _closed_chunk_counts(
+    db: AsyncSession, url_id: int, slug: str, granularity: str, chunks: list[datetime]
+) -> dict[datetime, int]:
+    """Bucket counts of whole closed chunks, from the cache where possible; the rest in one query."""
+    keys = [TIMESERIES_CACHE_KEY_TEMPLATE.format(slug, granularity, chunk.isoformat()) for chunk in chunks]
+    counts: dict[datetime, int] = {}
+    missing = []
+    for chunk, key, cached in zip(chunks, keys, await get_many(keys)):
+        if isinstance(cached, dict):
+            counts.update({datetime.fromisoformat(ts): visits for ts, visits in cached.items()})
+        else:
+            missing.append((chunk, key))
+    if not missing:
+        return counts
+
+    loaded = await _bucket_counts(db, url_id, granularity, missing[0][0], _next_chunk(missing[-1][0], granularity))
+    counts.update(loaded)
+    if await _visits_backlogged():
+        return counts
+    by_chunk: dict[datetime, dict[str, int]] = {chunk: {} for chunk, _ in missing}
+    for ts, visits in loaded.items():
+        chunk = _chunk_start(ts, granularity)
+        if chunk in by_chunk:
+            by_chunk[chunk][ts.isoformat()] = visits
+    await set_many({key: by_chunk[chunk] for chunk, key in missing}, ttl=TIMESERIES_CLOSED_TTL_S)
+    return counts
+
+async def get_url_timeseries(
+    db: AsyncSession,
+    slug: str,
+    granularity: str,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    now: datetime | None = None,
+) -> URLTimeSeries | None:
+    """Service: Visits per hour/day bucket for a slug in [since, until), with empty buckets filled in.
+
+    Whole days (hourly series) or months (daily series) whose last bucket closed more than
+    TIMESERIES_CLOSE_GRACE_S ago are cached per day or month for TIMESERIES_CLOSED_TTL_S, so every
+    range reuses the same keys. Spool replays and stream lag can still add visits to closed buckets,
+    so nothing is cached while either is pending and the TTL stays short. The rest of the range is
+    read from the DB.
+    """
+    step = GRANULARITIES[granularity]
+    now = now or datetime.now()
+    end = bucket_ceil(_local_naive(until) if until else now, granularity)
+    if since:
+        start = bucket_start(_local_naive(since), granularity)
+    else:
+        start = end - step * DEFAULT_TIMESERIES_BUCKETS[granularity]
+    if start >= end:
+        raise ValueError("'from' must be before 'to'")
+    if (end - start) / step > TIMESERIES_MAX_BUCKETS:
+        raise ValueError(f"Range exceeds {TIMESERIES_MAX_BUCKETS} {granularity} buckets")
+
+    url_id = await _resolve_url_id(db, slug)
+    if url_id is None:
+        return None
+
+    closed_end = bucket_start(now - timedelta(seconds=TIMESERIES_CLOSE_GRACE_S), granularity)
+    chunks = []
+    chunk = _chunk_start(start, granularity)
+    while chunk < end and _next_chunk(chunk, granularity) <= closed_end:
+        chunks.append(chunk)
+        chunk = _next_chunk(chunk, granularity)
+    counts: dict[datetime, int] = {}
+    if chunks:
+        counts.update(await _closed_chunk_counts(db, url_id, slug, granularity, chunks))
+    uncached_start = max(start, chunk)
+    if uncached_start < end:
+        counts.update(await _bucket_counts(db, url_id, granularity, uncached_start, end))
+
+    points = []
+    bucket = start
+    while bucket < end:
+        points.append(TimeSeriesPoint(bucket_start=bucket, visits=counts.get(bucket, 0)))
+        bucket += step
+    return URLTimeSeries(slug=slug, granularity=granularity, points=points)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from app.config import SLUG_L1_MAX_ENTRIES, SLUG_L1_TTL_S, SLUG_NEGATIVE_CACHE_TTL_S
+from app.services import slug_filter
+from app.services.const import SLUG_CACHE_KEY_TEMPLATE, SLUG_MISS_CACHE_KEY_TEMPLATE, SLUG_INVALIDATION_CHANNEL
+from app.utils.cache import (
+    get_many, set_cache, set_many, delete_many, publish, subscribe, server_stats, breaker, CACHE_LOOKUPS
+)
+from app.utils.local_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+SLUG_CACHE_TTL = 60 * 60 * 24
+
+# L1: per-worker slug -> (id, long_url); L2: shared Redis `slug:{slug}` JSON entries
+slug_l1 = LRUCache(maxsize=SLUG_L1_MAX_ENTRIES, ttl=SLUG_L1_TTL_S)
+redis_stats = {"hits": 0, "misses": 0, "negative_hits": 0}
+
+# Returned by get_slug when Redis remembers that the slug does not exist
+NOT_FOUND = object()
+
+
+async def get_slug(slug: str) -> tuple[int, str] | object | None:
+    """Look a slug up in L1, then Redis. Redis hits are promoted into L1.
+
+    Returns NOT_FOUND for a recently confirmed miss; a mapping stored since then takes precedence.
+    """
+    entry = slug_l1.get(slug)
+    if entry is not None:
+        CACHE_LOOKUPS.labels("slug_l1", "hit").inc()
+        return entry
+    CACHE_LOOKUPS.labels("slug_l1", "miss").inc()
+
+    cached, missing = await get_many([SLUG_CACHE_KEY_TEMPLATE.format(slug), SLUG_MISS_CACHE_KEY_TEMPLATE.format(slug)])
+    if not cached:
+        if missing:
+            redis_stats["negative_hits"] += 1
+            CACHE_LOOKUPS.labels("slug", "negative_hit").inc()
+            return NOT_FOUND
+        redis_stats["misses"] += 1
+        CACHE_LOOKUPS.labels("slug", "miss").inc()
+        return None
+    redis_stats["hits"] += 1
+    CACHE_LOOKUPS.labels("slug", "hit").inc()
+    entry = (cached["id"], cached["long_url"])
+    slug_l1.set(slug, entry)
+    return entry
+
+
+async def set_slug(slug: str, url_id: int, long_url: str) -> None:
+    """Store a slug mapping in both tiers."""
+    slug_l1.set(slug, (url_id, long_url))
+    await set_cache(SLUG_CACHE_KEY_TEMPLATE.format(slug), {
+        "id": url_id,
+        "slug": slug,
+        "long_url": long_url
+    }, ttl=SLUG_CACHE_TTL)
+
+
+async def set_missing(slug: str) -> None:
+    """Remember for a short while that a slug does not exist."""
+    await set_cache(SLUG_MISS_CACHE_KEY_TEMPLATE.format(slug), 1, ttl=SLUG_NEGATIVE_CACHE_TTL_S)
+
+
+def set_local(entries: list[tuple[str, int, str]]) -> None:
+    """Store many (slug, id, long_url) mappings in this worker's L1 only."""
+    for slug, url_id, long_url in entries:
+        slug_l1.set(slug, (url_id, long_url))
+
+
+async def set_slugs(entries: list[tuple[str, int, str]], local: bool = True) -> None:
+    """Store many (slug, id, long_url) mappings with one Redis pipeline, and in L1 unless `local` is False."""
+    if local:
+        set_local(entries)
+    await set_many({
+        SLUG_CACHE_KEY_TEMPLATE.format(slug): {"id": url_id, "slug": slug, "long_url": long_url}
+        for slug, url_id, long_url in entries
+    }, ttl=SLUG_CACHE_TTL)
+
+
+async def invalidate_slug(slug: str) -> None:
+    """Drop a slug and its negative entry from Redis, and the slug from the L1 of every worker."""
+    slug_l1.delete(slug)
+    await delete_many([SLUG_CACHE_KEY_TEMPLATE.format(slug), SLUG_MISS_CACHE_KEY_TEMPLATE.format(slug)])
+    await publish(SLUG_INVALIDATION_CHANNEL, slug)
+
+
+async def run_invalidation_listener(retry_delay: float = 1.0) -> None:
+    """Drop L1 entries invalidated by other workers.
+
+    Messages published while disconnected are lost, so the whole L1 is cleared on reconnect.
+    """
+    while True:
+        try:
+            async for slug in subscribe(SLUG_INVALIDATION_CHANNEL):
+                slug_l1.delete(slug)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Slug invalidation subscription lost: {e}")
+        slug_l1.clear()
+        await asyncio.sleep(retry_delay)
+
+
+async def stats() -> dict:
+    """Hit/miss/eviction counters for both cache tiers."""
+    redis = dict(redis_stats)
+    try:
+        redis["server"] = await server_stats()
+    except Exception as e:
+        logger.warning(f"Could not read Redis stats: {e}")
+    redis["breaker"] = breaker.stats()
+    return {"l1": slug_l1.stats(), "redis": redis, "bloom": slug_filter.stats()}
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from app.config import (
+    SLUG_BLOOM_ENABLED, SLUG_BLOOM_ERROR_RATE, SLUG_BLOOM_MIN_CAPACITY, SLUG_BLOOM_REBUILD_INTERVAL_S
+)
+from app.core.database import async_session
+from app.handler import url as handler
+from app.services.const import SLUG_CREATED_CHANNEL
+from app.utils.bloom import BloomFilter
+from app.utils.cache import breaker, publish, subscribe
+
+logger = logging.getLogger(__name__)
+
+# Asks every worker to rebuild its filter; slugs are base62 so never collide with it
+REBUILD_MESSAGE = "*"
+# How often the maintenance loop checks for requested rebuilds and skipped broadcasts
+CHECK_INTERVAL_S = 5
+
+# Per-worker Bloom filter of every existing slug. Until the first build finishes it is None
+# and every slug is treated as possibly existing.
+_filter: BloomFilter | None = None
+_pending: list[str] | None = None
+_built_at = 0.0
+_rebuild_requested = asyncio.Event()
+# Set when a broadcast of new slugs was dropped, so other workers must rebuild to learn them
+_publish_skipped = False
+# True while the filter is known to hold every slug: built with no rebuild requested since and
+# the subscription still live. Only then is a filter miss trusted without asking the database.
+_current = False
+filter_stats = {"rejected": 0, "passed": 0, "false_positives": 0, "late_slugs": 0, "rebuilds": 0}
+
+
+def might_exist(slug: str) -> bool:
+    """False when the slug was not in the filter.
+
+    The filter can lag behind slugs created by other workers, so a False is only final once the
+    slug cache has been checked as well.
+    """
+    if _filter is None:
+        return True
+    if slug in _filter:
+        filter_stats["passed"] += 1
+        return True
+    return False
+
+
+def can_reject() -> bool:
+    """True when a filter miss can be answered without the database.
+
+    While Redis is failing, broadcasts of new slugs and rebuild requests may be lost, so misses
+    fall through to the database until the breaker closes and the filter has been rebuilt.
+    """
+    return _filter is not None and _current and not _publish_skipped and breaker.closed
+
+
+def record_rejected() -> None:
+    """Count a slug missing from both the filter and the slug cache that was not looked up."""
+    filter_stats["rejected"] += 1
+
+
+def record_late_slug(slug: str) -> None:
+    """Add a slug the filter missed but the slug cache knew, e.g. one whose broadcast has not arrived yet."""
+    filter_stats["late_slugs"] += 1
+    _add_local([slug])
+
+
+def record_false_positive() -> None:
+    """Count a slug that passed the filter but was not found in the database."""
+    if _filter is not None:
+        filter_stats["false_positives"] += 1
+
+
+def _add_local(slugs: list[str]) -> None:
+    if _pending is not None:
+        _pending.extend(slugs)
+    if _filter is not None:
+        for slug in slugs:
+            _filter.add(slug)
+
+
+async def add_slugs(slugs: list[str]) -> None:
+    """Add newly created slugs locally and broadcast them to the other workers.
+
+    A broadcast dropped while Redis is failing is made up for by a rebuild request once it recovers.
+    """
+    global _publish_skipped, _current
+    if not slugs:
+        return
+    _add_local(slugs)
+    try:
+        published = await publish(SLUG_CREATED_CHANNEL, " ".join(slugs))
+    except Exception as e:
+        logger.warning(f"Could not broadcast new slugs: {e}")
+        published = False
+    if not published:
+        _publish_skipped = True
+        _current = False
+
+
+async def rebuild(db) -> int:
+    """Build a fresh filter from all stored slugs and swap it in. Returns the number of slugs loaded.
+
+    Slugs created while the table is being scanned are buffered and folded in before the swap.
+    """
+    global _filter, _pending, _built_at
+    _pending = []
+    try:
+        capacity = max(SLUG_BLOOM_MIN_CAPACITY, 2 * await handler.count_urls(db))
+        bloom = BloomFilter(capacity, SLUG_BLOOM_ERROR_RATE)
+        async for slugs in handler.stream_slugs(db):
+            for slug in slugs:
+                bloom.add(slug)
+        for slug in _pending:
+            bloom.add(slug)
+        _filter = bloom
+        _built_at = time.monotonic()
+        filter_stats["rebuilds"] += 1
+    finally:
+        _pending = None
+    logger.info(f"Built slug Bloom filter with {_filter.count} slugs")
+    return _filter.count
+
+
+async def _request_rebuild_everywhere() -> None:
+    global _publish_skipped
+    try:
+        published = await publish(SLUG_CREATED_CHANNEL, REBUILD_MESSAGE)
+    except Exception as e:
+        logger.warning(f"Could not request slug filter rebuilds: {e}")
+        return
+    if published:
+        _publish_skipped = False
+
+
+async def _maintain(subscribed: asyncio.Event, retry_delay: float) -> None:
+    """Build the filter once subscribed, then rebuild it on request and every SLUG_BLOOM_REBUILD_INTERVAL_S."""
+    global _current
+    await subscribed.wait()
+    _rebuild_requested.set()
+    while True:
+        if _publish_skipped:
+            await _request_rebuild_everywhere()
+        if _rebuild_requested.is_set() or time.monotonic() - _built_at >= SLUG_BLOOM_REBUILD_INTERVAL_S:
+            _rebuild_requested.clear()
+            try:
+                async with async_session() as db:
+                    await rebuild(db)
+                # A rebuild requested during the scan may cover slugs the scan missed
+                _current = not _rebuild_requested.is_set() and not _publish_skipped
+            except Exception as e:
+                logger.warning(f"Slug Bloom filter build failed: {e}")
+                _rebuild_requested.set()
+                await asyncio.sleep(retry_delay)
+                continue
+        try:
+            await asyncio.wait_for(_rebuild_requested.wait(), timeout=CHECK_INTERVAL_S)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_listener(retry_delay: float = 5.0) -> None:
+    """Keep this worker's filter in sync with the slugs created by every worker.
+
+    The table is scanned only once the subscription is active, so a slug created during the scan
+    arrives as a message and is folded in by rebuild(). Messages published while disconnected are
+    lost, so the filter is rebuilt after every reconnect.
+    """
+    global _current
+    if not SLUG_BLOOM_ENABLED:
+        return
+    while True:
+        subscribed = asyncio.Event()
+        maintainer = asyncio.create_task(_maintain(subscribed, retry_delay), name="slug-filter-rebuild")
+        try:
+            async for message in subscribe(SLUG_CREATED_CHANNEL, subscribed):
+                if message == REBUILD_MESSAGE:
+                    _current = False
+                    _rebuild_requested.set()
+                else:
+                    _add_local(message.split())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Slug filter subscription lost: {e}")
+        finally:
+            _current = False
+            maintainer.cancel()
+        await asyncio.sleep(retry_delay)
+
+
+def stats() -> dict:
+    """Filter size, estimated false-positive rate and rejection counters."""
+    result = dict(filter_stats, ready=_filter is not None, current=can_reject())
+    if _filter is not None:
+        result.update(_filter.stats())
+    return result
@@ -1,36 +1,17 @@
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import async_session, stick_to_primary
 from app.handler import url as handler
 from app.models.urls import URL
-from app.utils.cache import get_cache, set_cache, delete_cache
-from app.services.const import SLUG_CACHE_KEY_TEMPLATE, TOP_N_SLUG_CACHE_KEY
+from app.services import slug_cache, slug_filter
+from app.services.id_allocator import id_allocator
+from app.utils.slug_codec import int_to_base62, base62_to_int, encode_many
+from app.utils.url_hash import long_url_digest
+from app.services.visits import visit_writer
 
-def int_to_base62(n: int) -> str:
-    if n < 0 or n >= 62**6:
-        raise ValueError("Number out of range for 6-character Base62 encoding")
-
-    base62_chars = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    base = 62
-    fancy_padding = "a1b2c3d4e5f"
-
-    result = []
-    while n > 0:
-        n, rem = divmod(n, base)
-        result.append(base62_chars[rem])
-    base62_encoded = ''.join(reversed(result))
-
-    pad_len = 6 - len(base62_encoded)
-    padded = fancy_padding[:pad_len] + base62_encoded
-    checksum_value = sum(ord(c) for c in padded) % base
-    checksum_char = base62_chars[checksum_value]
-
-    return padded + checksum_char
-
-async def generate_slug_with_sequence(db: AsyncSession) -> str:
-    sequence = await handler.get_slug_sequence(db, lock=True)
-    next_value = 1 if not sequence else sequence.current_value + 1
-    slug = int_to_base62(next_value)
-    await handler.set_slug_sequence(db, next_value)
-    return slug
+async def allocate_slug(db: AsyncSession) -> tuple[int, str]:
+    """Allocate a new URL id and its slug."""
+    url_id = (await id_allocator.allocate(db))[0]
+    return url_id, int_to_base62(url_id)
 
 async def create_or_get_short_url(db: AsyncSession, long_url: str) -> URL:
     existing = await handler.get_url_by_long_url(db, long_url)
@@ -38,27 +19,92 @@ async def create_or_get_short_url(db: AsyncSession, long_url: str) -> URL:
         return existing
 
     try:
-        slug = await generate_slug_with_sequence(db)
-        return await handler.create_url(db, slug, long_url)
+        url_id, slug = await allocate_slug(db)
+        url = await handler.create_url(db, url_id, slug, long_url)
     except Exception as e:
         await db.rollback()
         raise RuntimeError(f"Failed to create short URL: {e}")
 
-async def resolve_slug_and_record_visit(db: AsyncSession, slug: str) -> URL | None:
-    cache_key = SLUG_CACHE_KEY_TEMPLATE.format(slug)
-    cached = await get_cache(cache_key)
+    # Cached before the broadcast, so a worker whose filter misses the slug still finds it
+    await slug_cache.set_slug(url.slug, url.id, url.long_url)
+    await slug_filter.add_slugs([url.slug])
+    return url
+
+async def create_or_get_short_urls(db: AsyncSession, long_urls: list[str]) -> list[URL]:
+    """Shorten many long URLs at once, returning one URL per input in input order."""
+    digests = {long_url: long_url_digest(long_url) for long_url in long_urls}
+    unique = list(dict.fromkeys(long_urls))
+    try:
+        by_digest = {url.long_url_hash: url for url in await handler.get_urls_by_long_urls(db, unique)}
+        # One new row per distinct digest; inputs that normalize to the same URL share it
+        missing, seen = [], set(by_digest)
+        for long_url in unique:
+            if digests[long_url] not in seen:
+                seen.add(digests[long_url])
+                missing.append(long_url)
+        if missing:
+            ids = await id_allocator.allocate(db, len(missing))
+            created = await handler.bulk_create_urls(db, list(zip(ids, encode_many(ids), missing)))
+            by_digest.update({url.long_url_hash: url for url in created})
+            await slug_cache.set_slugs([(url.slug, url.id, url.long_url) for url in created])
+            await slug_filter.add_slugs([url.slug for url in created])
+    except Exception as e:
+        await db.rollback()
+        raise RuntimeError(f"Failed to create short URLs: {e}")
+
+    return [by_digest[digests[long_url]] for long_url in long_urls]
+
+async def _lookup_url(db: AsyncSession, url_id: int, slug: str) -> URL | None:
+    url = await handler.get_url_by_id_and_slug(db, url_id, slug)
+    if url is None:
+        # Rows allocated before non-canonical ids were skipped can carry an id larger than the decoded one
+        url = await handler.get_url_by_slug(db, slug)
+    return url
+
+async def _load_url(db: AsyncSession, url_id: int, slug: str) -> URL | None:
+    url = await _lookup_url(db, url_id, slug)
+    if url is None and stick_to_primary(db):
+        # A replica miss may be a slug created moments ago; confirm on the primary before caching the miss
+        url = await _lookup_url(db, url_id, slug)
+    return url
+
+async def resolve_slug_and_record_visit(slug: str, db: AsyncSession | None = None) -> URL | None:
+    """Resolve a slug and queue a visit for it.
+
+    Cache hits never touch the database; without `db` a session is opened only on a cache miss.
+    """
+    try:
+        url_id = base62_to_int(slug)
+    except ValueError:
+        return None
+    in_filter = slug_filter.might_exist(slug)
+
+    cached = await slug_cache.get_slug(slug)
+    if cached is slug_cache.NOT_FOUND:
+        return None
     if cached:
-        await handler.create_visit(db, cached["id"])
-        await delete_cache(TOP_N_SLUG_CACHE_KEY)
-        return URL(id=cached["id"], slug=cached["slug"], long_url=cached["long_url"])
+        if not in_filter:
+            slug_filter.record_late_slug(slug)
+        url_id, long_url = cached
+        await visit_writer.record(url_id)
+        return URL(id=url_id, slug=slug, long_url=long_url)
+    if not in_filter and slug_filter.can_reject():
+        # Unknown to both the filter and the cache; the database is never asked
+        slug_filter.record_rejected()
+        return None
 
-    url = await handler.get_url_by_slug(db, slug)
+    if db is None:
+        async with async_session() as db:
+            url = await _load_url(db, url_id, slug)
+    else:
+        url = await _load_url(db, url_id, slug)
     if url:
-        await handler.create_visit(db, url.id)
-        await set_cache(cache_key, {
-            "id": url.id,
-            "slug": url.slug,
-            "long_url": url.long_url
-        }, ttl=60*60*24)
-        await delete_cache(TOP_N_SLUG_CACHE_KEY)
+        if not in_filter:
+            slug_filter.record_late_slug(slug)
+        await visit_writer.record(url.id)
+        await slug_cache.set_slug(url.slug, url.id, url.long_url)
+    else:
+        if in_filter:
+            slug_filter.record_false_positive()
+        await slug_cache.set_missing(slug)
     return url
@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from app.config import (
+    VISIT_QUEUE_MAX_SIZE,
+    VISIT_FLUSH_MAX_ROWS,
+    VISIT_FLUSH_INTERVAL_MS,
+    VISIT_ENQUEUE_TIMEOUT_MS,
+    VISIT_SINK,
+    VISIT_SPOOL_ENABLED,
+    VISIT_SPOOL_DIR,
+    VISIT_SPOOL_SEGMENT_BYTES,
+    VISIT_SPOOL_FSYNC_INTERVAL_MS,
+    VISIT_SPOOL_REPLAY_BATCH,
+    VISIT_SPOOL_REPLAY_INTERVAL_S,
+)
+from app.core.database import async_session
+from app.handler import url as handler
+from app.utils import leaderboard, visit_stream
+from app.utils.metrics import Counter, Gauge, Histogram, on_collect, on_collect_async
+from app.utils.spool import VisitSpool, SegmentReader
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+VISIT_FLUSH_SECONDS = Histogram("visit_flush_seconds", "Time to write one visit batch", ("sink",))
+VISIT_ROWS = Counter("visit_rows_total", "Visits by outcome", ("outcome",))
+VISIT_QUEUE_DEPTH = Gauge("visit_queue_depth", "Visits waiting for the next flush")
+
+
+async def store_visits(batch: list[tuple[int, datetime]]) -> None:
+    """Insert a batch of visits, then add it to the leaderboard."""
+    async with async_session() as db:
+        await handler.bulk_create_visits(db, batch)
+
+    # The leaderboard follows committed visits; reconciliation repairs it if this fails
+    try:
+        await leaderboard.record_visits(batch)
+    except Exception as e:
+        logger.warning(f"Failed to update visit leaderboard: {e}")
+
+
+@dataclass
+class VisitWriterStats:
+    enqueued: int = 0
+    dropped: int = 0
+    backpressure_waits: int = 0
+    flushes: int = 0
+    rows_flushed: int = 0
+    failed_rows: int = 0
+    spooled_rows: int = 0
+    replayed_rows: int = 0
+    replay_failures: int = 0
+    last_replay_rows_per_s: float = 0.0
+    last_flush_size: int = 0
+    max_flush_size: int = 0
+    last_flush_ms: float = 0.0
+    total_flush_ms: float = 0.0
+
+
+class VisitWriter:
+    """Buffers visits in a bounded queue and writes them to the DB in batches.
+
+    A batch is flushed once it holds `batch_size` rows or `flush_interval_ms` has
+    passed since its first row, whichever comes first. When the queue is full,
+    `record` waits up to `enqueue_timeout_ms` for room before dropping the visit.
+    With `sink="stream"` batches go to the Redis visit stream instead of Postgres.
+    Batches that cannot be written are appended to `spool`, if given, and loaded into
+    Postgres later by `replay_spool`.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = VISIT_QUEUE_MAX_SIZE,
+        batch_size: int = VISIT_FLUSH_MAX_ROWS,
+        flush_interval_ms: int = VISIT_FLUSH_INTERVAL_MS,
+        enqueue_timeout_ms: int = VISIT_ENQUEUE_TIMEOUT_MS,
+        sink: str = VISIT_SINK,
+        spool: VisitSpool | None = None,
+    ):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval_ms / 1000
+        self._enqueue_timeout = enqueue_timeout_ms / 1000
+        self._sink = sink
+        self._spool = spool
+        self._task: asyncio.Task | None = None
+        self._closed = False
+        self.stats = VisitWriterStats()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the background flush loop on the running event loop."""
+        if self.running:
+            return
+        self._closed = False
+        self._task = asyncio.create_task(self._run(), name="visit-writer")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop accepting visits and flush everything still queued."""
+        if not self.running:
+            return
+        self._closed = True
+        await self._queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Visit writer did not drain within {timeout}s, {self._queue.qsize()} visits lost")
+            self._task.cancel()
+        self._task = None
+        if self._spool is not None:
+            self._spool.close()
+
+    async def record(self, url_id: int, timestamp: datetime | None = None) -> bool:
+        """Queue a visit for the next flush. Returns False if the visit was dropped."""
+        if self._closed:
+            self.stats.dropped += 1
+            VISIT_ROWS.labels("dropped").inc()
+            return False
+        item = (url_id, timestamp or datetime.now())
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.stats.backpressure_waits += 1
+            try:
+                await asyncio.wait_for(self._queue.put(item), self._enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.stats.dropped += 1
+                VISIT_ROWS.labels("dropped").inc()
+                logger.warning(f"Visit queue full, dropping visit for url_id '{url_id}'")
+                return False
+        self.stats.enqueued += 1
+        return True
+
+    def has_spooled_visits(self) -> bool:
+        """True while visits wait in the spool of any process sharing its directory."""
+        return self._spool is not None and (self._spool.has_active_segment or bool(self._spool.segments()))
+
+    def snapshot(self) -> dict:
+        snapshot = {**asdict(self.stats), "queue_depth": self._queue.qsize(), "running": self.running}
+        if self._spool is not None:
+            snapshot["spool"] = self._spool.stats()
+        return snapshot
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = loop.time() + self._flush_interval
+            while len(batch) < self._batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # Drain whatever was queued before the writer was closed
+        remaining_items = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining_items.append(item)
+        for i in range(0, len(remaining_items), self._batch_size):
+            await self._flush(remaining_items[i:i + self._batch_size])
+
+    async def _flush(self, batch: list[tuple[int, datetime]]) -> None:
+        started = time.perf_counter()
+        try:
+            if self._sink == "stream":
+                await visit_stream.append(batch)
+            else:
+                await store_visits(batch)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(batch)} visits: {e}")
+            await self._spool_batch(batch)
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        VISIT_FLUSH_SECONDS.labels(self._sink).observe(elapsed_ms / 1000)
+        VISIT_ROWS.labels("flushed").inc(len(batch))
+        self.stats.flushes += 1
+        self.stats.rows_flushed += len(batch)
+        self.stats.last_flush_size = len(batch)
+        self.stats.max_flush_size = max(self.stats.max_flush_size, len(batch))
+        self.stats.last_flush_ms = elapsed_ms
+        self.stats.total_flush_ms += elapsed_ms
+
+    async def _spool_batch(self, batch: list[tuple[int, datetime]]) -> None:
+        if self._spool is None:
+            self.stats.failed_rows += len(batch)
+            VISIT_ROWS.labels("failed").inc(len(batch))
+            return
+        try:
+            await asyncio.to_thread(self._spool.append, batch)
+            self.stats.spooled_rows += len(batch)
+            VISIT_ROWS.labels("spooled").inc(len(batch))
+        except Exception as e:
+            self.stats.failed_rows += len(batch)
+            VISIT_ROWS.labels("failed").inc(len(batch))
+            logger.error(f"Failed to spool {len(batch)} visits: {e}")
+
+    async def replay_spool(self, batch_records: int = VISIT_SPOOL_REPLAY_BATCH) -> int:
+        """Load spooled visits into Postgres, oldest segment first. Returns the number of rows replayed.
+
+        Progress is recorded after every batch, so only a crash between a batch's commit and its
+        offset write inserts that batch twice. The active segment is sealed and replayed only once
+        every older segment went through.
+        """
+        if self._spool is None:
+            return 0
+        started = time.perf_counter()
+        await asyncio.to_thread(self._spool.remove_stale_creating)
+        replayed = await self._replay_segments(batch_records)
+        if self._spool.has_active_segment:
+            await asyncio.to_thread(self._spool.seal)
+            replayed += await self._replay_segments(batch_records)
+        if replayed:
+            self.stats.last_replay_rows_per_s = replayed / (time.perf_counter() - started)
+            logger.info(f"Replayed {replayed} spooled visits")
+        return replayed
+
+    async def _replay_segments(self, batch_records: int) -> int:
+        replayed = 0
+        for path in self._spool.segments():
+            with SegmentReader(path, batch_records) as reader:
+                if not reader.acquired:
+                    continue
+                for batch in reader.batches():
+                    await store_visits(batch)
+                    reader.commit()
+                    replayed += len(batch)
+                    self.stats.replayed_rows += len(batch)
+                reader.remove()
+        return replayed
+
+    async def run_spool_replayer(self, interval_s: int = VISIT_SPOOL_REPLAY_INTERVAL_S) -> None:
+        """Periodically try to replay the spool; failures simply wait for the next round."""
+        if self._spool is None:
+            return
+        while True:
+            try:
+                await self.replay_spool()
+            except Exception as e:
+                self.stats.replay_failures += 1
+                logger.warning(f"Visit spool replay failed: {e}")
+            await asyncio.sleep(interval_s)
+
+
+visit_writer = VisitWriter(
+    spool=VisitSpool(VISIT_SPOOL_DIR, VISIT_SPOOL_SEGMENT_BYTES, VISIT_SPOOL_FSYNC_INTERVAL_MS)
+    if VISIT_SPOOL_ENABLED else None
+)
+
+
+@on_collect
+def _export_queue_depth() -> None:
+    VISIT_QUEUE_DEPTH.set(visit_writer._queue.qsize())
+
+
+if VISIT_SINK == "stream":
+    on_collect_async(visit_stream.export_metrics)
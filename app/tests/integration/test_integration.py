@@ -1,7 +1,9 @@
+import asyncio
 import pytest
 from httpx import AsyncClient, ASGITransport
 from app.main import app
 from app.core.database import get_db, async_session
+from app.utils import cache
 from app.utils.cache import delete_cache
 
 
@@ -17,6 +19,8 @@ async def async_client(async_test_db):
         yield async_test_db
 
     app.dependency_overrides[get_db] = override_get_db
+    # ASGITransport does not run the lifespan
+    cache.init_client()
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
@@ -54,3 +58,74 @@ async def test_shorten_same_url_returns_same_slug(async_client, async_test_db):
     await cleanup_slug(async_test_db, slug1)
     await cleanup_slug(async_test_db, slug2)
 
+
+@pytest.mark.asyncio
+async def test_parallel_shortening_returns_unique_slugs():
+    from app.services import url as url_service
+
+    long_urls = [f"https://parallel.example.com/{i}" for i in range(25)]
+
+    async def shorten(long_url: str) -> str:
+        async with async_session() as session:
+            url = await url_service.create_or_get_short_url(session, long_url)
+            return url.slug
+
+    slugs = await asyncio.gather(*(shorten(long_url) for long_url in long_urls))
+
+    assert len(set(slugs)) == len(long_urls)
+
+    async with async_session() as session:
+        for slug in slugs:
+            await cleanup_slug(session, slug)
+
+@pytest.mark.asyncio
+async def test_independent_allocators_lease_disjoint_ranges():
+    from unittest.mock import patch
+    from app.handler import url as url_handler
+    from app.models.sequence import SLUG_ID_BLOCK_SIZE
+    from app.services.id_allocator import IdAllocator
+    from app.utils.slug_codec import int_to_base62
+
+    leased = []
+
+    async def recording_lease(db, count=1):
+        starts = await url_handler.lease_id_blocks(db, count)
+        leased.extend(starts)
+        return starts
+
+    # One allocator per simulated worker, each leasing through its own session
+    async def worker() -> list[int]:
+        allocator = IdAllocator()
+        ids = []
+        async with async_session() as session:
+            for _ in range(5):
+                ids.extend(await allocator.allocate(session, 700))
+                await asyncio.sleep(0)
+        return ids
+
+    with patch("app.services.id_allocator.handler.lease_id_blocks", recording_lease):
+        results = await asyncio.gather(*(worker() for _ in range(4)))
+
+    ranges = [range(start, start + SLUG_ID_BLOCK_SIZE) for start in sorted(leased)]
+    assert all(prev.stop <= cur.start for prev, cur in zip(ranges, ranges[1:]))
+    ids = [url_id for worker_ids in results for url_id in worker_ids]
+    assert len(ids) == 4 * 5 * 700
+    assert len(set(ids)) == len(ids)
+    assert len({int_to_base62(url_id) for url_id in ids}) == len(ids)
+
+@pytest.mark.asyncio
+async def test_shorten_batch_matches_single_shorten(async_client, async_test_db):
+    single = await async_client.post("/shorten", json={"long_url": "https://batch-b.com"})
+
+    res = await async_client.post("/shorten/batch", json={
+        "long_urls": ["https://batch-a.com", "https://batch-b.com", "https://batch-a.com"]
+    })
+    assert res.status_code == 200
+    slugs = [item["slug"] for item in res.json()]
+
+    assert slugs[1] == single.json()["slug"]
+    assert slugs[0] == slugs[2]
+    assert len(set(slugs)) == 2
+
+    for slug in set(slugs):
+        await cleanup_slug(async_test_db, slug)
@@ -0,0 +1,79 @@
+import json
+import random
+import httpx
+import pytest
+from benchmarks.run import Probe, execute, parse_metrics
+from benchmarks.workload import SCENARIOS, Request, ZipfSampler, build_plan, load_replay, percentile
+
+SLUGS = [f"slug{i:03d}" for i in range(100)]
+
+
+def test_zipf_favours_low_ranks():
+    sampler = ZipfSampler(100, 1.1, random.Random(1))
+    ranks = [sampler.sample() for _ in range(10000)]
+
+    assert all(0 <= rank < 100 for rank in ranks)
+    assert ranks.count(0) > 10 * ranks.count(50)
+
+
+def test_plans_are_reproducible_and_follow_the_mix():
+    scenario = SCENARIOS["mixed"]
+    plan = build_plan(scenario, SLUGS, 2000, zipf_s=1.1, seed=7, run_id="r")
+
+    assert plan == build_plan(scenario, SLUGS, 2000, zipf_s=1.1, seed=7, run_id="r")
+    redirects = [request for request in plan if request.kind == "redirect"]
+    assert 0.85 < len(redirects) / len(plan) < 0.95
+    assert all(request.expect == (307,) for request in redirects)
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+
+    assert (percentile(values, 50), percentile(values, 99), percentile(values, 100)) == (50, 99, 100)
+    assert percentile([], 50) is None
+
+
+def test_replay_substitutes_slugs_and_rejects_non_http_lines(tmp_path):
+    trace = tmp_path / "trace.jsonl"
+    trace.write_text('{"method": "get", "path": "/{slug}", "expect": [307]}\n\n')
+    plan = build_plan(load_replay(str(trace)), SLUGS, 3, zipf_s=0, seed=1, run_id="r")
+
+    assert [request.method for request in plan] == ["GET"] * 3
+    assert all(request.path.startswith("/slug") and request.expect == (307,) for request in plan)
+
+    trace.write_text(json.dumps({"request_id": "user-001", "title": "x"}) + "\n")
+    with pytest.raises(ValueError):
+        load_replay(str(trace))
+
+
+def test_metrics_parsing_and_deltas():
+    samples = parse_metrics(
+        '# TYPE db_query_seconds histogram\n'
+        'db_query_seconds_count{operation="get_url_by_slug",engine="primary"} 3\n'
+        'cache_lookups_total{cache="slug",result="hit"} 5\n'
+    )
+    assert samples[("cache_lookups_total", frozenset({("cache", "slug"), ("result", "hit")}))] == 5
+
+    before = {"db_statements": 3, "db_checkouts": 10, "redis_commands": 100, "cache": {"slug.hit": 5}}
+    after = {"db_statements": 7, "db_checkouts": 12, "redis_commands": 121, "cache": {"slug.hit": 25, "slug.miss": 0}}
+    delta = Probe.delta(before, after, requests=20)
+
+    assert delta["db"] == {"statements": 4, "statements_per_request": 0.2, "checkouts": 2, "checkouts_per_request": 0.1}
+    assert delta["redis"] == {"commands": 20, "commands_per_request": 1.0}
+    assert delta["cache_lookups"] == {"slug.hit": 20}
+
+
+@pytest.mark.asyncio
+async def test_execute_records_latencies_and_unexpected_statuses():
+    async def app(scope, receive, send):
+        status = 307 if scope["path"] != "/missing" else 404
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    plan = [Request("redirect", "GET", "/a", expect=(307,))] * 9 + [Request("redirect", "GET", "/missing", expect=(307,))]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        outcome = await execute(client, plan, concurrency=3)
+
+    assert len(outcome["latencies"]["redirect"]) == 10
+    assert outcome["statuses"] == {307: 9, 404: 1}
+    assert outcome["errors"] == {"redirect:404": 1}
@@ -0,0 +1,49 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy import create_engine, text
+from app.core import database
+from app.core.database import db_operation
+from app.utils.metrics import Histogram
+
+
+@pytest.fixture
+def timed_engine():
+    histogram = Histogram("test_db_query_seconds", "Test", ("operation", "engine"))
+    engine = create_engine("sqlite://")
+    database._time_statements(engine, "primary")
+    with patch.object(database, "DB_QUERY_SECONDS", histogram):
+        yield engine, histogram
+
+
+def counts(histogram):
+    return {values: child.count for values, child in histogram._children.items()}
+
+
+@pytest.mark.asyncio
+async def test_statements_are_timed_per_handler_function(timed_engine):
+    engine, histogram = timed_engine
+
+    @db_operation
+    async def get_answer(conn):
+        return conn.execute(text("SELECT 42")).scalar()
+
+    with engine.connect() as conn:
+        assert await get_answer(conn) == 42
+        conn.execute(text("SELECT 1"))
+
+    assert counts(histogram) == {("get_answer", "primary"): 1, ("other", "primary"): 1}
+
+
+@pytest.mark.asyncio
+async def test_stream_handlers_restore_the_previous_operation(timed_engine):
+    engine, histogram = timed_engine
+
+    @db_operation
+    async def stream_numbers(conn):
+        yield conn.execute(text("SELECT 1")).scalar()
+
+    with engine.connect() as conn:
+        assert [n async for n in stream_numbers(conn)] == [1]
+
+    assert database.current_operation.get() == "other"
+    assert counts(histogram) == {("stream_numbers", "primary"): 1}
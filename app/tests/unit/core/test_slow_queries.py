@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import create_engine, text
+from app.core import database
+from app.core.database import db_operation
+from app.core.slow_queries import SlowQueryLog
+
+
+class FakeEngine:
+    """Async engine stand-in whose connections return a one-line plan."""
+
+    def __init__(self, delay: float = 0):
+        self.conn = MagicMock()
+        self.transaction = AsyncMock()
+        self.conn.begin = AsyncMock(return_value=self.transaction)
+
+        async def exec_driver_sql(statement, parameters):
+            await asyncio.sleep(delay)
+            return [("Seq Scan on urls",)]
+
+        self.conn.exec_driver_sql = AsyncMock(side_effect=exec_driver_sql)
+
+    @asynccontextmanager
+    async def connect(self):
+        yield self.conn
+
+
+@pytest.mark.asyncio
+async def test_slow_statements_are_recorded_with_handler_and_parameters():
+    log = SlowQueryLog(threshold_ms=0, size=10, explain_sample_rate=0)
+    engine = create_engine("sqlite://")
+    database._time_statements(engine, "primary")
+
+    @db_operation
+    async def get_top_urls(conn):
+        return conn.execute(text("SELECT :n"), {"n": 5}).scalar()
+
+    with patch.object(database, "slow_query_log", log), engine.connect() as conn:
+        await get_top_urls(conn)
+
+    [record] = log.snapshot()["records"]
+    assert record["operation"] == "get_top_urls"
+    assert record["statement"] == "SELECT ?"
+    assert record["parameters"] == "(5,)"
+    assert record["plan"] is None
+
+
+def test_ring_buffer_keeps_most_recent_first():
+    log = SlowQueryLog(threshold_ms=0, size=2, explain_sample_rate=0)
+    for n in range(3):
+        log.record("op", "primary", f"SELECT {n}", (), False, 0.5)
+
+    snapshot = log.snapshot()
+
+    assert [r["statement"] for r in snapshot["records"]] == ["SELECT 2", "SELECT 1"]
+    assert snapshot["recorded"] == 3
+
+
+@pytest.mark.asyncio
+async def test_sampled_statements_are_explained_and_rolled_back():
+    engine = FakeEngine()
+    log = SlowQueryLog(threshold_ms=0, size=10, explain_sample_rate=1, engines={"primary": engine})
+
+    log.record("get_url_by_slug", "primary", "SELECT * FROM urls WHERE slug = $1", ("abc",), False, 0.5)
+    await log._explaining
+
+    engine.conn.exec_driver_sql.assert_awaited_once_with(
+        "EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM urls WHERE slug = $1", ("abc",)
+    )
+    engine.transaction.rollback.assert_awaited_once()
+    assert log.snapshot()["records"][0]["plan"] == "Seq Scan on urls"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("statement", [
+    "INSERT INTO visits (url_id) VALUES ($1)",
+    "UPDATE url_stats SET visit_count = visit_count + 1",
+    "SELECT nextval('slug_id_seq')",
+    "SELECT id FROM urls WHERE id = $1 FOR UPDATE",
+])
+async def test_writes_and_locking_statements_are_not_analyzed(statement):
+    engine = FakeEngine()
+    log = SlowQueryLog(threshold_ms=0, size=10, explain_sample_rate=1, engines={"primary": engine})
+
+    log.record("handler", "primary", statement, (), False, 0.5)
+    await log._explaining
+
+    assert engine.conn.exec_driver_sql.await_args.args[0] == f"EXPLAIN {statement}"
+
+
+@pytest.mark.asyncio
+async def test_only_one_explain_runs_at_a_time():
+    engine = FakeEngine(delay=0.05)
+    log = SlowQueryLog(threshold_ms=0, size=10, explain_sample_rate=1, engines={"primary": engine})
+
+    log.record("a", "primary", "SELECT 1", (), False, 0.5)
+    log.record("b", "primary", "SELECT 2", (), False, 0.5)
+    await log._explaining
+
+    assert engine.conn.exec_driver_sql.await_count == 1
+    assert [r["plan"] is not None for r in log.snapshot()["records"]] == [False, True]
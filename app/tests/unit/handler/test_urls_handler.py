@@ -5,8 +5,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.handler import url as handler
 from app.models.urls import URL
 from app.models.visit import Visit
-from app.models.sequence import SlugSequence
 from sqlalchemy.engine import Result
+from datetime import datetime
+from app.utils.url_hash import long_url_digest
+from sqlalchemy.dialects import postgresql
 
 
 @pytest.fixture
@@ -35,81 +37,184 @@ async def test_get_url_by_slug_db_error(mock_db):
 
 @pytest.mark.asyncio
 async def test_create_url_success(mock_db):
-    url = await handler.create_url(mock_db, "slugX", "https://example.com")
+    inserted = URL(id=7, slug="slugX", long_url="https://example.com")
+    mock_db.scalars.return_value.one_or_none = MagicMock(return_value=inserted)
 
-    assert isinstance(url, URL)
-    assert url.slug == "slugX"
-    mock_db.add.assert_called_once()
+    url = await handler.create_url(mock_db, 7, "slugX", "https://example.com")
+
+    assert url is inserted
+    mock_db.execute.assert_not_called()
+    mock_db.commit.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_create_url_conflict_returns_existing(mock_db):
+    existing = URL(id=3, slug="older", long_url="https://example.com")
+    mock_db.scalars.return_value.one_or_none = MagicMock(return_value=None)
+    result_mock = MagicMock(spec=Result)
+    result_mock.scalar_one.return_value = existing
+    mock_db.execute.return_value = result_mock
+
+    url = await handler.create_url(mock_db, 7, "slugX", "https://example.com")
+
+    assert url is existing
     mock_db.commit.assert_awaited_once()
-    mock_db.refresh.assert_awaited_once_with(url)
 
 @pytest.mark.asyncio
 async def test_create_url_db_error(mock_db):
-    mock_db.commit.side_effect = SQLAlchemyError("fail")
+    mock_db.scalars.side_effect = SQLAlchemyError("fail")
     with pytest.raises(RuntimeError, match="Database error while creating URL"):
-        await handler.create_url(mock_db, "slug", "https://x.com")
+        await handler.create_url(mock_db, 1, "slug", "https://x.com")
     mock_db.rollback.assert_awaited_once()
 
 
 @pytest.mark.asyncio
-async def test_create_visit_success(mock_db):
-    visit = await handler.create_visit(mock_db, url_id=1)
+async def test_bulk_create_visits_success(mock_db):
+    now = datetime.now()
+    count = await handler.bulk_create_visits(mock_db, [(1, now), (2, now)])
 
-    assert isinstance(visit, Visit)
-    assert visit.url_id == 1
-    mock_db.add.assert_called_once()
+    assert count == 2
+    # One INSERT into visits plus upserts into url_stats and visit_rollups
+    assert mock_db.execute.await_count == 3
     mock_db.commit.assert_awaited_once()
 
 
 @pytest.mark.asyncio
-async def test_create_visit_db_error(mock_db):
+async def test_bulk_create_visits_empty(mock_db):
+    assert await handler.bulk_create_visits(mock_db, []) == 0
+    mock_db.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_visits_inserts_visit_rows(mock_db):
+    now = datetime.now()
+    await handler.bulk_create_visits(mock_db, [(1, now)])
+
+    insert = mock_db.execute.await_args_list[0].args[0]
+    assert insert.table.name == Visit.__tablename__
+    params = insert.compile(dialect=postgresql.dialect()).params
+    assert params["url_id_m0"] == 1 and params["timestamp_m0"] == now
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_visits_commit_error(mock_db):
     mock_db.commit.side_effect = SQLAlchemyError("fail")
-    with pytest.raises(RuntimeError, match="Database error while creating visit"):
-        await handler.create_visit(mock_db, url_id=1)
+    with pytest.raises(RuntimeError, match="Database error while creating visits"):
+        await handler.bulk_create_visits(mock_db, [(1, datetime.now())])
     mock_db.rollback.assert_awaited_once()
 
 
 @pytest.mark.asyncio
-async def test_get_slug_sequence_without_lock(mock_db):
-    slug_seq = SlugSequence(id=1, current_value=42)
+async def test_bulk_create_visits_db_error(mock_db):
+    mock_db.execute.side_effect = SQLAlchemyError("fail")
+    with pytest.raises(RuntimeError, match="Database error while creating visits"):
+        await handler.bulk_create_visits(mock_db, [(1, datetime.now())])
+    mock_db.rollback.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_lease_id_blocks_success(mock_db):
     result_mock = MagicMock(spec=Result)
-    result_mock.scalar_one_or_none.return_value = slug_seq
+    result_mock.scalars.return_value.all.return_value = [1001, 2001]
     mock_db.execute.return_value = result_mock
 
-    result = await handler.get_slug_sequence(mock_db)
-    assert result.current_value == 42
+    result = await handler.lease_id_blocks(mock_db, 2)
+    assert result == [1001, 2001]
+    mock_db.execute.assert_awaited_once()
+    mock_db.commit.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_get_slug_sequence_with_lock(mock_db):
-    slug_seq = SlugSequence(id=1, current_value=99)
-    result_mock = MagicMock(spec=Result)
-    result_mock.scalar_one_or_none.return_value = slug_seq
-    mock_db.execute.return_value = result_mock
+async def test_lease_id_blocks_db_error(mock_db):
+    mock_db.execute.side_effect = SQLAlchemyError("fail")
+    with pytest.raises(RuntimeError, match="Database error while leasing id blocks"):
+        await handler.lease_id_blocks(mock_db)
 
-    result = await handler.get_slug_sequence(mock_db, lock=True)
-    assert result.current_value == 99
+
+@pytest.mark.asyncio
+async def test_bulk_create_visits_aggregates_url_stats(mock_db):
+    early, late = datetime(2024, 1, 1), datetime(2024, 1, 2)
+    await handler.bulk_create_visits(mock_db, [(2, early), (1, early), (2, late)])
+
+    upsert = mock_db.execute.await_args_list[1].args[0]
+    params = upsert.compile(dialect=postgresql.dialect()).params
+    assert params["url_id_m0"] == 1 and params["visit_count_m0"] == 1
+    assert params["url_id_m1"] == 2 and params["visit_count_m1"] == 2
+    assert params["last_visit_m1"] == late
 
 
 @pytest.mark.asyncio
-async def test_set_slug_sequence_update(mock_db):
-    existing = SlugSequence(id=1, current_value=42)
+async def test_bulk_create_visits_splits_statements_under_bind_param_limit(mock_db, monkeypatch):
+    monkeypatch.setattr(handler, "MAX_BIND_PARAMS", 12)
+    now = datetime(2024, 1, 1, 10)
+    await handler.bulk_create_visits(mock_db, [(url_id, now) for url_id in range(5)])
+
+    statements = [call.args[0] for call in mock_db.execute.await_args_list]
+    # 1 visits insert, 2 url_stats upserts and 4 visit_rollups upserts (hour and day rows per url)
+    assert len(statements) == 7
+    for stmt in statements:
+        assert len(stmt.compile(dialect=postgresql.dialect()).params) <= 12
+    mock_db.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_urls_by_long_urls_success(mock_db):
+    urls = [URL(id=1, slug="a", long_url="https://a.com")]
     result_mock = MagicMock(spec=Result)
-    result_mock.scalar_one_or_none.return_value = existing
+    result_mock.scalars.return_value.all.return_value = urls
     mock_db.execute.return_value = result_mock
 
-    result = await handler.set_slug_sequence(mock_db, 100)
-    assert result.current_value == 100
+    assert await handler.get_urls_by_long_urls(mock_db, ["https://a.com"]) == urls
+    mock_db.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_urls_success(mock_db):
+    created = [URL(id=1, slug="a", long_url="https://a.com", long_url_hash=long_url_digest("https://a.com"))]
+    mock_db.scalars.return_value.all = MagicMock(return_value=created)
+
+    result = await handler.bulk_create_urls(mock_db, [(1, "a", "https://a.com")])
+
+    assert result == created
+    mock_db.scalars.assert_awaited_once()
+    mock_db.execute.assert_not_called()
     mock_db.commit.assert_awaited_once()
 
 
 @pytest.mark.asyncio
-async def test_set_slug_sequence_create(mock_db):
+async def test_bulk_create_urls_fetches_rows_lost_to_conflicts(mock_db):
+    existing = URL(id=9, slug="b", long_url="https://b.com", long_url_hash=long_url_digest("https://b.com"))
+    mock_db.scalars.return_value.all = MagicMock(return_value=[])
     result_mock = MagicMock(spec=Result)
-    result_mock.scalar_one_or_none.return_value = None
+    result_mock.scalars.return_value.all.return_value = [existing]
     mock_db.execute.return_value = result_mock
 
-    result = await handler.set_slug_sequence(mock_db, 1)
-    assert result.current_value == 1
-    mock_db.add.assert_called_once()
-    mock_db.commit.assert_awaited_once()
+    result = await handler.bulk_create_urls(mock_db, [(1, "a", "https://b.com")])
+
+    assert result == [existing]
+    mock_db.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_urls_db_error(mock_db):
+    mock_db.scalars.side_effect = SQLAlchemyError("fail")
+    with pytest.raises(RuntimeError, match="Database error while creating URLs"):
+        await handler.bulk_create_urls(mock_db, [(1, "a", "https://a.com")])
+    mock_db.rollback.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_visits_rolls_up_hour_and_day_buckets(mock_db):
+    visits = [(1, datetime(2024, 1, 1, 10, 5)), (1, datetime(2024, 1, 1, 10, 55)), (1, datetime(2024, 1, 1, 11, 0))]
+    await handler.bulk_create_visits(mock_db, visits)
+
+    upsert = mock_db.execute.await_args_list[2].args[0]
+    params = upsert.compile(dialect=postgresql.dialect()).params
+    buckets = {
+        (params[f"granularity_m{i}"], params[f"bucket_start_m{i}"]): params[f"visit_count_m{i}"]
+        for i in range(3)
+    }
+    assert buckets == {
+        ("day", datetime(2024, 1, 1)): 3,
+        ("hour", datetime(2024, 1, 1, 10)): 2,
+        ("hour", datetime(2024, 1, 1, 11)): 1,
+    }
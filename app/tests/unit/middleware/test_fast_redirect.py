@@ -0,0 +1,74 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.middleware.fast_redirect import FastRedirectMiddleware, fixed_paths
+from app.models.urls import URL
+
+
+async def call(middleware, path, method="GET"):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "path": path}
+    await middleware(scope, AsyncMock(), send)
+    return messages
+
+
+@pytest.fixture
+def inner_app():
+    return AsyncMock()
+
+
+@pytest.mark.asyncio
+@patch("app.middleware.fast_redirect.url_service.resolve_slug_and_record_visit")
+async def test_slug_redirects_without_calling_app(mock_resolve, inner_app):
+    mock_resolve.return_value = URL(id=1, slug="a1b2c18", long_url="https://x.com/a b")
+    middleware = FastRedirectMiddleware(inner_app)
+
+    start, body = await call(middleware, "/a1b2c18")
+
+    assert start["status"] == 307
+    assert (b"location", b"https://x.com/a%20b") in start["headers"]
+    assert body["body"] == b""
+    mock_resolve.assert_awaited_once_with("a1b2c18")
+    inner_app.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.middleware.fast_redirect.url_service.resolve_slug_and_record_visit")
+async def test_unknown_slug_returns_404(mock_resolve, inner_app):
+    mock_resolve.return_value = None
+
+    start, body = await call(FastRedirectMiddleware(inner_app), "/a1b2c19")
+
+    assert start["status"] == 404
+    assert body["body"] == b'{"detail":"Link not found"}'
+    inner_app.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.middleware.fast_redirect.url_service.resolve_slug_and_record_visit")
+@pytest.mark.parametrize("method,path", [
+    ("GET", "/stats"),
+    ("GET", "/stats/a1b2c18"),
+    ("GET", "/openapi.json"),
+    ("GET", "/shorten"),
+    ("POST", "/a1b2c18"),
+])
+async def test_other_requests_pass_through(mock_resolve, method, path, inner_app):
+    middleware = FastRedirectMiddleware(inner_app, reserved_paths=frozenset({"/shorten"}))
+
+    await call(middleware, path, method)
+
+    inner_app.assert_awaited_once()
+    mock_resolve.assert_not_called()
+
+
+def test_fixed_paths_lists_parameterless_routes():
+    from app.main import app
+
+    paths = fixed_paths(app)
+
+    assert {"/shorten", "/stats", "/docs"} <= paths
+    assert "/{slug}" not in paths
@@ -0,0 +1,44 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from app.middleware.metrics import MetricsMiddleware
+from app.utils.metrics import Histogram
+
+
+@pytest.fixture
+def histogram():
+    histogram = Histogram("test_http_request_seconds", "Test", ("method", "route", "status"))
+    with patch("app.middleware.metrics.HTTP_REQUEST_SECONDS", histogram):
+        yield histogram
+
+
+def responding(status, route=None):
+    async def app(scope, receive, send):
+        if route is not None:
+            scope["route"] = SimpleNamespace(path=route)
+        await send({"type": "http.response.start", "status": status})
+    return app
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path, route, label", [
+    ("/stats/a1b2c3d", "/stats/{slug}", "/stats/{slug}"),
+    ("/a1b2c3d", None, "/{slug}"),
+    ("/no/such/path", None, "unmatched"),
+])
+async def test_requests_are_labelled_by_route_template(histogram, path, route, label):
+    middleware = MetricsMiddleware(responding(200, route))
+
+    await middleware({"type": "http", "method": "GET", "path": path}, AsyncMock(), AsyncMock())
+
+    assert list(histogram._children) == [("GET", label, "200")]
+
+
+@pytest.mark.asyncio
+async def test_failed_requests_are_recorded_as_500(histogram):
+    middleware = MetricsMiddleware(AsyncMock(side_effect=RuntimeError))
+
+    with pytest.raises(RuntimeError):
+        await middleware({"type": "http", "method": "POST", "path": "/shorten"}, AsyncMock(), AsyncMock())
+
+    assert list(histogram._children) == [("POST", "unmatched", "500")]
@@ -0,0 +1,53 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.middleware.profiling import ProfilingMiddleware, _route_label
+
+
+async def call(middleware, path, method="GET", headers=()):
+    await middleware({"type": "http", "method": method, "path": path, "headers": list(headers)}, AsyncMock(), AsyncMock())
+
+
+@pytest.mark.parametrize("method, path, label", [
+    ("GET", "/a1b2c3d", "GET /{slug}"),
+    ("POST", "/shorten", "POST /shorten"),
+    ("POST", "/shorten/batch", "POST /shorten/batch"),
+    ("GET", "/stats", "GET /stats"),
+    ("GET", "/stats/a1b2c3d/timeseries", "GET /stats/{slug}/timeseries"),
+    ("GET", "/admin/cache", None),
+    ("DELETE", "/a1b2c3d", None),
+])
+def test_only_redirect_shorten_and_stats_are_profiled(method, path, label):
+    assert _route_label(method, path) == label
+
+
+@pytest.mark.asyncio
+async def test_header_with_token_selects_request():
+    sampler = MagicMock()
+    middleware = ProfilingMiddleware(AsyncMock(), sampler, token="secret")
+
+    await call(middleware, "/a1b2c3d", headers=[(b"x-profile", b"wrong")])
+    sampler.start_request.assert_not_called()
+
+    await call(middleware, "/a1b2c3d", headers=[(b"x-profile", b"secret")])
+    sampler.start_request.assert_called_once_with("GET /{slug}")
+    sampler.end_request.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_header_is_ignored_without_a_token():
+    sampler = MagicMock()
+    middleware = ProfilingMiddleware(AsyncMock(), sampler)
+
+    await call(middleware, "/stats", headers=[(b"x-profile", b"")])
+
+    sampler.start_request.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_sample_rate_selects_requests():
+    sampler = MagicMock()
+    middleware = ProfilingMiddleware(AsyncMock(), sampler, sample_rate=1.0)
+
+    await call(middleware, "/shorten", method="POST")
+
+    sampler.start_request.assert_called_once_with("POST /shorten")
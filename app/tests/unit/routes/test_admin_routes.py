@@ -0,0 +1,37 @@
+import pytest
+from unittest.mock import patch
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from app.routes import admin
+
+
+@pytest.fixture
+async def client():
+    app = FastAPI()
+    app.include_router(admin.probe_router)
+    app.include_router(admin.router)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+
+
+@pytest.mark.asyncio
+async def test_admin_api_is_disabled_without_a_token(client):
+    with patch.object(admin, "ADMIN_TOKEN", ""):
+        assert (await client.get("/admin/db-pool")).status_code == 403
+        assert (await client.get("/admin/db-pool", headers={"X-Admin-Token": ""})).status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_admin_api_requires_the_token(client):
+    with patch.object(admin, "ADMIN_TOKEN", "secret"), patch.object(admin.sampler, "reset") as mock_reset:
+        assert (await client.delete("/admin/profile")).status_code == 401
+        assert (await client.delete("/admin/profile", headers={"X-Admin-Token": "wrong"})).status_code == 401
+        assert (await client.delete("/admin/profile", headers={"X-Admin-Token": "secret"})).status_code == 204
+    mock_reset.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("app.routes.admin.cache_warmer.stats", return_value={"ready": True})
+async def test_readiness_probe_needs_no_token(mock_stats, client):
+    with patch.object(admin, "ADMIN_TOKEN", ""):
+        assert (await client.get("/admin/ready")).status_code == 200
@@ -0,0 +1,25 @@
+import pytest
+from unittest.mock import patch
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from app.config import TOP_N_MAX_LIMIT
+from app.core.database import get_db
+from app.routes import report
+
+
+@pytest.fixture
+async def client():
+    app = FastAPI()
+    app.include_router(report.router)
+    app.dependency_overrides[get_db] = lambda: None
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+
+
+@pytest.mark.asyncio
+@patch("app.routes.report.report_service.get_top_urls", return_value=[])
+async def test_stats_limit_is_bounded(mock_get_top_urls, client):
+    assert (await client.get("/stats", params={"limit": 0})).status_code == 422
+    assert (await client.get("/stats", params={"limit": TOP_N_MAX_LIMIT + 1})).status_code == 422
+    assert (await client.get("/stats", params={"limit": TOP_N_MAX_LIMIT})).status_code == 200
+    mock_get_top_urls.assert_awaited_once()
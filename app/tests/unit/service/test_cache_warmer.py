@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from app.services import cache_warmer
+from app.utils.local_cache import LRUCache
+
+
+def hot_rows(count, batch_size):
+    rows = [SimpleNamespace(id=i, slug=f"s{i}", long_url=f"https://example.com/{i}") for i in range(count)]
+
+    async def stream(db, since, limit, batch):
+        for start in range(0, min(count, limit), batch_size):
+            yield rows[start:min(start + batch_size, limit)]
+
+    return stream
+
+
+@pytest.fixture
+def warm_env():
+    l1 = LRUCache(maxsize=3, ttl=60)
+    with patch("app.services.cache_warmer.async_session"), \
+            patch("app.services.cache_warmer.slug_cache.slug_l1", l1), \
+            patch("app.services.cache_warmer.slug_cache.set_many", new_callable=AsyncMock) as set_many, \
+            patch.dict(cache_warmer.warm_stats, state="pending", warmed=0, warmed_local=0, failures=0):
+        yield l1, set_many
+
+
+@pytest.mark.asyncio
+async def test_warm_pipelines_batches_and_fills_l1_with_hottest_only(warm_env):
+    l1, set_many = warm_env
+    with patch("app.services.cache_warmer.handler.stream_hot_urls", hot_rows(5, batch_size=2)):
+        assert await cache_warmer.warm(top_k=10, rate_per_s=0) == 5
+
+    assert set_many.await_count == 3
+    assert sum(len(call.args[0]) for call in set_many.await_args_list) == 5
+    assert [l1.get(f"s{i}") for i in range(5)] == [(0, "https://example.com/0"), (1, "https://example.com/1"),
+                                                   (2, "https://example.com/2"), None, None]
+    assert cache_warmer.warm_stats["state"] == "done"
+
+
+@pytest.mark.asyncio
+async def test_warm_without_redis_reads_only_what_fits_in_l1(warm_env):
+    l1, set_many = warm_env
+    with patch("app.services.cache_warmer.handler.stream_hot_urls", hot_rows(10, batch_size=2)):
+        assert await cache_warmer.warm(top_k=10, rate_per_s=0, redis=False) == 3
+
+    set_many.assert_not_called()
+    assert len(l1) == 3
+
+
+@pytest.mark.asyncio
+async def test_warm_is_rate_limited(warm_env):
+    with patch("app.services.cache_warmer.handler.stream_hot_urls", hot_rows(4, batch_size=2)):
+        started = asyncio.get_running_loop().time()
+        await cache_warmer.warm(top_k=4, rate_per_s=40)
+
+    assert asyncio.get_running_loop().time() - started >= 0.09
+
+
+@pytest.mark.asyncio
+@patch("app.services.cache_warmer.acquire_lock", new_callable=AsyncMock, return_value=False)
+async def test_not_ready_until_startup_warm_finishes(mock_lock, warm_env):
+    release = asyncio.Event()
+
+    async def slow_stream(db, since, limit, batch):
+        await release.wait()
+        yield []
+
+    with patch("app.services.cache_warmer.handler.stream_hot_urls", slow_stream):
+        task = asyncio.create_task(cache_warmer.warm_at_startup())
+        await asyncio.sleep(0.01)
+        assert not cache_warmer.ready()
+        release.set()
+        await task
+
+    assert cache_warmer.ready()
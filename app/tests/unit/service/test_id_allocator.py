@@ -0,0 +1,64 @@
+import asyncio
+import itertools
+import pytest
+from unittest.mock import AsyncMock, patch
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.id_allocator import IdAllocator
+
+
+@pytest.fixture
+def mock_db():
+    return AsyncMock(spec=AsyncSession)
+
+
+@pytest.fixture
+def mock_lease():
+    """Emulate `slug_id_seq` with INCREMENT BY 10, yielding to the loop like a real DB call."""
+    sequence = itertools.count(1, 10)
+
+    async def lease(db, count=1):
+        await asyncio.sleep(0)
+        return [next(sequence) for _ in range(count)]
+
+    with patch("app.services.id_allocator.handler.lease_id_blocks", side_effect=lease) as mock:
+        yield mock
+
+
+@pytest.mark.asyncio
+async def test_allocates_from_leased_block(mock_lease, mock_db):
+    allocator = IdAllocator(block_size=10)
+
+    assert await allocator.allocate(mock_db) == [1]
+    assert await allocator.allocate(mock_db, 3) == [2, 3, 4]
+    assert mock_lease.await_count == 1
+    assert allocator.available == 6
+
+
+@pytest.mark.asyncio
+async def test_leases_enough_blocks_for_large_request(mock_lease, mock_db):
+    allocator = IdAllocator(block_size=10)
+    await allocator.allocate(mock_db, 8)
+
+    ids = await allocator.allocate(mock_db, 15)
+
+    assert ids == [9, 10] + list(range(11, 24))
+    mock_lease.assert_awaited_with(mock_db, 2)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_allocations_never_duplicate(mock_lease, mock_db):
+    allocator = IdAllocator(block_size=10)
+
+    results = await asyncio.gather(*(allocator.allocate(mock_db, 3) for _ in range(50)))
+    ids = [i for batch in results for i in batch]
+
+    assert len(ids) == 150
+    assert len(set(ids)) == 150
+
+
+@pytest.mark.asyncio
+async def test_skips_rejected_ids_and_tops_up(mock_lease, mock_db):
+    allocator = IdAllocator(block_size=10, accept=lambda n: n % 2 == 0)
+
+    assert await allocator.allocate(mock_db, 7) == [2, 4, 6, 8, 10, 12, 14]
+    assert mock_lease.await_count == 2
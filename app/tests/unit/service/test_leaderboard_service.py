@@ -0,0 +1,53 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services import leaderboard as service
+
+
+@pytest.fixture
+def mock_db():
+    return AsyncMock(spec=AsyncSession)
+
+
+def count_row(url_id, visits):
+    return SimpleNamespace(url_id=url_id, slug=f"s{url_id}", long_url=f"https://{url_id}.com", visits=visits, last_visit=None)
+
+
+@pytest.mark.asyncio
+@patch("app.services.leaderboard.leaderboard")
+@patch("app.services.leaderboard.report_handler.stream_url_counts")
+async def test_reconcile_rebuilds_leaderboard_that_was_not_built(mock_stream, mock_lb, mock_db):
+    async def batches(db):
+        yield [count_row(1, 3), count_row(2, 1)]
+        yield [count_row(3, 1)]
+
+    mock_stream.side_effect = batches
+    mock_lb.is_built = AsyncMock(return_value=False)
+    mock_lb.start_rebuild = AsyncMock()
+    mock_lb.load_rebuild_batch = AsyncMock()
+    mock_lb.swap_rebuild = AsyncMock()
+
+    loaded = await service.reconcile_leaderboard(mock_db)
+
+    assert loaded == 3
+    mock_lb.start_rebuild.assert_awaited_once()
+    assert mock_lb.load_rebuild_batch.await_count == 2
+    mock_lb.swap_rebuild.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch("app.services.leaderboard.leaderboard")
+@patch("app.services.leaderboard.report_handler.get_url_counts")
+async def test_reconcile_corrects_drifted_scores(mock_counts, mock_lb, mock_db):
+    mock_counts.return_value = [count_row(1, 10), count_row(2, 7)]
+    mock_lb.is_built = AsyncMock(return_value=True)
+    mock_lb.get_scores = AsyncMock(return_value=[10, 4])
+    mock_lb.set_scores = AsyncMock()
+    mock_lb.set_url_meta = AsyncMock()
+
+    corrected = await service.reconcile_leaderboard(mock_db, sample_size=2)
+
+    assert corrected == 1
+    assert list(mock_lb.set_scores.await_args.args[0]) == [(2, 7)]
+    mock_counts.assert_awaited_once_with(mock_db, 2)
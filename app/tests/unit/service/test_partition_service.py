@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from datetime import date
+from unittest.mock import AsyncMock, patch
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services import partitions as service
+
+
+@pytest.fixture
+def mock_db():
+    return AsyncMock(spec=AsyncSession)
+
+
+def test_add_months_wraps_years():
+    assert service.add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert service.add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+
+
+@pytest.mark.asyncio
+@patch("app.services.partitions.handler.create_visit_partition")
+@patch("app.services.partitions.handler.list_visit_partitions")
+async def test_ensure_partitions_creates_missing_months(mock_list, mock_create, mock_db):
+    mock_list.return_value = ["visits_y2024m12"]
+
+    created = await service.ensure_partitions(mock_db, months_ahead=2, today=date(2024, 12, 15))
+
+    assert created == ["visits_y2025m01", "visits_y2025m02"]
+    mock_create.assert_any_await(mock_db, date(2025, 1, 1), date(2025, 2, 1))
+    assert mock_create.await_count == 2
+
+
+@pytest.mark.asyncio
+@patch("app.services.partitions.handler.rollup_and_purge_default_partition")
+@patch("app.services.partitions.handler.rollup_and_drop_partition")
+@patch("app.services.partitions.handler.list_visit_partitions")
+async def test_apply_retention_drops_only_expired_partitions(mock_list, mock_drop, mock_purge, mock_db):
+    mock_list.return_value = ["visits_y2023m12", "visits_y2024m01", "visits_y2024m02"]
+    mock_drop.return_value = 10
+    mock_purge.return_value = 0
+
+    dropped = await service.apply_retention(mock_db, retention_months=12, today=date(2025, 1, 20))
+
+    assert dropped == ["visits_y2023m12"]
+    mock_drop.assert_awaited_once_with(mock_db, "visits_y2023m12", date(2024, 1, 1))
+    mock_purge.assert_awaited_once_with(mock_db, date(2024, 1, 1))
+
+
+@pytest.mark.asyncio
+@patch("app.services.partitions.handler.list_visit_partitions")
+async def test_apply_retention_disabled(mock_list, mock_db):
+    assert await service.apply_retention(mock_db, retention_months=0) == []
+    mock_list.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.services.partitions.asyncio.sleep")
+@patch("app.services.partitions.async_session")
+@patch("app.services.partitions.acquire_lock")
+@patch("app.services.partitions.apply_retention")
+@patch("app.services.partitions.ensure_partitions")
+async def test_maintenance_applies_retention_when_creation_fails(
+    mock_ensure, mock_retention, mock_lock, mock_session, mock_sleep
+):
+    mock_lock.return_value = True
+    mock_ensure.side_effect = RuntimeError("default partition holds rows for this month")
+    mock_sleep.side_effect = asyncio.CancelledError
+
+    with pytest.raises(asyncio.CancelledError):
+        await service.run_partition_maintenance(interval_s=60)
+
+    mock_retention.assert_awaited_once()
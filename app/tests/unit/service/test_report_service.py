@@ -3,6 +3,8 @@ from unittest.mock import AsyncMock, patch, MagicMock
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.schemas import URLStats
 from app.services import report as service
+from app.models.urls import URL
+from datetime import datetime
 
 
 @pytest.fixture
@@ -21,14 +23,14 @@ async def test_get_url_stats(mock_handler, mock_db):
     result = await service.get_url_stats(mock_db, "abc123")
     assert isinstance(result, URLStats)
     assert result.slug == "abc123"
-    mock_handler.assert_awaited_once_with(mock_db, "abc123")
+    mock_handler.assert_awaited_once_with(mock_db, "abc123", None, None)
 
 
 @pytest.mark.asyncio
-@patch("app.services.report.get_cache")
+@patch("app.services.report.leaderboard.top", new_callable=AsyncMock, return_value=[])
+@patch("app.services.report.get_or_refresh")
 @patch("app.services.report.report_handler.get_top_urls")
-@patch("app.services.report.set_cache")
-async def test_get_top_urls_cache_hit(mock_set_cache, mock_get_top_urls, mock_get_cache, mock_db):
+async def test_get_top_urls_cache_hit(mock_get_top_urls, mock_get_or_refresh, mock_top, mock_db):
     cached_data = [
         {
             "slug": "slug1",
@@ -43,23 +45,25 @@ async def test_get_top_urls_cache_hit(mock_set_cache, mock_get_top_urls, mock_ge
             "last_visit": "2024-01-02T00:00:00",
         },
     ]
-    mock_get_cache.return_value = cached_data
+    mock_get_or_refresh.return_value = cached_data
 
     result = await service.get_top_urls(mock_db)
     assert isinstance(result, list)
     assert len(result) == 2
     assert result[0].slug == "slug1"
+    assert mock_get_or_refresh.await_args.args[0] == "report:top_n:10"
     mock_get_top_urls.assert_not_called()
-    mock_set_cache.assert_not_called()
+
+
+async def call_compute(key, compute, **kwargs):
+    return await compute()
 
 
 @pytest.mark.asyncio
-@patch("app.services.report.get_cache")
+@patch("app.services.report.leaderboard.top", new_callable=AsyncMock, return_value=[])
+@patch("app.services.report.get_or_refresh", side_effect=call_compute)
 @patch("app.services.report.report_handler.get_top_urls")
-@patch("app.services.report.set_cache")
-async def test_get_top_urls_cache_miss(mock_set_cache, mock_get_top_urls, mock_get_cache, mock_db):
-    mock_get_cache.return_value = None
-
+async def test_get_top_urls_cache_miss(mock_get_top_urls, mock_get_or_refresh, mock_top, mock_db):
     row1 = MagicMock()
     row1.slug = "slug1"
     row1.long_url = "https://1.com"
@@ -77,5 +81,153 @@ async def test_get_top_urls_cache_miss(mock_set_cache, mock_get_top_urls, mock_g
     result = await service.get_top_urls(mock_db, limit=2)
     assert len(result) == 2
     assert result[0].slug == "slug1"
-    mock_get_top_urls.assert_awaited_once_with(mock_db, 2)
-    mock_set_cache.assert_awaited_once()
+    mock_get_top_urls.assert_awaited_once_with(mock_db, 2, since=None, until=None)
+    assert mock_get_or_refresh.await_args.args[0] == "report:top_n:2"
+
+
+@pytest.mark.asyncio
+@patch("app.services.report.leaderboard.top")
+@patch("app.services.report.leaderboard.get_details")
+@patch("app.services.report.leaderboard.set_url_meta")
+@patch("app.services.report.url_handler.get_urls_by_ids")
+@patch("app.services.report.report_handler.get_top_urls")
+async def test_get_top_urls_from_leaderboard(
+    mock_get_top_urls, mock_get_by_ids, mock_set_meta, mock_get_details, mock_top, mock_db
+):
+    mock_top.return_value = [(1, 10), (2, 5)]
+    mock_get_details.return_value = (
+        ["2024-01-01T00:00:00", "2024-01-02T00:00:00"],
+        [{"slug": "slug1", "long_url": "https://1.com"}, None],
+    )
+    mock_get_by_ids.return_value = [URL(id=2, slug="slug2", long_url="https://2.com")]
+
+    result = await service.get_top_urls(mock_db, limit=2)
+
+    assert [(r.slug, r.visits) for r in result] == [("slug1", 10), ("slug2", 5)]
+    mock_top.assert_awaited_once_with(2)
+    mock_get_by_ids.assert_awaited_once_with(mock_db, [2])
+    mock_set_meta.assert_awaited_once_with({2: {"slug": "slug2", "long_url": "https://2.com"}})
+    mock_get_top_urls.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.services.report.leaderboard.top")
+@patch("app.services.report.get_or_refresh", side_effect=call_compute)
+@patch("app.services.report.report_handler.get_top_urls")
+async def test_get_top_urls_with_range_skips_leaderboard(mock_get_top_urls, mock_get_or_refresh, mock_top, mock_db):
+    since, until = datetime(2024, 1, 1), datetime(2024, 2, 1)
+    row = MagicMock(slug="slug1", long_url="https://1.com", visits=3, last_visit=datetime(2024, 1, 5))
+    mock_get_top_urls.return_value = [row]
+
+    result = await service.get_top_urls(mock_db, 5, since, until)
+
+    assert result[0].visits == 3
+    mock_get_top_urls.assert_awaited_once_with(mock_db, 5, since=since, until=until)
+    assert mock_get_or_refresh.await_args.args[0] == "report:top_n:5:2024-01-01T00:00:00:2024-02-01T00:00:00"
+    mock_top.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.services.report.leaderboard.top")
+@patch("app.services.report.get_or_refresh", side_effect=call_compute)
+@patch("app.services.report.report_handler.get_top_urls", return_value=[])
+async def test_get_top_urls_rolling_window_is_truncated_to_the_hour(mock_get_top_urls, mock_get_or_refresh, mock_top, mock_db):
+    await service.get_top_urls(mock_db, 5, since=datetime(2024, 1, 1, 9, 41, 7, 123456))
+
+    since = datetime(2024, 1, 1, 9)
+    mock_get_top_urls.assert_awaited_once_with(mock_db, 5, since=since, until=None)
+    assert mock_get_or_refresh.await_args.args[0] == "report:top_n:5:2024-01-01T09:00:00:"
+
+
+@pytest.mark.asyncio
+@patch("app.services.report.leaderboard.top")
+@patch("app.services.report.get_or_refresh")
+@patch("app.services.report.report_handler.get_top_urls", return_value=[])
+async def test_get_top_urls_ad_hoc_range_is_not_cached(mock_get_top_urls, mock_get_or_refresh, mock_top, mock_db):
+    await service.get_top_urls(mock_db, 5, since=datetime(2024, 1, 1, 9, 30), until=datetime(2024, 1, 1, 17, 5))
+
+    mock_get_top_urls.assert_awaited_once_with(
+        mock_db, 5, since=datetime(2024, 1, 1, 9), until=datetime(2024, 1, 1, 18)
+    )
+    mock_get_or_refresh.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.services.report._visits_backlogged", return_value=False)
+@patch("app.services.report.set_many")
+@patch("app.services.report.get_many")
+@patch("app.services.report.report_handler.get_visit_buckets")
+@patch("app.services.report.slug_cache.get_slug")
+async def test_get_url_timeseries_fills_gaps_and_caches_closed_days(
+    mock_get_slug, mock_get_buckets, mock_get_many, mock_set_many, mock_backlogged, mock_db
+):
+    now = datetime(2024, 1, 2, 12, 30)
+    mock_get_slug.return_value = (7, "https://x.com")
+    mock_get_many.return_value = [None]
+    mock_get_buckets.side_effect = [
+        [MagicMock(bucket_start=datetime(2024, 1, 1, 3), visits=2), MagicMock(bucket_start=datetime(2024, 1, 1, 23), visits=4)],
+        [MagicMock(bucket_start=datetime(2024, 1, 2, 12), visits=1)],
+    ]
+
+    series = await service.get_url_timeseries(
+        mock_db, "abc123", "hour", since=datetime(2024, 1, 1, 22, 15), until=datetime(2024, 1, 2, 12, 45), now=now
+    )
+
+    points = [(p.bucket_start, p.visits) for p in series.points]
+    assert len(points) == 15
+    assert points[1] == (datetime(2024, 1, 1, 23), 4)
+    assert points[-1] == (datetime(2024, 1, 2, 12), 1)
+    # The whole closed day is cached under its own key, whatever part of it was asked for
+    mock_get_buckets.assert_any_await(mock_db, 7, "hour", datetime(2024, 1, 1), datetime(2024, 1, 2))
+    mock_get_buckets.assert_any_await(mock_db, 7, "hour", datetime(2024, 1, 2), datetime(2024, 1, 2, 13))
+    mock_set_many.assert_awaited_once_with(
+        {"report:ts:abc123:hour:2024-01-01T00:00:00": {"2024-01-01T03:00:00": 2, "2024-01-01T23:00:00": 4}},
+        ttl=service.TIMESERIES_CLOSED_TTL_S,
+    )
+
+
+@pytest.mark.asyncio
+@patch("app.services.report._visits_backlogged", return_value=True)
+@patch("app.services.report.set_many")
+@patch("app.services.report.get_many")
+@patch("app.services.report.report_handler.get_visit_buckets")
+@patch("app.services.report.slug_cache.get_slug")
+async def test_get_url_timeseries_not_cached_while_visits_backlogged(
+    mock_get_slug, mock_get_buckets, mock_get_many, mock_set_many, mock_backlogged, mock_db
+):
+    mock_get_slug.return_value = (7, "https://x.com")
+    mock_get_many.return_value = [None]
+    mock_get_buckets.return_value = []
+
+    await service.get_url_timeseries(
+        mock_db, "abc123", "day", since=datetime(2023, 12, 1), until=datetime(2023, 12, 3), now=datetime(2024, 1, 2)
+    )
+
+    mock_set_many.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.services.report.get_many")
+@patch("app.services.report.report_handler.get_visit_buckets")
+@patch("app.services.report.slug_cache.get_slug")
+async def test_get_url_timeseries_closed_range_served_from_cache(
+    mock_get_slug, mock_get_buckets, mock_get_many, mock_db
+):
+    mock_get_slug.return_value = (7, "https://x.com")
+    mock_get_many.return_value = [{"2023-12-01T00:00:00": 9, "2023-12-20T00:00:00": 5}]
+
+    series = await service.get_url_timeseries(
+        mock_db, "abc123", "day", since=datetime(2023, 12, 1), until=datetime(2023, 12, 3), now=datetime(2024, 1, 2)
+    )
+
+    assert [p.visits for p in series.points] == [9, 0]
+    mock_get_many.assert_awaited_once_with(["report:ts:abc123:day:2023-12-01T00:00:00"])
+    mock_get_buckets.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_url_timeseries_rejects_oversized_range(mock_db):
+    with pytest.raises(ValueError):
+        await service.get_url_timeseries(
+            mock_db, "abc123", "hour", since=datetime(2000, 1, 1), until=datetime(2024, 1, 1)
+        )
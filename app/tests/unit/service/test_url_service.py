@@ -1,30 +1,50 @@
+import time
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.urls import URL
-from app.models.sequence import SlugSequence
 from app.services import url as service
-from app.services.const import SLUG_CACHE_KEY_TEMPLATE, TOP_N_SLUG_CACHE_KEY
+from app.services.const import SLUG_CACHE_KEY_TEMPLATE, SLUG_MISS_CACHE_KEY_TEMPLATE
+from app.services import slug_cache, slug_filter
+from app.utils import cache
+from app.utils.bloom import BloomFilter
+from app.utils.circuit_breaker import OPEN
+from app.utils.url_hash import long_url_digest
 
 @pytest.fixture
 def mock_db():
     return AsyncMock(spec=AsyncSession)
 
+SLUG = service.int_to_base62(1)
+
+def make_url(url_id, slug, long_url):
+    return URL(id=url_id, slug=slug, long_url=long_url, long_url_hash=long_url_digest(long_url))
+
+@pytest.fixture(autouse=True)
+def clear_slug_l1():
+    slug_cache.slug_l1.clear()
+    yield
+    slug_cache.slug_l1.clear()
+
 @pytest.mark.asyncio
+@patch("app.services.url.slug_cache.set_slug")
+@patch("app.services.url.slug_filter.add_slugs")
 @patch("app.services.url.handler.get_url_by_long_url")
-@patch("app.services.url.generate_slug_with_sequence")
+@patch("app.services.url.allocate_slug")
 @patch("app.services.url.handler.create_url")
 async def test_create_or_get_short_url_new(
-    mock_create_url, mock_generate_slug, mock_get_by_long, mock_db
+    mock_create_url, mock_generate_slug, mock_get_by_long, mock_add_slugs, mock_set_slug, mock_db
 ):
     mock_get_by_long.return_value = None
-    mock_generate_slug.return_value = "abc123"
+    mock_generate_slug.return_value = (1, "abc123")
     fake_url = URL(id=1, slug="abc123", long_url="https://x.com")
     mock_create_url.return_value = fake_url
 
     result = await service.create_or_get_short_url(mock_db, "https://x.com")
     assert result.slug == "abc123"
-    mock_create_url.assert_awaited_once_with(mock_db, "abc123", "https://x.com")
+    mock_create_url.assert_awaited_once_with(mock_db, 1, "abc123", "https://x.com")
+    mock_add_slugs.assert_awaited_once_with(["abc123"])
+    mock_set_slug.assert_awaited_once_with("abc123", 1, "https://x.com")
 
 
 @pytest.mark.asyncio
@@ -39,61 +59,302 @@ async def test_create_or_get_short_url_existing(mock_get_by_long, mock_db):
 
 
 @pytest.mark.asyncio
-@patch("app.services.url.handler.get_slug_sequence")
-@patch("app.services.url.handler.set_slug_sequence")
-async def test_generate_slug_with_sequence(mock_set, mock_get, mock_db):
-    mock_get.return_value = SlugSequence(id=1, current_value=100)
-    slug = await service.generate_slug_with_sequence(mock_db)
-    assert isinstance(slug, str)
-    mock_set.assert_awaited_once_with(mock_db, 101)
+@patch("app.services.url.id_allocator.allocate")
+async def test_allocate_slug(mock_allocate, mock_db):
+    mock_allocate.return_value = [101]
+    url_id, slug = await service.allocate_slug(mock_db)
+    assert url_id == 101
+    assert slug == service.int_to_base62(101)
+    mock_allocate.assert_awaited_once_with(mock_db)
 
 
 @pytest.mark.asyncio
-@patch("app.services.url.get_cache")
+@patch("app.services.slug_cache.get_many")
 @patch("app.services.url.handler.get_url_by_slug")
-@patch("app.services.url.handler.create_visit")
-@patch("app.services.url.set_cache")
-@patch("app.services.url.delete_cache")
+@patch("app.services.url.visit_writer.record")
+@patch("app.services.slug_cache.set_cache")
 async def test_resolve_slug_cache_hit(
-    mock_delete_cache,
     mock_set_cache,
-    mock_create_visit,
+    mock_record,
     mock_get_by_slug,
     mock_get_cache,
     mock_db
 ):
-    cached = {"id": 1, "slug": "abc123", "long_url": "https://x.com"}
-    mock_get_cache.return_value = cached
+    cached = {"id": 1, "slug": SLUG, "long_url": "https://x.com"}
+    mock_get_cache.return_value = [cached, None]
 
-    url = await service.resolve_slug_and_record_visit(mock_db, "abc123")
+    url = await service.resolve_slug_and_record_visit(SLUG, mock_db)
 
-    assert url.slug == "abc123"
-    mock_create_visit.assert_awaited_once_with(mock_db, 1)
-    mock_delete_cache.assert_awaited_once_with(TOP_N_SLUG_CACHE_KEY)
+    assert url.slug == SLUG
+    mock_record.assert_awaited_once_with(1)
     mock_get_by_slug.assert_not_called()
 
 
 @pytest.mark.asyncio
-@patch("app.services.url.get_cache")
+@patch("app.services.slug_cache.get_many")
 @patch("app.services.url.handler.get_url_by_slug")
-@patch("app.services.url.handler.create_visit")
-@patch("app.services.url.set_cache")
-@patch("app.services.url.delete_cache")
+@patch("app.services.url.handler.get_url_by_id_and_slug")
+@patch("app.services.url.visit_writer.record")
+@patch("app.services.slug_cache.set_cache")
 async def test_resolve_slug_cache_miss(
-    mock_delete_cache,
     mock_set_cache,
-    mock_create_visit,
+    mock_record,
+    mock_get_by_id,
     mock_get_by_slug,
     mock_get_cache,
     mock_db
 ):
-    mock_get_cache.return_value = None
-    fake_url = URL(id=1, slug="abc123", long_url="https://x.com")
-    mock_get_by_slug.return_value = fake_url
+    mock_get_cache.return_value = [None, None]
+    fake_url = URL(id=1, slug=SLUG, long_url="https://x.com")
+    mock_get_by_id.return_value = fake_url
 
-    result = await service.resolve_slug_and_record_visit(mock_db, "abc123")
+    result = await service.resolve_slug_and_record_visit(SLUG, mock_db)
 
-    assert result.slug == "abc123"
-    mock_create_visit.assert_awaited_once_with(mock_db, 1)
+    assert result.slug == SLUG
+    mock_get_by_id.assert_awaited_once_with(mock_db, 1, SLUG)
+    mock_get_by_slug.assert_not_called()
+    mock_record.assert_awaited_once_with(1)
     mock_set_cache.assert_awaited_once()
-    mock_delete_cache.assert_awaited_once_with(TOP_N_SLUG_CACHE_KEY)
+
+
+@pytest.mark.asyncio
+@patch("app.services.url.handler.get_url_by_slug")
+@patch("app.services.url.handler.get_url_by_id_and_slug")
+@patch("app.services.slug_cache.get_many")
+@patch("app.services.url.visit_writer.record")
+async def test_resolve_slug_falls_back_to_slug_lookup(
+    mock_record, mock_get_many, mock_get_by_id, mock_get_by_slug, mock_db
+):
+    # A legacy row holding the larger of two ids that share a slug
+    slug = service.int_to_base62(745)
+    mock_get_many.return_value = [None, None]
+    mock_get_by_id.return_value = None
+    mock_get_by_slug.return_value = URL(id=745, slug=slug, long_url="https://x.com")
+
+    with patch("app.services.slug_cache.set_cache"):
+        url = await service.resolve_slug_and_record_visit(slug, mock_db)
+
+    assert url.id == 745
+    mock_get_by_id.assert_awaited_once_with(mock_db, 1, slug)
+    mock_record.assert_awaited_once_with(745)
+
+
+@pytest.mark.asyncio
+@patch("app.services.slug_cache.get_many")
+@patch("app.services.url.handler.get_url_by_id_and_slug")
+@patch("app.services.url.visit_writer.record")
+@pytest.mark.parametrize("slug", ["abc123", "a1b2c3d4", SLUG[:-1] + ("x" if SLUG[-1] != "x" else "y"), "a1b2c-1"])
+async def test_resolve_malformed_slug_is_rejected_before_lookup(
+    mock_record, mock_get_by_id, mock_get_many, slug, mock_db
+):
+    assert await service.resolve_slug_and_record_visit(slug, mock_db) is None
+    mock_get_many.assert_not_called()
+    mock_get_by_id.assert_not_called()
+    mock_record.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.services.slug_cache.get_many")
+@patch("app.services.url.handler.get_url_by_slug")
+@patch("app.services.url.visit_writer.record")
+async def test_resolve_slug_l1_hit_skips_redis(mock_record, mock_get_by_slug, mock_get_cache, mock_db):
+    mock_get_cache.return_value = [{"id": 1, "slug": SLUG, "long_url": "https://x.com"}, None]
+
+    await service.resolve_slug_and_record_visit(SLUG, mock_db)
+    url = await service.resolve_slug_and_record_visit(SLUG, mock_db)
+
+    assert url.long_url == "https://x.com"
+    mock_get_cache.assert_awaited_once_with(
+        [SLUG_CACHE_KEY_TEMPLATE.format(SLUG), SLUG_MISS_CACHE_KEY_TEMPLATE.format(SLUG)]
+    )
+    mock_get_by_slug.assert_not_called()
+    assert mock_record.await_count == 2
+    assert slug_cache.slug_l1.hits == 1
+
+
+@pytest.mark.asyncio
+@patch("app.services.slug_cache.get_many")
+@patch("app.services.url.handler.get_url_by_slug")
+@patch("app.services.url.visit_writer.record")
+async def test_resolve_slug_rejected_by_bloom_filter(mock_record, mock_get_by_slug, mock_get_many, mock_db):
+    mock_get_many.return_value = [None, None]
+    bloom = BloomFilter(100, 0.01)
+    bloom.add(SLUG)
+    with patch.object(slug_filter, "_filter", bloom), patch.object(slug_filter, "_current", True), \
+            patch.object(slug_filter, "_publish_skipped", False):
+        assert await service.resolve_slug_and_record_visit(service.int_to_base62(2), mock_db) is None
+        assert slug_filter.filter_stats["rejected"] >= 1
+
+    mock_get_by_slug.assert_not_called()
+    mock_record.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.services.slug_cache.get_many")
+@patch("app.services.url.handler.get_url_by_slug")
+@patch("app.services.url.visit_writer.record")
+async def test_resolve_slug_missing_from_filter_served_from_cache(mock_record, mock_get_by_slug, mock_get_many, mock_db):
+    # Created on another worker whose broadcast has not arrived yet
+    new_slug = service.int_to_base62(2)
+    mock_get_many.return_value = [{"id": 2, "slug": new_slug, "long_url": "https://new.com"}, None]
+    bloom = BloomFilter(100, 0.01)
+    with patch.object(slug_filter, "_filter", bloom):
+        url = await service.resolve_slug_and_record_visit(new_slug, mock_db)
+        assert new_slug in bloom
+
+    assert url.long_url == "https://new.com"
+    mock_record.assert_awaited_once_with(2)
+    mock_get_by_slug.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.services.url.handler.get_url_by_id_and_slug")
+@patch("app.services.url.handler.create_url")
+@patch("app.services.url.allocate_slug")
+@patch("app.services.url.handler.get_url_by_long_url")
+@patch("app.services.url.visit_writer.record")
+async def test_slug_created_with_breaker_open_resolves_on_another_worker(
+    mock_record, mock_get_by_long, mock_allocate, mock_create_url, mock_get_by_id, mock_db
+):
+    new_slug = service.int_to_base62(2)
+    fake_url = URL(id=2, slug=new_slug, long_url="https://new.com")
+    mock_get_by_long.return_value = None
+    mock_allocate.return_value = (2, new_slug)
+    mock_create_url.return_value = fake_url
+    mock_get_by_id.return_value = fake_url
+
+    with patch.object(cache.breaker, "state", OPEN), patch.object(cache.breaker, "_changed_at", time.monotonic()), \
+            patch.object(slug_filter, "_filter", BloomFilter(100, 0.01)), patch.object(slug_filter, "_publish_skipped", False):
+        # Neither the slug cache write nor the broadcast reaches Redis
+        await service.create_or_get_short_url(mock_db, "https://new.com")
+        assert slug_filter._publish_skipped
+
+    # A second worker with a freshly built filter that never heard of the slug
+    slug_cache.slug_l1.clear()
+    other = BloomFilter(100, 0.01)
+    with patch.object(cache.breaker, "state", OPEN), patch.object(cache.breaker, "_changed_at", time.monotonic()), \
+            patch.object(slug_filter, "_filter", other), patch.object(slug_filter, "_current", True), \
+            patch.object(slug_filter, "_publish_skipped", False):
+        url = await service.resolve_slug_and_record_visit(new_slug, mock_db)
+        assert new_slug in other
+
+    assert url.long_url == "https://new.com"
+    mock_get_by_id.assert_awaited_once_with(mock_db, 2, new_slug)
+    mock_record.assert_awaited_once_with(2)
+
+
+@pytest.mark.asyncio
+@patch("app.services.slug_filter.publish")
+async def test_skipped_slug_broadcast_requests_rebuild_everywhere(mock_publish):
+    mock_publish.return_value = False
+    with patch.object(slug_filter, "_publish_skipped", False), patch.object(slug_filter, "_current", True):
+        await slug_filter.add_slugs(["abc"])
+        assert slug_filter._publish_skipped
+        assert not slug_filter.can_reject()
+
+        mock_publish.return_value = True
+        await slug_filter._request_rebuild_everywhere()
+        assert not slug_filter._publish_skipped
+    mock_publish.assert_awaited_with(slug_filter.SLUG_CREATED_CHANNEL, slug_filter.REBUILD_MESSAGE)
+
+
+@pytest.mark.asyncio
+@patch("app.services.slug_cache.get_many")
+@patch("app.services.url.handler.get_url_by_slug")
+@patch("app.services.url.visit_writer.record")
+async def test_resolve_slug_negative_cache_hit_skips_db(mock_record, mock_get_by_slug, mock_get_many, mock_db):
+    mock_get_many.return_value = [None, 1]
+
+    assert await service.resolve_slug_and_record_visit(SLUG, mock_db) is None
+    mock_get_by_slug.assert_not_called()
+    mock_record.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.services.slug_cache.get_many")
+@patch("app.services.url.handler.get_url_by_slug")
+@patch("app.services.url.handler.get_url_by_id_and_slug")
+@patch("app.services.slug_cache.set_cache")
+async def test_resolve_slug_db_miss_is_negatively_cached(
+    mock_set_cache, mock_get_by_id, mock_get_by_slug, mock_get_many, mock_db
+):
+    mock_get_many.return_value = [None, None]
+    mock_get_by_id.return_value = None
+    mock_get_by_slug.return_value = None
+
+    assert await service.resolve_slug_and_record_visit(SLUG, mock_db) is None
+    mock_set_cache.assert_awaited_once()
+    assert mock_set_cache.await_args.args[0] == SLUG_MISS_CACHE_KEY_TEMPLATE.format(SLUG)
+
+
+@pytest.mark.asyncio
+@patch("app.services.url.async_session")
+@patch("app.services.slug_cache.get_many")
+@patch("app.services.url.visit_writer.record")
+async def test_resolve_slug_cache_hit_opens_no_session(mock_record, mock_get_many, mock_session):
+    mock_get_many.return_value = [{"id": 1, "slug": SLUG, "long_url": "https://x.com"}, None]
+
+    url = await service.resolve_slug_and_record_visit(SLUG)
+
+    assert url.long_url == "https://x.com"
+    mock_session.assert_not_called()
+    mock_record.assert_awaited_once_with(1)
+
+
+@pytest.mark.asyncio
+@patch("app.services.url.async_session")
+@patch("app.services.url.handler.get_url_by_id_and_slug")
+@patch("app.services.slug_cache.get_many")
+@patch("app.services.url.visit_writer.record")
+async def test_resolve_slug_cache_miss_opens_session(mock_record, mock_get_many, mock_get_by_id, mock_session, mock_db):
+    mock_get_many.return_value = [None, None]
+    mock_session.return_value.__aenter__.return_value = mock_db
+    mock_get_by_id.return_value = URL(id=1, slug=SLUG, long_url="https://x.com")
+
+    with patch("app.services.slug_cache.set_cache"):
+        url = await service.resolve_slug_and_record_visit(SLUG)
+
+    assert url.id == 1
+    mock_session.assert_called_once_with()
+    mock_get_by_id.assert_awaited_once_with(mock_db, 1, SLUG)
+
+
+@pytest.mark.asyncio
+@patch("app.services.url.slug_filter.add_slugs")
+@patch("app.services.url.slug_cache.set_slugs")
+@patch("app.services.url.handler.bulk_create_urls")
+@patch("app.services.url.id_allocator.allocate")
+@patch("app.services.url.handler.get_urls_by_long_urls")
+async def test_create_or_get_short_urls_preserves_input_order(
+    mock_get_by_long, mock_allocate, mock_bulk_create, mock_set_slugs, mock_add_slugs, mock_db
+):
+    existing = make_url(5, "old", "https://b.com")
+    mock_get_by_long.return_value = [existing]
+    mock_allocate.return_value = [10, 11]
+    mock_bulk_create.side_effect = lambda db, rows: [
+        make_url(url_id, slug, long_url) for url_id, slug, long_url in rows
+    ]
+
+    result = await service.create_or_get_short_urls(
+        mock_db, ["https://a.com", "https://b.com", "https://c.com", "https://a.com", "HTTPS://C.com"]
+    )
+
+    assert [url.id for url in result] == [10, 5, 11, 10, 11]
+    mock_get_by_long.assert_awaited_once_with(
+        mock_db, ["https://a.com", "https://b.com", "https://c.com", "HTTPS://C.com"]
+    )
+    mock_allocate.assert_awaited_once_with(mock_db, 2)
+    mock_set_slugs.assert_awaited_once()
+    mock_add_slugs.assert_awaited_once_with([service.int_to_base62(10), service.int_to_base62(11)])
+
+
+@pytest.mark.asyncio
+@patch("app.services.url.handler.bulk_create_urls")
+@patch("app.services.url.handler.get_urls_by_long_urls")
+async def test_create_or_get_short_urls_all_existing(mock_get_by_long, mock_bulk_create, mock_db):
+    mock_get_by_long.return_value = [make_url(1, "s1", "https://a.com")]
+
+    result = await service.create_or_get_short_urls(mock_db, ["https://a.com"])
+
+    assert result[0].slug == "s1"
+    mock_bulk_create.assert_not_called()
@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.handler import url as handler
+from app.services.visits import VisitWriter
+from app.utils.spool import VisitSpool
+
+
+@pytest.fixture
+def mock_bulk_create():
+    with patch("app.services.visits.handler.bulk_create_visits", new_callable=AsyncMock) as mock, \
+            patch("app.services.visits.async_session"), \
+            patch("app.services.visits.leaderboard.record_visits", new_callable=AsyncMock):
+        yield mock
+
+
+def flushed_rows(mock_bulk_create):
+    return [row for call in mock_bulk_create.await_args_list for row in call.args[1]]
+
+
+@pytest.mark.asyncio
+async def test_flushes_when_batch_is_full(mock_bulk_create):
+    writer = VisitWriter(batch_size=3, flush_interval_ms=10_000)
+    writer.start()
+    for url_id in range(3):
+        await writer.record(url_id)
+    await asyncio.sleep(0.05)
+
+    mock_bulk_create.assert_awaited_once()
+    assert [row[0] for row in flushed_rows(mock_bulk_create)] == [0, 1, 2]
+    assert writer.stats.last_flush_size == 3
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_flushes_partial_batch_after_interval(mock_bulk_create):
+    writer = VisitWriter(batch_size=100, flush_interval_ms=20)
+    writer.start()
+    await writer.record(1, datetime(2024, 1, 1))
+    await asyncio.sleep(0.1)
+
+    assert flushed_rows(mock_bulk_create) == [(1, datetime(2024, 1, 1))]
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_drains_queue(mock_bulk_create):
+    writer = VisitWriter(batch_size=2, flush_interval_ms=10_000)
+    writer.start()
+    for url_id in range(5):
+        await writer.record(url_id)
+    await writer.stop()
+
+    assert sorted(row[0] for row in flushed_rows(mock_bulk_create)) == [0, 1, 2, 3, 4]
+    assert writer.stats.rows_flushed == 5
+    assert await writer.record(6) is False
+
+
+@pytest.mark.asyncio
+async def test_drops_visit_when_queue_stays_full(mock_bulk_create):
+    writer = VisitWriter(max_queue_size=1, enqueue_timeout_ms=10)
+    assert await writer.record(1) is True
+    assert await writer.record(2) is False
+    assert writer.stats.dropped == 1
+    assert writer.stats.backpressure_waits == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_is_counted(mock_bulk_create):
+    mock_bulk_create.side_effect = RuntimeError("db down")
+    writer = VisitWriter(batch_size=1)
+    writer.start()
+    await writer.record(1)
+    await writer.stop()
+
+    assert writer.stats.failed_rows == 1
+    assert writer.stats.rows_flushed == 0
+
+
+@pytest.mark.asyncio
+@patch("app.services.visits.visit_stream.append", new_callable=AsyncMock)
+async def test_stream_sink_appends_instead_of_inserting(mock_append, mock_bulk_create):
+    writer = VisitWriter(batch_size=2, flush_interval_ms=10_000, sink="stream")
+    writer.start()
+    await writer.record(1, datetime(2024, 1, 1))
+    await writer.record(2, datetime(2024, 1, 1))
+    await writer.stop()
+
+    mock_append.assert_awaited_once_with([(1, datetime(2024, 1, 1)), (2, datetime(2024, 1, 1))])
+    mock_bulk_create.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_is_spooled_and_replayed(mock_bulk_create, tmp_path):
+    spool = VisitSpool(str(tmp_path), segment_max_bytes=1 << 20, fsync_interval_ms=0)
+    writer = VisitWriter(batch_size=2, flush_interval_ms=10_000, spool=spool)
+    mock_bulk_create.side_effect = RuntimeError("db down")
+    writer.start()
+    await writer.record(1, datetime(2024, 1, 1))
+    await writer.record(2, datetime(2024, 1, 1))
+    await asyncio.sleep(0.05)
+
+    assert writer.stats.spooled_rows == 2
+    assert writer.stats.failed_rows == 0
+    with pytest.raises(RuntimeError):
+        await writer.replay_spool()
+
+    mock_bulk_create.side_effect = None
+    mock_bulk_create.reset_mock()
+    assert await writer.replay_spool() == 2
+    assert flushed_rows(mock_bulk_create) == [(1, datetime(2024, 1, 1)), (2, datetime(2024, 1, 1))]
+    assert spool.segments() == []
+    assert writer.stats.replayed_rows == 2
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_replay_of_many_distinct_urls_stays_under_bind_param_limit(tmp_path):
+    spool = VisitSpool(str(tmp_path), segment_max_bytes=1 << 20, fsync_interval_ms=0)
+    visits = [(url_id, datetime(2024, 1, 1, 10)) for url_id in range(5000)]
+    spool.append(visits)
+    spool.seal()
+    db = AsyncMock(spec=AsyncSession)
+    session = MagicMock()
+    session.return_value.__aenter__.return_value = db
+    writer = VisitWriter(batch_size=100, flush_interval_ms=10_000, spool=spool)
+
+    with patch("app.services.visits.async_session", session), \
+            patch("app.services.visits.leaderboard.record_visits", new_callable=AsyncMock):
+        assert await writer.replay_spool(batch_records=5000) == 5000
+
+    for call in db.execute.await_args_list:
+        assert len(call.args[0].compile(dialect=postgresql.dialect()).params) <= handler.MAX_BIND_PARAMS
+    db.commit.assert_awaited_once()
+    assert spool.segments() == []
@@ -0,0 +1,29 @@
+from app.utils.bloom import BloomFilter
+
+
+def test_added_items_are_always_found():
+    bloom = BloomFilter(1000, 0.01)
+    items = [f"slug{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    assert bloom.count == 1000
+
+
+def test_false_positive_rate_stays_near_target():
+    bloom = BloomFilter(10000, 0.01)
+    for i in range(10000):
+        bloom.add(f"present{i}")
+
+    false_positives = sum(f"absent{i}" in bloom for i in range(10000))
+
+    assert false_positives / 10000 < 0.02
+    assert 0.005 < bloom.estimated_false_positive_rate() < 0.015
+
+
+def test_empty_filter_rejects_everything():
+    bloom = BloomFilter(100, 0.01)
+
+    assert "abc123" not in bloom
+    assert bloom.estimated_false_positive_rate() == 0
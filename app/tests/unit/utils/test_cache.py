@@ -0,0 +1,150 @@
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.utils import cache
+
+
+class FakeRedis:
+    """Just enough of the redis client for the cache helpers."""
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    async def get(self, key):
+        self.round_trips += 1
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        self.round_trips += 1
+        return [self.data.get(key) for key in keys]
+
+    async def delete(self, *keys):
+        self.round_trips += 1
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def eval(self, script, numkeys, key, token):
+        if self.data.get(key) == token:
+            del self.data[key]
+            return 1
+        return 0
+
+
+class FakePipeline:
+    def __init__(self, fake):
+        self.fake = fake
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def setex(self, key, ttl, value):
+        self.commands.append((key, value))
+
+    async def execute(self):
+        self.fake.round_trips += 1
+        self.fake.data.update(self.commands)
+
+
+@pytest.fixture
+def fake_redis():
+    fake = FakeRedis()
+    with patch("app.utils.cache.client", fake):
+        yield fake
+
+
+def store(fake, key, value, fresh_for):
+    fake.data[key] = json.dumps({"value": value, "fresh_until": time.time() + fresh_for})
+
+
+@pytest.mark.asyncio
+async def test_get_or_refresh_returns_fresh_value_without_compute(fake_redis):
+    store(fake_redis, "k", [1], fresh_for=60)
+    compute = AsyncMock()
+
+    assert await cache.get_or_refresh("k", compute, soft_ttl=10, hard_ttl=60) == [1]
+    compute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_or_refresh_recomputes_stale_value_and_releases_lock(fake_redis):
+    store(fake_redis, "k", [1], fresh_for=-1)
+    compute = AsyncMock(return_value=[2])
+
+    assert await cache.get_or_refresh("k", compute, soft_ttl=10, hard_ttl=60) == [2]
+    assert json.loads(fake_redis.data["k"])["value"] == [2]
+    assert "lock:k" not in fake_redis.data
+
+
+@pytest.mark.asyncio
+async def test_get_or_refresh_serves_stale_while_another_worker_refreshes(fake_redis):
+    store(fake_redis, "k", [1], fresh_for=-1)
+    fake_redis.data["lock:k"] = "other-worker"
+    compute = AsyncMock(return_value=[2])
+
+    assert await cache.get_or_refresh("k", compute, soft_ttl=10, hard_ttl=60) == [1]
+    compute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_or_refresh_single_flight_on_cold_key(fake_redis):
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return ["top"]
+
+    results = await asyncio.gather(
+        *(cache.get_or_refresh("k", compute, soft_ttl=10, hard_ttl=60) for _ in range(5))
+    )
+
+    assert results == [["top"]] * 5
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_helpers_use_one_round_trip_each(fake_redis):
+    values = {f"k{i}": {"id": i} for i in range(1000)}
+
+    await cache.set_many(values)
+    assert await cache.get_many(list(values) + ["missing"]) == list(values.values()) + [None]
+    assert await cache.delete_many(list(values)) == 1000
+    assert fake_redis.data == {}
+    assert fake_redis.round_trips == 3
+
+
+@pytest.mark.asyncio
+async def test_delete_cache_does_not_read_first(fake_redis):
+    fake_redis.data["k"] = "1"
+
+    await cache.delete_cache("k")
+
+    assert fake_redis.data == {}
+    assert fake_redis.round_trips == 1
+
+
+@pytest.mark.asyncio
+async def test_non_json_values_round_trip_as_strings(fake_redis):
+    await cache.set_cache("k", "plain")
+    fake_redis.data["raw"] = "not json"
+
+    assert await cache.get_many(["k", "raw"]) == ["plain", "not json"]
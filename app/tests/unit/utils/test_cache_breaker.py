@@ -0,0 +1,147 @@
+import asyncio
+import pytest
+import redis.asyncio as redis
+from unittest.mock import AsyncMock, patch
+from app.utils import cache
+from app.utils.circuit_breaker import CircuitBreaker, OPEN, CLOSED
+
+
+class StandInRedis:
+    """Local TCP server speaking just enough RESP for GET/SET/MGET, with failure modes.
+
+    mode "ok" answers, "stall" reads commands but never replies, "drop" closes the connection.
+    """
+
+    def __init__(self):
+        self.mode = "ok"
+        self.data = {}
+        self.commands = 0
+        self.server = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _read_command(self, reader):
+        header = await reader.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            length = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(length + 2))[:-2].decode())
+        return args
+
+    async def _handle(self, reader, writer):
+        try:
+            while (args := await self._read_command(reader)) is not None:
+                self.commands += 1
+                if self.mode == "drop":
+                    writer.close()
+                    return
+                if self.mode == "stall":
+                    continue
+                writer.write(self._reply(args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _reply(self, args) -> bytes:
+        command = args[0].upper()
+        if command == "GET":
+            return self._bulk(self.data.get(args[1]))
+        if command == "MGET":
+            return b"*%d\r\n" % (len(args) - 1) + b"".join(self._bulk(self.data.get(k)) for k in args[1:])
+        if command in ("SETEX", "SET"):
+            key, value = (args[1], args[3]) if command == "SETEX" else (args[1], args[2])
+            self.data[key] = value
+            return b"+OK\r\n"
+        return b"+OK\r\n"
+
+    @staticmethod
+    def _bulk(value) -> bytes:
+        if value is None:
+            return b"_\r\n"  # RESP3 null; redis-py negotiates RESP3 with HELLO
+        data = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+@pytest.fixture
+async def stand_in():
+    server = StandInRedis()
+    port = await server.start()
+    client = redis.StrictRedis(
+        host="127.0.0.1", port=port, decode_responses=True, socket_timeout=0.05, socket_connect_timeout=0.05,
+        retry=cache.NO_RETRY,
+    )
+    breaker = CircuitBreaker("redis", failure_threshold=2, reset_timeout_s=0.1)
+    with patch("app.utils.cache.client", client), patch("app.utils.cache.breaker", breaker):
+        yield server, breaker
+    await client.aclose()
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_cache_works_through_healthy_stand_in(stand_in):
+    server, breaker = stand_in
+
+    await cache.set_cache("k", {"a": 1})
+
+    assert await cache.get_cache("k") == {"a": 1}
+    assert await cache.get_many(["k", "missing"]) == [{"a": 1}, None]
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["stall", "drop"])
+async def test_failures_degrade_to_misses_and_open_breaker(stand_in, mode):
+    server, breaker = stand_in
+    server.data["k"] = '"v"'
+    server.mode = mode
+
+    started = asyncio.get_running_loop().time()
+    assert await cache.get_cache("k") is None
+    assert await cache.get_many(["k"]) == [None]
+    assert asyncio.get_running_loop().time() - started < 1
+
+    assert breaker.state == OPEN
+    seen = server.commands
+    assert await cache.get_cache("k") is None
+    await cache.set_cache("k", "x")
+    assert server.commands == seen
+    assert breaker.rejected == 2
+
+
+@pytest.mark.asyncio
+async def test_breaker_probes_and_recovers(stand_in):
+    server, breaker = stand_in
+    server.data["k"] = '"v"'
+    server.mode = "stall"
+    await cache.get_cache("k")
+    await cache.get_cache("k")
+    assert breaker.state == OPEN
+
+    server.mode = "ok"
+    await asyncio.sleep(0.15)
+
+    assert await cache.get_cache("k") == "v"
+    assert breaker.state == CLOSED
+    assert breaker.transitions["half_open->closed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_refresh_computes_directly_while_open(stand_in):
+    server, breaker = stand_in
+    server.mode = "drop"
+    await cache.get_cache("a")
+    await cache.get_cache("a")
+    compute = AsyncMock(return_value=[1])
+
+    assert await cache.get_or_refresh("k", compute, soft_ttl=10, hard_ttl=60) == [1]
+    compute.assert_awaited_once()
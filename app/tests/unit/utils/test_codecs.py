@@ -0,0 +1,29 @@
+import pytest
+from app.utils import codecs
+from app.utils.codecs import JsonCodec, OrjsonCodec, get_codec
+
+VALUE = {"id": 1, "slug": "a1b2c3d", "long_url": "https://example.com/ü", "tags": [1.5, None, True]}
+
+
+def test_json_codec_round_trips_compactly():
+    data = JsonCodec().dumps(VALUE)
+
+    assert ", " not in data and ": " not in data
+    assert JsonCodec().loads(data) == VALUE
+
+
+@pytest.mark.skipif(codecs.orjson is None, reason="orjson is not installed")
+def test_orjson_and_json_read_each_other():
+    assert OrjsonCodec().loads(JsonCodec().dumps(VALUE)) == VALUE
+    assert JsonCodec().loads(OrjsonCodec().dumps(VALUE)) == VALUE
+
+
+def test_get_codec_falls_back_to_json_without_orjson(monkeypatch):
+    monkeypatch.setattr(codecs, "orjson", None)
+
+    assert isinstance(get_codec("orjson"), JsonCodec)
+
+
+def test_get_codec_rejects_unknown_names():
+    with pytest.raises(ValueError):
+        get_codec("pickle")
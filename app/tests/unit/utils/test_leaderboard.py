@@ -0,0 +1,126 @@
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.utils import leaderboard
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    async def execute(self, raise_on_error=True):
+        results = []
+        for name, args, kwargs in self.calls:
+            try:
+                results.append(await getattr(self.redis, name)(*args, **kwargs))
+            except KeyError as e:
+                if raise_on_error:
+                    raise
+                results.append(e)
+        return results
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeRedis:
+    """Just enough of Redis for the leaderboard, with the record script run in Python."""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def eval(self, script, numkeys, *args):
+        assert script is leaderboard._RECORD_SCRIPT
+        keys, argv = args[:numkeys], args[numkeys:]
+        rebuilding = keys[4] in self.data
+        for i in range(0, len(argv), 3):
+            url_id, count, last = argv[i:i + 3]
+            await self.zincrby(keys[0], count, url_id)
+            await self.hset(keys[1], url_id, last)
+            if rebuilding:
+                await self.zincrby(keys[2], count, url_id)
+                await self.hset(keys[3], url_id, last)
+
+    async def zincrby(self, key, amount, member):
+        zset = self.data.setdefault(key, {})
+        zset[str(member)] = zset.get(str(member), 0) + amount
+
+    async def hset(self, key, field=None, value=None, mapping=None):
+        self.data.setdefault(key, {}).update(mapping or {str(field): value})
+
+    async def hsetnx(self, key, field, value):
+        self.data.setdefault(key, {}).setdefault(str(field), value)
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def rename(self, src, dst):
+        self.data[dst] = self.data.pop(src)
+
+    async def zrevrange(self, key, start, end, withscores=False):
+        ranked = sorted(self.data.get(key, {}).items(), key=lambda item: -item[1])
+        return ranked[start:end + 1]
+
+
+def url_row(url_id, visits):
+    return SimpleNamespace(
+        url_id=url_id, slug=f"s{url_id}", long_url=f"https://{url_id}.com", visits=visits,
+        last_visit=datetime(2024, 1, 1),
+    )
+
+
+@pytest.fixture
+def redis():
+    fake = FakeRedis()
+    with patch("app.utils.leaderboard.cache.client", fake):
+        yield fake
+
+
+@pytest.mark.asyncio
+async def test_visits_recorded_during_rebuild_survive_the_swap(redis):
+    await leaderboard.start_rebuild(ttl=60)
+    # Committed after the url_stats snapshot, so only the staged delta carries them
+    await leaderboard.record_visits([(1, datetime(2024, 1, 2)), (2, datetime(2024, 1, 2))])
+    await leaderboard.load_rebuild_batch([url_row(1, 10), url_row(3, 4)])
+    await leaderboard.swap_rebuild()
+
+    assert await leaderboard.top(10) == [(1, 11), (3, 4), (2, 1)]
+    assert redis.data[leaderboard.LAST_VISIT_KEY]["1"] == datetime(2024, 1, 2).isoformat()
+    assert leaderboard.REBUILDING_KEY not in redis.data
+
+    await leaderboard.record_visits([(3, datetime(2024, 1, 3))])
+    assert leaderboard.LEADERBOARD_KEY + leaderboard.REBUILD_SUFFIX not in redis.data
+    assert await leaderboard.top(10) == [(1, 11), (3, 5), (2, 1)]
+
+
+@pytest.mark.asyncio
+async def test_leaderboard_recreated_after_flush_is_not_built(redis):
+    await leaderboard.start_rebuild(ttl=60)
+    await leaderboard.load_rebuild_batch([url_row(1, 10)])
+    await leaderboard.swap_rebuild()
+    assert await leaderboard.is_built()
+
+    redis.data.clear()
+    await leaderboard.record_visits([(2, datetime(2024, 1, 2))])
+
+    assert await redis.exists(leaderboard.LEADERBOARD_KEY)
+    assert not await leaderboard.is_built()
+    assert await leaderboard.top(10) == []
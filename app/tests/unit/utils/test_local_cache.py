@@ -0,0 +1,46 @@
+from unittest.mock import patch
+from app.utils.local_cache import LRUCache
+
+
+def test_get_returns_value_and_counts_hits():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_expired_entries_are_misses():
+    cache = LRUCache(maxsize=2, ttl=10)
+    with patch("app.utils.local_cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("app.utils.local_cache.time.monotonic", return_value=111.0):
+        assert cache.get("a") is None
+
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+
+def test_delete_and_clear():
+    cache = LRUCache(maxsize=4, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.delete("a") is True
+    assert cache.delete("a") is False
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,72 @@
+import pytest
+from app.utils import metrics
+from app.utils.metrics import Counter, Gauge, Histogram
+
+
+@pytest.fixture(autouse=True)
+def isolated_registry(monkeypatch):
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+    monkeypatch.setattr(metrics, "_collect_hooks", [])
+    monkeypatch.setattr(metrics, "_async_collect_hooks", [])
+
+
+def test_counter_renders_each_label_set():
+    requests = Counter("requests_total", "Requests", ("route",))
+    requests.labels("/a").inc()
+    requests.labels("/a").inc(2)
+    requests.labels('/"b"').inc()
+
+    assert metrics.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a"} 3',
+        'requests_total{route="/\\"b\\""} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    latency = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    lines = metrics.render().splitlines()
+
+    assert lines[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1.0"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 3.65",
+        "latency_seconds_count 4",
+    ]
+
+
+def test_collect_hooks_refresh_gauges_before_render():
+    depth = Gauge("queue_depth", "Depth")
+    metrics.on_collect(lambda: depth.set(7))
+
+    assert "queue_depth 7" in metrics.render()
+
+
+@pytest.mark.asyncio
+async def test_async_collect_hooks_run_and_failures_keep_last_values():
+    lag = Gauge("stream_lag", "Lag")
+    lag.set(3)
+
+    async def failing():
+        raise ConnectionError("redis down")
+
+    async def refresh():
+        lag.set(5)
+
+    metrics.on_collect_async(failing)
+    await metrics.collect_async()
+    assert "stream_lag 3" in metrics.render()
+
+    metrics.on_collect_async(refresh)
+    await metrics.collect_async()
+    assert "stream_lag 5" in metrics.render()
+
+
+def test_labels_must_match_label_names():
+    with pytest.raises(ValueError):
+        Counter("c_total", "C", ("a", "b")).labels("x")
@@ -0,0 +1,90 @@
+import asyncio
+import time
+from app.utils.profiler import StackSampler, TRUNCATED
+
+
+def busy_work(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(100))
+
+
+def unprofiled_work(seconds):
+    busy_work(seconds)
+
+
+async def profiled(sampler, route, work, seconds):
+    sampler.start_request(route)
+    try:
+        work(seconds)
+    finally:
+        sampler.end_request()
+
+
+async def test_samples_are_collapsed_under_the_route():
+    sampler = StackSampler(interval_ms=1, max_stacks=1000)
+
+    await profiled(sampler, "GET /{slug}", busy_work, 0.1)
+
+    lines = sampler.collapsed().splitlines()
+    assert sampler.samples > 10
+    assert all(line.startswith("GET /{slug};") for line in lines)
+    assert any("test_profiler.py:busy_work" in line for line in lines)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == sampler.samples
+
+
+async def test_samples_of_unprofiled_tasks_are_not_attributed():
+    sampler = StackSampler(interval_ms=1, max_stacks=1000)
+
+    async def profiled_request():
+        sampler.start_request("GET /stats")
+        try:
+            # Longer than the GIL switch interval, so that samples land inside the work
+            for _ in range(4):
+                busy_work(0.03)
+                await asyncio.sleep(0)
+        finally:
+            sampler.end_request()
+
+    async def other_request():
+        for _ in range(4):
+            unprofiled_work(0.03)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(profiled_request(), other_request())
+
+    assert sampler.samples > 0
+    assert sampler.other_samples > 0
+    assert "unprofiled_work" not in sampler.collapsed()
+
+
+def test_no_thread_and_no_samples_until_a_request_is_profiled():
+    sampler = StackSampler(interval_ms=1, max_stacks=1000)
+    busy_work(0.02)
+
+    assert sampler._thread is None
+    assert sampler.collapsed() == ""
+
+
+async def test_sampling_stops_when_the_request_ends():
+    sampler = StackSampler(interval_ms=1, max_stacks=1000)
+    await profiled(sampler, "POST /shorten", busy_work, 0.02)
+    time.sleep(0.01)
+    samples = sampler.samples
+
+    busy_work(0.05)
+
+    assert sampler.samples == samples
+
+
+async def test_distinct_stacks_are_capped():
+    sampler = StackSampler(interval_ms=1, max_stacks=1)
+
+    def work(seconds):
+        busy_work(seconds)
+        time.sleep(0.02)
+
+    await profiled(sampler, "GET /stats", work, 0.05)
+
+    assert sampler.stats()["distinct_stacks"] <= 2
+    assert TRUNCATED in sampler.collapsed()
@@ -0,0 +1,82 @@
+import pytest
+from hypothesis import given, strategies as st
+from app.utils.slug_codec import (
+    BASE62_CHARS, MAX_ID, SHORT_ID_LIMIT, int_to_base62, base62_to_int, encode_many, is_canonical
+)
+
+short_ids = st.integers(min_value=0, max_value=SHORT_ID_LIMIT - 1)
+ids = st.one_of(short_ids, st.integers(min_value=0, max_value=MAX_ID))
+
+
+@given(short_ids)
+def test_decode_returns_smallest_id_sharing_the_slug(n):
+    slug = int_to_base62(n)
+    decoded = base62_to_int(slug)
+
+    assert decoded <= n
+    assert int_to_base62(decoded) == slug
+
+
+@given(ids)
+def test_canonical_ids_round_trip(n):
+    if is_canonical(n):
+        assert base62_to_int(int_to_base62(n)) == n
+    else:
+        assert is_canonical(base62_to_int(int_to_base62(n)))
+
+
+@given(ids, st.sampled_from(BASE62_CHARS))
+def test_wrong_checksum_is_rejected(n, check):
+    slug = int_to_base62(n)
+    if check != slug[-1]:
+        with pytest.raises(ValueError):
+            base62_to_int(slug[:-1] + check)
+
+
+@given(st.text(alphabet=BASE62_CHARS + "-_!", max_size=10))
+def test_arbitrary_text_decodes_only_to_its_own_slug(text):
+    try:
+        decoded = base62_to_int(text)
+    except ValueError:
+        return
+    assert int_to_base62(decoded) == text
+
+
+def test_known_collision_resolves_to_smaller_id():
+    assert int_to_base62(1) == int_to_base62(745)
+    assert base62_to_int(int_to_base62(745)) == 1
+    assert is_canonical(1)
+    assert not is_canonical(745)
+
+
+@pytest.mark.parametrize("n", [0, 1, 61, 62, 62**5, 62**6 - 1, 62**6, 62**7, MAX_ID])
+def test_range_boundaries_round_trip(n):
+    assert base62_to_int(int_to_base62(n)) == n
+
+
+@given(st.integers(min_value=SHORT_ID_LIMIT, max_value=MAX_ID))
+def test_long_ids_get_longer_slugs_and_always_round_trip(n):
+    slug = int_to_base62(n)
+
+    assert len(slug) >= 8
+    assert is_canonical(n)
+    assert base62_to_int(slug) == n
+
+
+def test_short_slugs_are_unchanged():
+    assert int_to_base62(1) == "a1b2c18"
+    assert len(int_to_base62(SHORT_ID_LIMIT - 1)) == 7
+
+
+@pytest.mark.parametrize("n", [-1, MAX_ID + 1])
+def test_out_of_range_ids_are_rejected(n):
+    with pytest.raises(ValueError):
+        int_to_base62(n)
+
+
+@given(st.lists(ids, max_size=50), st.integers(min_value=0, max_value=MAX_ID - 2000), st.integers(0, 2000))
+def test_encode_many_matches_single_encoding(scattered, start, size):
+    block = list(range(start, start + size))
+
+    assert encode_many(scattered) == [int_to_base62(n) for n in scattered]
+    assert encode_many(block) == [int_to_base62(n) for n in block]
@@ -0,0 +1,19 @@
+from app.utils.url_hash import normalize_url, long_url_digest
+
+
+def test_normalize_lowercases_scheme_and_host_only():
+    assert normalize_url("  HTTPS://Example.COM/Path?Q=1 ") == "https://example.com/Path?Q=1"
+
+
+def test_normalize_keeps_userinfo_case():
+    assert normalize_url("https://User:Pw@Example.COM:8443/") == "https://User:Pw@example.com:8443/"
+    assert long_url_digest("https://User:Pw@h/") != long_url_digest("https://user:pw@h/")
+    assert long_url_digest("https://user:pw@H/") == long_url_digest("https://user:pw@h/")
+
+
+def test_digest_is_fixed_width_and_normalized():
+    digest = long_url_digest("https://example.com/a")
+
+    assert len(digest) == 32
+    assert digest == long_url_digest("HTTPS://EXAMPLE.com/a")
+    assert digest != long_url_digest("https://example.com/A")
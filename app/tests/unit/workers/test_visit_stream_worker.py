@@ -0,0 +1,93 @@
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+from app.workers.visits import VisitStreamWorker
+
+VISIT = (1, datetime(2024, 1, 1))
+
+
+@pytest.fixture
+def mock_stream():
+    with patch("app.workers.visits.visit_stream") as mock:
+        mock.CLAIM_START = "0-0"
+        mock.ensure_group = AsyncMock()
+        mock.claim_stale = AsyncMock(return_value=("0-0", []))
+        mock.delivery_counts = AsyncMock(return_value={})
+        mock.dead_letter = AsyncMock()
+        mock.read = AsyncMock(return_value=[])
+        mock.ack = AsyncMock()
+        yield mock
+
+
+@pytest.mark.asyncio
+@patch("app.workers.visits.store_visits")
+async def test_acks_only_after_store(mock_store, mock_stream):
+    calls = []
+    mock_store.side_effect = lambda visits: calls.append("store")
+    mock_stream.ack.side_effect = lambda ids: calls.append("ack")
+    worker = VisitStreamWorker(consumer="w1")
+
+    await worker.process([("1-0", VISIT), ("2-0", VISIT)])
+
+    mock_store.assert_awaited_once_with([VISIT, VISIT])
+    mock_stream.ack.assert_awaited_once_with(["1-0", "2-0"])
+    assert calls == ["store", "ack"]
+    assert worker.processed == 2
+
+
+@pytest.mark.asyncio
+@patch("app.workers.visits.store_visits")
+async def test_failed_store_leaves_entries_pending(mock_store, mock_stream):
+    mock_store.side_effect = RuntimeError("db down")
+    worker = VisitStreamWorker(consumer="w1")
+
+    with pytest.raises(RuntimeError):
+        await worker.process([("1-0", VISIT)])
+
+    mock_stream.ack.assert_not_called()
+
+
+@pytest.mark.asyncio
+@patch("app.workers.visits.store_visits")
+async def test_malformed_entries_are_acked_and_discarded(mock_store, mock_stream):
+    worker = VisitStreamWorker(consumer="w1")
+
+    await worker.process([("1-0", None), ("2-0", VISIT)])
+
+    mock_store.assert_awaited_once_with([VISIT])
+    mock_stream.ack.assert_awaited_once_with(["1-0", "2-0"])
+    assert worker.discarded == 1
+
+
+@pytest.mark.asyncio
+@patch("app.workers.visits.store_visits")
+async def test_run_claims_stale_entries_before_reading_new_ones(mock_store, mock_stream):
+    worker = VisitStreamWorker(consumer="w1", claim_idle_ms=60_000)
+    mock_stream.claim_stale.side_effect = [("5-0", [("1-0", VISIT)]), ("0-0", [])]
+
+    async def read(consumer, count, block_ms):
+        worker.stop()
+        return [("2-0", VISIT)]
+
+    mock_stream.read.side_effect = read
+
+    await worker.run()
+
+    assert [call.args[0] for call in mock_store.await_args_list] == [[VISIT], [VISIT]]
+    assert mock_stream.claim_stale.await_count == 2
+    # The second claim continues after the first instead of starting over
+    mock_stream.claim_stale.assert_awaited_with("w1", 60_000, worker._batch_size, "5-0")
+
+
+@pytest.mark.asyncio
+async def test_claim_dead_letters_entries_delivered_too_often(mock_stream):
+    worker = VisitStreamWorker(consumer="w1", max_deliveries=3)
+    mock_stream.claim_stale.return_value = ("3-0", [("1-0", VISIT), ("2-0", VISIT)])
+    mock_stream.delivery_counts.return_value = {"1-0": 4, "2-0": 2}
+
+    entries = await worker.claim()
+
+    assert entries == [("2-0", VISIT)]
+    mock_stream.dead_letter.assert_awaited_once_with([("1-0", VISIT)])
+    assert worker.dead_lettered == 1
+    assert worker._claim_cursor == "3-0"
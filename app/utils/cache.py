@@ -1,35 +1,249 @@
-from app.config import REDIS_HOST, REDIS_PORT
+from app.config import (
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_SOCKET_TIMEOUT_MS,
+    REDIS_CONNECT_TIMEOUT_MS,
+    REDIS_BREAKER_FAILURE_THRESHOLD,
+    REDIS_BREAKER_RESET_S,
+    CACHE_CODEC,
+)
 import redis.asyncio as redis
-import json
-from typing import Optional, Any
+from redis.asyncio.retry import Retry
+from redis.backoff import NoBackoff
+from redis.exceptions import RedisError
+import functools
+import logging
+from typing import Optional, Any, Awaitable, Callable
+import asyncio
 import os
+import time
+import uuid
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.codecs import get_codec
+from app.utils.metrics import Counter
 
-client = redis.StrictRedis(
-    host=REDIS_HOST,
-    port=REDIS_PORT,
-    decode_responses=True
-)
+logger = logging.getLogger(__name__)
 
-async def get_cache(key: str) -> Optional[Any]:
-    """Retrieve a cached value by key, deserializing if needed."""
-    value = await client.get(key)
+# Failed commands are not retried: a stalled Redis would cost a socket timeout per attempt,
+# and the breaker below decides when to try again
+NO_RETRY = Retry(NoBackoff(), 0)
+
+# Created by init_client() in the app lifespan (or a worker's main) and closed by close_client()
+client: redis.StrictRedis | None = None
+# For commands that wait server-side (SUBSCRIBE, XREADGROUP BLOCK), which the socket timeout would cut off
+blocking_client: redis.StrictRedis | None = None
+
+codec = get_codec(CACHE_CODEC)
+
+def init_client() -> None:
+    """Create the Redis clients. Connections are opened lazily by the first command."""
+    global client, blocking_client
+    if client is not None:
+        return
+    client = redis.StrictRedis(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        decode_responses=True,
+        socket_timeout=REDIS_SOCKET_TIMEOUT_MS / 1000,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT_MS / 1000,
+        retry=NO_RETRY,
+    )
+    blocking_client = redis.StrictRedis(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        decode_responses=True,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT_MS / 1000,
+    )
+
+async def close_client() -> None:
+    """Close both clients and their connection pools."""
+    global client, blocking_client
+    for c in (client, blocking_client):
+        if c is not None:
+            await c.aclose()
+    client = blocking_client = None
+
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"))
+
+breaker = CircuitBreaker("redis", REDIS_BREAKER_FAILURE_THRESHOLD, REDIS_BREAKER_RESET_S)
+
+REDIS_ERRORS = (RedisError, OSError, asyncio.TimeoutError)
+
+def _guarded(fallback: Callable[..., Any] = lambda *args, **kwargs: None):
+    """Run a cache call through the breaker; failures and open-breaker calls return `fallback(*args)`.
+
+    Callers therefore see a cache miss (or a skipped write) instead of an error while Redis is down.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not breaker.allow():
+                return fallback(*args, **kwargs)
+            try:
+                result = await func(*args, **kwargs)
+            except REDIS_ERRORS as e:
+                breaker.record_failure()
+                logger.warning(f"Redis call {func.__name__} failed: {e!r}")
+                return fallback(*args, **kwargs)
+            breaker.record_success()
+            return result
+        return wrapper
+    return decorator
+
+def _serialize(value: Any) -> str:
+    try:
+        return codec.dumps(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+def _deserialize(value: Optional[str]) -> Optional[Any]:
     if value is None:
         return None
     try:
-        return json.loads(value)
-    except json.JSONDecodeError:
+        return codec.loads(value)
+    except ValueError:
         return value
 
+@_guarded()
+async def get_cache(key: str) -> Optional[Any]:
+    """Retrieve a cached value by key, deserializing if needed."""
+    return _deserialize(await client.get(key))
+
+@_guarded(lambda keys: [None] * len(keys))
+async def get_many(keys: list[str]) -> list[Optional[Any]]:
+    """Retrieve several cached values with a single MGET, in key order."""
+    if not keys:
+        return []
+    return [_deserialize(value) for value in await client.mget(keys)]
+
+@_guarded()
 async def set_cache(key: str, value: Any, ttl: int = 3600) -> None:
-    """Set a value in cache, serializing to JSON if needed."""
-    try:
-        serialized = json.dumps(value)
-    except (TypeError, ValueError):
-        serialized = str(value)
-    await client.setex(key, ttl, serialized)
+    """Set a value in cache, serialized with the configured codec."""
+    await client.setex(key, ttl, _serialize(value))
 
+@_guarded()
+async def set_many(mapping: dict[str, Any], ttl: int = 3600) -> None:
+    """Set several values with one pipelined round trip."""
+    if not mapping:
+        return
+    async with client.pipeline(transaction=False) as pipe:
+        for key, value in mapping.items():
+            pipe.setex(key, ttl, _serialize(value))
+        await pipe.execute()
+
+@_guarded()
 async def delete_cache(key: str) -> None:
     """Delete a key from the cache."""
-    exists = await client.get(key)
-    if exists:
-        await client.delete(key)
+    await client.delete(key)
+
+@_guarded(lambda keys: 0)
+async def delete_many(keys: list[str]) -> int:
+    """Delete several keys with a single DEL. Returns how many existed."""
+    if not keys:
+        return 0
+    return await client.delete(*keys)
+
+@_guarded(lambda channel, message: False)
+async def publish(channel: str, message: str) -> bool:
+    """Broadcast a message to every subscriber of a channel. False if it could not be sent."""
+    await client.publish(channel, message)
+    return True
+
+async def subscribe(channel: str, subscribed: asyncio.Event | None = None):
+    """Yield messages published on a channel until the connection fails.
+
+    `subscribed` is set once the server has confirmed the subscription.
+    """
+    pubsub = blocking_client.pubsub()
+    await pubsub.subscribe(channel)
+    try:
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                yield message["data"]
+            elif message["type"] == "subscribe" and subscribed is not None:
+                subscribed.set()
+    finally:
+        await pubsub.aclose()
+
+async def server_stats() -> dict:
+    """Return Redis keyspace hit/miss/eviction counters as reported by the server."""
+    info = await client.info("stats")
+    return {
+        "keyspace_hits": info.get("keyspace_hits"),
+        "keyspace_misses": info.get("keyspace_misses"),
+        "evicted_keys": info.get("evicted_keys"),
+        "expired_keys": info.get("expired_keys"),
+    }
+
+async def acquire_lock(name: str, ttl: int) -> bool:
+    """Best-effort cross-worker lock, released by expiry."""
+    return bool(await client.set(f"lock:{name}", "1", nx=True, ex=ttl))
+
+# Deletes the lock only if it still holds our token, so an expired lock taken over by another worker is kept
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+async def get_or_refresh(
+    key: str,
+    compute: Callable[[], Awaitable[Any]],
+    soft_ttl: int,
+    hard_ttl: int,
+    lock_ttl: int = 10,
+    wait_timeout: float = 2.0,
+    name: str = "other",
+) -> Any:
+    """Stale-while-revalidate read-through cache with a single-flight recompute.
+
+    Values are fresh for `soft_ttl` seconds and kept for `hard_ttl`. Once a value is stale, the one
+    caller that wins `lock:{key}` recomputes it while everybody else keeps getting the stale copy.
+    On a hard miss, callers that lose the lock wait up to `wait_timeout` for the winner's result
+    before computing it themselves. While the Redis breaker is open the value is computed directly.
+    Lookups are counted in `cache_lookups_total` under `name`.
+    """
+    if not breaker.closed:
+        CACHE_LOOKUPS.labels(name, "bypass").inc()
+        return await compute()
+    entry = await get_cache(key)
+    if isinstance(entry, dict) and "fresh_until" in entry:
+        if entry["fresh_until"] > time.time():
+            CACHE_LOOKUPS.labels(name, "hit").inc()
+            return entry["value"]
+        CACHE_LOOKUPS.labels(name, "stale").inc()
+        stale = entry["value"]
+    else:
+        CACHE_LOOKUPS.labels(name, "miss").inc()
+        stale = None
+        entry = None
+
+    lock_key = f"lock:{key}"
+    token = uuid.uuid4().hex
+    try:
+        acquired = await client.set(lock_key, token, nx=True, ex=lock_ttl)
+    except REDIS_ERRORS as e:
+        breaker.record_failure()
+        logger.warning(f"Redis lock for {key} failed: {e!r}")
+        return stale if entry is not None else await compute()
+    if not acquired:
+        if entry is not None:
+            return stale
+        deadline = time.monotonic() + wait_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            entry = await get_cache(key)
+            if isinstance(entry, dict) and "fresh_until" in entry:
+                return entry["value"]
+        return await compute()
+
+    try:
+        value = await compute()
+        await set_cache(key, {"value": value, "fresh_until": time.time() + soft_ttl}, ttl=hard_ttl)
+        return value
+    finally:
+        try:
+            await client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except REDIS_ERRORS:
+            pass  # The lock expires after lock_ttl anyway
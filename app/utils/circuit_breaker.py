@@ -0,0 +1,77 @@
+import logging
+import time
+from collections import Counter
+from typing import Callable
+from app.utils.metrics import Counter as MetricCounter, Gauge
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+BREAKER_TRANSITIONS = MetricCounter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes", ("breaker", "transition")
+)
+BREAKER_OPEN = Gauge("circuit_breaker_open", "1 while the breaker is open or half-open", ("breaker",))
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After `failure_threshold` failures in a row the breaker opens and `allow()` rejects calls.
+    Once `reset_timeout_s` has passed, one probe call is let through (half-open): success closes
+    the breaker, failure opens it for another `reset_timeout_s`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout_s: float, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout_s
+        self._clock = clock
+        self.state = CLOSED
+        self._failures = 0
+        self._changed_at = clock()
+        self.rejected = 0
+        self.transitions: Counter = Counter()
+
+    @property
+    def closed(self) -> bool:
+        return self.state == CLOSED
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        # In half-open the probe gets the same timeout, in case it never reports back
+        if self._clock() - self._changed_at >= self._reset_timeout:
+            self._transition(HALF_OPEN)
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self._failure_threshold):
+            self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        self.transitions[f"{self.state}->{state}"] += 1
+        BREAKER_TRANSITIONS.labels(self.name, f"{self.state}->{state}").inc()
+        BREAKER_OPEN.labels(self.name).set(int(state != CLOSED))
+        log = logger.info if state == CLOSED else logger.warning
+        log(f"Circuit breaker '{self.name}' {self.state} -> {state}")
+        self.state = state
+        self._changed_at = self._clock()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+        }
@@ -0,0 +1,136 @@
+from datetime import datetime
+from typing import Iterable
+import json
+from app.utils import cache
+
+LEADERBOARD_KEY = "leaderboard:visits"
+LAST_VISIT_KEY = "leaderboard:last_visit"
+URL_META_KEY = "leaderboard:urls"
+REBUILD_SUFFIX = ":rebuild"
+# Written by every swap, so a leaderboard recreated by ZINCRBY after a flush is known to be partial
+BUILT_KEY = "leaderboard:built"
+# Present while a rebuild is staging; visits recorded meanwhile are added to the staged keys as well
+REBUILDING_KEY = "leaderboard:rebuilding"
+
+# KEYS: live scores, live last visits, staged scores, staged last visits, rebuilding marker
+# ARGV: url_id, count, last visit, repeated
+_RECORD_SCRIPT = """
+local rebuilding = redis.call('exists', KEYS[5]) == 1
+for i = 1, #ARGV, 3 do
+    redis.call('zincrby', KEYS[1], ARGV[i + 1], ARGV[i])
+    redis.call('hset', KEYS[2], ARGV[i], ARGV[i + 2])
+    if rebuilding then
+        redis.call('zincrby', KEYS[3], ARGV[i + 1], ARGV[i])
+        redis.call('hset', KEYS[4], ARGV[i], ARGV[i + 2])
+    end
+end
+return 0
+"""
+
+
+async def record_visits(visits: Iterable[tuple[int, datetime]]) -> None:
+    """Add a batch of visits to the leaderboard, and to a rebuild in progress, in one atomic script."""
+    totals: dict[int, list] = {}
+    for url_id, ts in visits:
+        entry = totals.setdefault(url_id, [0, ts])
+        entry[0] += 1
+        if ts > entry[1]:
+            entry[1] = ts
+    if not totals:
+        return
+    args = []
+    for url_id, (count, last) in totals.items():
+        args += [url_id, count, last.isoformat()]
+    keys = (LEADERBOARD_KEY, LAST_VISIT_KEY, LEADERBOARD_KEY + REBUILD_SUFFIX, LAST_VISIT_KEY + REBUILD_SUFFIX, REBUILDING_KEY)
+    await cache.client.eval(_RECORD_SCRIPT, len(keys), *keys, *args)
+
+
+async def is_built() -> bool:
+    """True when the leaderboard was rebuilt from Postgres and not flushed since."""
+    return bool(await cache.client.exists(BUILT_KEY))
+
+
+async def top(limit: int) -> list[tuple[int, int]]:
+    """Return (url_id, visits) pairs for the `limit` most visited URLs; empty until the leaderboard is built."""
+    if limit <= 0:
+        return []
+    async with cache.client.pipeline(transaction=False) as pipe:
+        pipe.exists(BUILT_KEY)
+        pipe.zrevrange(LEADERBOARD_KEY, 0, limit - 1, withscores=True)
+        built, entries = await pipe.execute()
+    if not built:
+        return []
+    return [(int(member), int(score)) for member, score in entries]
+
+
+async def get_details(url_ids: list[int]) -> tuple[list[str | None], list[dict | None]]:
+    """Fetch last-visit timestamps and {slug, long_url} metadata for the given URLs in one round trip."""
+    async with cache.client.pipeline(transaction=False) as pipe:
+        pipe.hmget(LAST_VISIT_KEY, url_ids)
+        pipe.hmget(URL_META_KEY, url_ids)
+        last_visits, metas = await pipe.execute()
+    return last_visits, [json.loads(meta) if meta else None for meta in metas]
+
+
+async def set_url_meta(metas: dict[int, dict]) -> None:
+    if metas:
+        await cache.client.hset(URL_META_KEY, mapping={url_id: json.dumps(meta) for url_id, meta in metas.items()})
+
+
+async def get_scores(url_ids: list[int]) -> list[int | None]:
+    scores = await cache.client.zmscore(LEADERBOARD_KEY, url_ids)
+    return [None if score is None else int(score) for score in scores]
+
+
+async def set_scores(rows: Iterable[tuple[int, int]]) -> None:
+    mapping = {url_id: count for url_id, count in rows}
+    if mapping:
+        await cache.client.zadd(LEADERBOARD_KEY, mapping)
+
+
+async def load_rebuild_batch(rows: Iterable) -> None:
+    """Stage a batch of url_stats rows into the rebuild keys (see `swap_rebuild`).
+
+    Scores are added to, and last visits never overwrite, what visits recorded since
+    `start_rebuild` already staged.
+    """
+    scores, last_visits, metas = {}, {}, {}
+    for row in rows:
+        scores[row.url_id] = row.visits
+        if row.last_visit:
+            last_visits[row.url_id] = row.last_visit.isoformat()
+        metas[row.url_id] = json.dumps({"slug": row.slug, "long_url": row.long_url})
+    if not scores:
+        return
+    async with cache.client.pipeline(transaction=False) as pipe:
+        for url_id, visits in scores.items():
+            pipe.zincrby(LEADERBOARD_KEY + REBUILD_SUFFIX, visits, url_id)
+        for url_id, last_visit in last_visits.items():
+            pipe.hsetnx(LAST_VISIT_KEY + REBUILD_SUFFIX, url_id, last_visit)
+        pipe.hset(URL_META_KEY + REBUILD_SUFFIX, mapping=metas)
+        await pipe.execute()
+
+
+async def start_rebuild(ttl: int) -> None:
+    """Clear any staged keys and start staging visits recorded from now on.
+
+    Call before the url_stats scan begins, so visits committed after its snapshot are not lost.
+    The marker expires after `ttl` seconds in case the rebuild never finishes.
+    """
+    async with cache.client.pipeline(transaction=True) as pipe:
+        pipe.delete(*(key + REBUILD_SUFFIX for key in (LEADERBOARD_KEY, LAST_VISIT_KEY, URL_META_KEY)))
+        pipe.set(REBUILDING_KEY, 1, ex=ttl)
+        await pipe.execute()
+
+
+async def swap_rebuild() -> None:
+    """Atomically replace the live leaderboard with the staged rebuild keys and mark it built."""
+    async with cache.client.pipeline(transaction=True) as pipe:
+        for key in (LEADERBOARD_KEY, LAST_VISIT_KEY, URL_META_KEY):
+            pipe.delete(key)
+        pipe.delete(REBUILDING_KEY)
+        pipe.set(BUILT_KEY, 1)
+        for key in (LEADERBOARD_KEY, LAST_VISIT_KEY, URL_META_KEY):
+            pipe.rename(key + REBUILD_SUFFIX, key)
+        # A staged hash can legitimately be missing (e.g. no last_visit values); its RENAME error is ignored
+        await pipe.execute(raise_on_error=False)
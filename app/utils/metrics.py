@@ -0,0 +1,191 @@
+"""Minimal in-process metrics rendered in the Prometheus text exposition format.
+
+Updates are plain integer and float additions on objects owned by the worker's event loop, so
+they take no locks. Each worker process keeps its own values; scrape every worker (or run one
+per container) rather than going through a load balancer.
+"""
+import logging
+import time
+from bisect import bisect_left
+from typing import Awaitable, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Seconds; from 0.5ms cache hits up to multi-second report queries
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._children: dict[tuple, object] = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        """Child for one combination of label values, created on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for values, child in self._children.items():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: tuple, child) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        """Increment the unlabelled counter."""
+        self.labels().inc(amount)
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # Non-cumulative per-bucket counts; cumulated only when rendered
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_child(self, values: tuple, child: _HistogramValue) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames + ("le",), values + (_format_value(bound),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class timer:
+    """Context manager observing the elapsed seconds into a histogram child."""
+
+    __slots__ = ("_target", "_started")
+
+    def __init__(self, target: _HistogramValue):
+        self._target = target
+
+    def __enter__(self) -> "timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._target.observe(time.perf_counter() - self._started)
+
+
+REGISTRY: list[_Metric] = []
+# Called before every render to refresh gauges that mirror state kept elsewhere
+_collect_hooks: list[Callable[[], None]] = []
+
+
+# Awaited by the /metrics route before rendering, for gauges that need I/O (e.g. a Redis round trip)
+_async_collect_hooks: list[Callable[[], Awaitable[None]]] = []
+
+
+def on_collect(hook: Callable[[], None]) -> Callable[[], None]:
+    _collect_hooks.append(hook)
+    return hook
+
+
+def on_collect_async(hook: Callable[[], Awaitable[None]]) -> Callable[[], Awaitable[None]]:
+    _async_collect_hooks.append(hook)
+    return hook
+
+
+async def collect_async() -> None:
+    """Run the async collect hooks; a failing hook leaves its gauges at their last values."""
+    for hook in _async_collect_hooks:
+        try:
+            await hook()
+        except Exception as e:
+            logger.warning(f"Metrics collect hook {hook.__name__} failed: {e}")
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text format."""
+    for hook in _collect_hooks:
+        hook()
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from app.config import PROFILING_INTERVAL_MS, PROFILING_MAX_STACKS
+
+TRUNCATED = "[other stacks]"
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.split(os.sep)
+    return f"{'/'.join(path[-2:])}:{code.co_qualname}"
+
+
+def _is_idle(frame) -> bool:
+    # The event loop waiting in select() with nothing to run
+    return frame.f_code.co_name in ("select", "poll") and "selectors" in frame.f_code.co_filename
+
+
+class StackSampler:
+    """Samples the event loop thread's stack while profiled requests are in flight.
+
+    A daemon thread wakes every `interval_ms` while at least one request is being profiled. If the
+    task running on the loop at that moment is a profiled request, the current stack, rooted at
+    that request's route, is added to a collapsed-stack counter (`frame;frame;frame count`, the
+    input format of flamegraph.pl and speedscope). Samples landing in other requests or background
+    tasks are only counted, so a route's flame graph holds its own work alone. When no request is
+    profiled the thread blocks on an event, so the cost is zero. Samples taken while the asyncio
+    loop is idle in select() are only counted too (under uvloop, idle time shows up as the loop's
+    run frame instead). Up to `max_stacks` distinct stacks are kept; further ones are counted
+    under TRUNCATED.
+    """
+
+    def __init__(self, interval_ms: int = PROFILING_INTERVAL_MS, max_stacks: int = PROFILING_MAX_STACKS):
+        self._interval = interval_ms / 1000
+        self._max_stacks = max_stacks
+        self._lock = threading.Lock()
+        self._stacks: Counter = Counter()
+        # Task of each profiled request in flight -> its route
+        self._tasks: dict[asyncio.Task, str] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._target_thread: int | None = None
+        self.samples = 0
+        self.idle_samples = 0
+        self.other_samples = 0
+        self.profiled_requests = 0
+
+    def start_request(self, route: str) -> None:
+        """Mark the current task as a profiled request; called from the request's own task."""
+        task = asyncio.current_task()
+        self._target_thread = threading.get_ident()
+        with self._lock:
+            self._loop = task.get_loop()
+            self._tasks[task] = route
+            self.profiled_requests += 1
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def end_request(self) -> None:
+        with self._lock:
+            self._tasks.pop(asyncio.current_task(), None)
+            if not self._tasks:
+                self._wakeup.clear()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            time.sleep(self._interval)
+            if self._wakeup.is_set():
+                self._sample()
+
+    def _running_task(self) -> asyncio.Task | None:
+        return asyncio.current_task(self._loop) if self._loop is not None else None
+
+    def _sample(self) -> None:
+        task = self._running_task()
+        frame = sys._current_frames().get(self._target_thread)
+        if frame is None:
+            return
+        if _is_idle(frame):
+            self.idle_samples += 1
+            return
+        frames = []
+        while frame is not None:
+            frames.append(_frame_name(frame))
+            frame = frame.f_back
+        with self._lock:
+            route = self._tasks.get(task)
+            # The loop may have switched tasks while the stack was being walked
+            if route is None or self._running_task() is not task:
+                self.other_samples += 1
+                return
+            frames.append(route)
+            stack = ";".join(reversed(frames))
+            if stack not in self._stacks and len(self._stacks) >= self._max_stacks:
+                stack = TRUNCATED
+            self._stacks[stack] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """All samples so far in collapsed-stack format, most frequent first."""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self.samples = self.idle_samples = self.other_samples = self.profiled_requests = 0
+
+    def stats(self) -> dict:
+        return {
+            "interval_ms": self._interval * 1000,
+            "profiled_requests": self.profiled_requests,
+            "active_requests": len(self._tasks),
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "other_samples": self.other_samples,
+            "distinct_stacks": len(self._stacks),
+        }
+
+
+sampler = StackSampler()
@@ -0,0 +1,97 @@
+BASE62_CHARS = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+BASE = 62
+SLUG_DIGITS = 6
+FANCY_PADDING = "a1b2c3d4e5f"
+
+# Ids below SHORT_ID_LIMIT get the original fixed 7-character slug. Larger ids are written as plain
+# Base62 digits plus the checksum, which makes them at least 8 characters long, so the two forms
+# never overlap. Ids are capped by the BIGINT column, and slugs by the String(20) column.
+SHORT_ID_LIMIT = BASE**SLUG_DIGITS
+MAX_ID = 2**63 - 1
+MAX_SLUG_LENGTH = 20
+
+_CHAR_VALUES = {c: i for i, c in enumerate(BASE62_CHARS)}
+
+
+def _checksum(body: str) -> str:
+    return BASE62_CHARS[sum(ord(c) for c in body) % BASE]
+
+
+def int_to_base62(n: int) -> str:
+    if n < 0 or n > MAX_ID:
+        raise ValueError("Number out of range for Base62 slug encoding")
+
+    result = []
+    while n > 0:
+        n, rem = divmod(n, BASE)
+        result.append(BASE62_CHARS[rem])
+    base62_encoded = ''.join(reversed(result))
+
+    pad_len = max(SLUG_DIGITS - len(base62_encoded), 0)
+    padded = FANCY_PADDING[:pad_len] + base62_encoded
+    return padded + _checksum(padded)
+
+
+def encode_many(ids: list[int]) -> list[str]:
+    """Encode many ids at once; equivalent to `[int_to_base62(n) for n in ids]`.
+
+    Ids that differ only in their last digit share every other slug character, so runs of
+    consecutive ids (a leased block) only pay for a full encoding once every 62 ids.
+    """
+    slugs = []
+    prefix_high, prefix, prefix_sum = None, "", 0
+    for n in ids:
+        high, low = divmod(n, BASE)
+        if high == 0 or n > MAX_ID:
+            slugs.append(int_to_base62(n))
+            continue
+        if high != prefix_high:
+            # Slug body of high * 62 without its trailing "0" digit
+            prefix = int_to_base62(high * BASE)[:-2]
+            prefix_high, prefix_sum = high, sum(ord(c) for c in prefix)
+        last = BASE62_CHARS[low]
+        slugs.append(prefix + last + BASE62_CHARS[(prefix_sum + ord(last)) % BASE])
+    return slugs
+
+
+def base62_to_int(slug: str) -> int:
+    """Decode a slug produced by `int_to_base62` back to its id.
+
+    Raises ValueError for a wrong length, characters outside Base62 or a checksum mismatch.
+    The padding characters are valid digits too, so a few 7-character slugs encode more than
+    one id (1 and 745 both give "a1b2c18"); the smallest is returned, which is the only one
+    the allocator hands out (see `is_canonical`).
+    """
+    if not SLUG_DIGITS < len(slug) <= MAX_SLUG_LENGTH or any(c not in _CHAR_VALUES for c in slug):
+        raise ValueError("Malformed slug")
+    body, check = slug[:-1], slug[-1]
+    if _checksum(body) != check:
+        raise ValueError("Slug checksum mismatch")
+
+    if len(body) > SLUG_DIGITS:
+        if body.startswith("0"):
+            raise ValueError("Malformed slug")
+        value = _digits_value(body)
+        if value > MAX_ID:
+            raise ValueError("Slug out of range")
+        return value
+
+    # Longest padding first: fewer digits without a leading zero is always the smaller id
+    for pad_len in range(SLUG_DIGITS, -1, -1):
+        digits = body[pad_len:]
+        if body[:pad_len] != FANCY_PADDING[:pad_len] or digits.startswith("0"):
+            continue
+        return _digits_value(digits)
+    raise ValueError("Malformed slug")
+
+
+def _digits_value(digits: str) -> int:
+    value = 0
+    for c in digits:
+        value = value * BASE + _CHAR_VALUES[c]
+    return value
+
+
+def is_canonical(n: int) -> bool:
+    """True if `n` is the id its own slug decodes to, i.e. no smaller id shares the slug."""
+    return n >= SHORT_ID_LIMIT or base62_to_int(int_to_base62(n)) == n
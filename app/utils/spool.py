@@ -0,0 +1,233 @@
+import fcntl
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterator
+
+# One fixed-size record per visit: url_id, microseconds since the epoch of the naive timestamp
+RECORD = struct.Struct("<qq")
+_EPOCH = datetime(1970, 1, 1)
+SEGMENT_PREFIX = "visits-"
+SEGMENT_SUFFIX = ".log"
+OFFSET_SUFFIX = ".offset"
+CREATING_SUFFIX = ".creating"
+
+
+def _pack(url_id: int, ts: datetime) -> bytes:
+    return RECORD.pack(url_id, (ts - _EPOCH) // timedelta(microseconds=1))
+
+
+def _unpack(data: bytes) -> list[tuple[int, datetime]]:
+    return [(url_id, _EPOCH + timedelta(microseconds=us)) for url_id, us in RECORD.iter_unpack(data)]
+
+
+class VisitSpool:
+    """Segmented append-only log of visits that could not be written to Postgres.
+
+    Records go to the active segment of this process (`visits-{time}-{pid}-{seq}.log`), which is held
+    under an exclusive flock and sealed once it exceeds `segment_max_bytes`. Writes reach the OS
+    immediately but are fsynced at most every `fsync_interval_ms`, so a machine crash loses at
+    most the `unsynced_records` written since the last fsync. Sealed segments from any process
+    sharing the directory, including active segments left by a crashed process, are replayed
+    through `SegmentReader`.
+    """
+
+    def __init__(self, directory: str, segment_max_bytes: int, fsync_interval_ms: int):
+        self.directory = directory
+        self._segment_max_bytes = segment_max_bytes
+        self._fsync_interval = fsync_interval_ms / 1000
+        self._lock = threading.Lock()
+        self._file = None
+        self._seq = 0
+        self._last_sync = time.monotonic()
+        self.unsynced_records = 0
+        self.spooled_records = 0
+
+    def append(self, visits: list[tuple[int, datetime]]) -> None:
+        """Append visits to the active segment, fsyncing if the interval has elapsed. Blocking."""
+        data = b"".join(_pack(url_id, ts) for url_id, ts in visits)
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(data)
+            self._file.flush()
+            self.unsynced_records += len(visits)
+            self.spooled_records += len(visits)
+            if time.monotonic() - self._last_sync >= self._fsync_interval:
+                self._sync()
+            if self._file.tell() >= self._segment_max_bytes:
+                self._close_segment()
+
+    def seal(self) -> None:
+        """Close the active segment so that it can be replayed."""
+        with self._lock:
+            if self._file is not None:
+                self._close_segment()
+
+    close = seal
+
+    @property
+    def has_active_segment(self) -> bool:
+        return self._file is not None
+
+    def segments(self) -> list[str]:
+        """Paths of all segments in the directory, oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in names
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def remove_stale_creating(self, max_age_s: float = 60) -> int:
+        """Delete segments left half-created by a crash between open and rename. Returns the count.
+
+        Nothing is written before the rename, so these files are always empty. Only files older than
+        `max_age_s` that no process holds locked are removed.
+        """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for name in names:
+            if not (name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX + CREATING_SUFFIX)):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if time.time() - os.path.getmtime(path) < max_age_s:
+                    continue
+                with open(path, "rb") as f:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.unlink(path)
+                removed += 1
+            except (FileNotFoundError, BlockingIOError):
+                pass
+        return removed
+
+    def pending_bytes(self) -> int:
+        total = 0
+        for path in self.segments():
+            try:
+                total += os.path.getsize(path) - _read_offset(path)
+            except FileNotFoundError:
+                pass
+        return total
+
+    def stats(self) -> dict:
+        pending_bytes = self.pending_bytes()
+        return {
+            "segments": len(self.segments()),
+            "pending_bytes": pending_bytes,
+            "pending_records": pending_bytes // RECORD.size,
+            "spooled_records": self.spooled_records,
+            "unsynced_records": self.unsynced_records,
+            "seconds_since_fsync": round(time.monotonic() - self._last_sync, 3),
+        }
+
+    def _open_segment(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._seq += 1
+        # Named by creation time first so that segments sort oldest first across processes
+        name = f"{SEGMENT_PREFIX}{time.time_ns():020d}-{os.getpid()}-{self._seq:06d}{SEGMENT_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        # Locked under a name replayers do not list, then renamed into place, so no replayer can
+        # lock (and delete as fully replayed) the empty segment before we hold it
+        creating = path + CREATING_SUFFIX
+        self._file = open(creating, "ab")
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        os.rename(creating, path)
+
+    def _sync(self) -> None:
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+        self.unsynced_records = 0
+
+    def _close_segment(self) -> None:
+        self._sync()
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+
+def _offset_path(path: str) -> str:
+    return path[: -len(SEGMENT_SUFFIX)] + OFFSET_SUFFIX
+
+
+def _read_offset(path: str) -> int:
+    try:
+        with open(_offset_path(path)) as f:
+            return int(f.read() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _write_offset(path: str, offset: int) -> None:
+    tmp = _offset_path(path) + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(str(offset))
+    os.replace(tmp, _offset_path(path))
+
+
+class SegmentReader:
+    """Exclusive reader over one sealed segment, resuming after the last committed offset.
+
+    Use as a context manager; `batches()` yields visit lists and `commit()` records the progress
+    of the last batch. A segment still being written or replayed elsewhere is not `acquired`.
+    """
+
+    def __init__(self, path: str, batch_records: int):
+        self.path = path
+        self._batch_bytes = batch_records * RECORD.size
+        self._file = None
+        self._offset = 0
+        self._pending_offset = 0
+        self.acquired = False
+
+    def __enter__(self) -> "SegmentReader":
+        try:
+            self._file = open(self.path, "rb")
+        except FileNotFoundError:
+            return self
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return self
+        # Another replayer may have finished and deleted the segment before we got the lock
+        self.acquired = os.fstat(self._file.fileno()).st_nlink > 0
+        self._offset = self._pending_offset = _read_offset(self.path)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._file is not None:
+            self._file.close()
+
+    def batches(self) -> Iterator[list[tuple[int, datetime]]]:
+        position = self._offset
+        self._file.seek(position)
+        while True:
+            data = self._file.read(self._batch_bytes)
+            # A torn record at the end of a crashed segment is ignored
+            data = data[: len(data) - len(data) % RECORD.size]
+            if not data:
+                return
+            position += len(data)
+            self._pending_offset = position
+            yield _unpack(data)
+
+    def commit(self) -> None:
+        self._offset = self._pending_offset
+        _write_offset(self.path, self._offset)
+
+    def remove(self) -> None:
+        """Delete the fully replayed segment and its offset file."""
+        os.unlink(self.path)
+        try:
+            os.unlink(_offset_path(self.path))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,21 @@
+from datetime import datetime, timedelta
+
+GRANULARITIES = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its hour or day bucket."""
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unsupported granularity: {granularity}")
+
+
+def bucket_ceil(ts: datetime, granularity: str) -> datetime:
+    """Round a timestamp up to the next bucket boundary (unchanged if already on one)."""
+    start = bucket_start(ts, granularity)
+    return start if start == ts else start + GRANULARITIES[granularity]
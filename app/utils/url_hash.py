@@ -0,0 +1,18 @@
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+
+def normalize_url(long_url: str) -> str:
+    """Normalize a URL for dedup: trim whitespace and lowercase the scheme and host.
+
+    Userinfo is case-sensitive and kept as is.
+    """
+    parts = urlsplit(long_url.strip())
+    userinfo, at, hostport = parts.netloc.rpartition("@")
+    netloc = userinfo + at + hostport.lower()
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path, parts.query, parts.fragment))
+
+
+def long_url_digest(long_url: str) -> bytes:
+    """SHA-256 of the normalized URL, stored in urls.long_url_hash."""
+    return hashlib.sha256(normalize_url(long_url).encode("utf-8")).digest()
@@ -0,0 +1,128 @@
+from datetime import datetime
+from typing import Iterable
+from redis.exceptions import ResponseError
+from app.utils import cache
+from app.utils.metrics import Gauge
+
+STREAM_KEY = "visits:stream"
+GROUP = "visit-writers"
+# Entries delivered more than the worker's max deliveries end up here, trimmed to about DEAD_LETTER_MAXLEN
+DEAD_LETTER_KEY = "visits:stream:dead"
+DEAD_LETTER_MAXLEN = 100000
+# XAUTOCLAIM cursor meaning "from the start of the pending list"; also returned once a scan wraps
+CLAIM_START = "0-0"
+
+STREAM_LAG = Gauge("visit_stream_lag", "Visit stream entries not yet delivered to the consumer group")
+STREAM_PENDING = Gauge("visit_stream_pending", "Visit stream entries delivered but not acknowledged")
+STREAM_DEAD_LETTERS = Gauge("visit_stream_dead_letters", "Entries in the visit dead-letter stream")
+
+
+def _entry(fields: dict) -> tuple[int, datetime] | None:
+    try:
+        return int(fields["url_id"]), datetime.fromisoformat(fields["ts"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _entries(messages) -> list[tuple[str, tuple[int, datetime] | None]]:
+    """(entry id, visit) pairs; the visit is None for malformed entries or ones deleted while pending."""
+    return [(entry_id, _entry(fields) if fields else None) for entry_id, fields in messages]
+
+
+async def append(visits: Iterable[tuple[int, datetime]]) -> None:
+    """XADD a batch of visits in a single pipeline."""
+    async with cache.client.pipeline(transaction=False) as pipe:
+        for url_id, ts in visits:
+            pipe.xadd(STREAM_KEY, {"url_id": url_id, "ts": ts.isoformat()})
+        await pipe.execute()
+
+
+async def ensure_group() -> None:
+    """Create the stream and its consumer group if they do not exist yet."""
+    try:
+        await cache.client.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def read(consumer: str, count: int, block_ms: int) -> list[tuple[str, tuple[int, datetime] | None]]:
+    """Read up to `count` new entries for `consumer`, blocking up to `block_ms` for the first one."""
+    response = await cache.blocking_client.xreadgroup(GROUP, consumer, {STREAM_KEY: ">"}, count=count, block=block_ms)
+    if not response:
+        return []
+    if isinstance(response, dict):
+        messages = response.get(STREAM_KEY, [[]])[0]
+    else:
+        messages = response[0][1]
+    return _entries(messages)
+
+
+async def claim_stale(
+    consumer: str, min_idle_ms: int, count: int, start_id: str = CLAIM_START
+) -> tuple[str, list[tuple[str, tuple[int, datetime] | None]]]:
+    """Take over up to `count` entries left pending longer than `min_idle_ms`, e.g. by a dead consumer.
+
+    Scans the pending list from `start_id` and returns the cursor to continue from with the entries;
+    the cursor is CLAIM_START once the scan reached the end.
+    """
+    response = await cache.client.xautoclaim(STREAM_KEY, GROUP, consumer, min_idle_ms, start_id=start_id, count=count)
+    return response[0], _entries(response[1])
+
+
+async def delivery_counts(entry_ids: list[str]) -> dict[str, int]:
+    """How many times each pending entry has been delivered, with one pipelined XPENDING per entry."""
+    if not entry_ids:
+        return {}
+    async with cache.client.pipeline(transaction=False) as pipe:
+        for entry_id in entry_ids:
+            pipe.xpending_range(STREAM_KEY, GROUP, min=entry_id, max=entry_id, count=1)
+        responses = await pipe.execute()
+    return {pending[0]["message_id"]: pending[0]["times_delivered"] for pending in responses if pending}
+
+
+async def dead_letter(entries: list[tuple[str, tuple[int, datetime] | None]]) -> None:
+    """Copy entries to the dead-letter stream, then acknowledge and remove them, in one transaction."""
+    if not entries:
+        return
+    async with cache.client.pipeline(transaction=True) as pipe:
+        for entry_id, visit in entries:
+            fields = {"entry_id": entry_id}
+            if visit is not None:
+                fields.update(url_id=visit[0], ts=visit[1].isoformat())
+            pipe.xadd(DEAD_LETTER_KEY, fields, maxlen=DEAD_LETTER_MAXLEN, approximate=True)
+        ids = [entry_id for entry_id, _ in entries]
+        pipe.xack(STREAM_KEY, GROUP, *ids)
+        pipe.xdel(STREAM_KEY, *ids)
+        await pipe.execute()
+
+
+async def ack(entry_ids: list[str]) -> None:
+    """Acknowledge processed entries and remove them, so the stream only holds unprocessed visits."""
+    if not entry_ids:
+        return
+    async with cache.client.pipeline(transaction=False) as pipe:
+        pipe.xack(STREAM_KEY, GROUP, *entry_ids)
+        pipe.xdel(STREAM_KEY, *entry_ids)
+        await pipe.execute()
+
+
+async def stats() -> dict:
+    """Stream and dead-letter lengths, and for the consumer group its backlog (`lag`), pending entries and consumers."""
+    result = {"length": await cache.client.xlen(STREAM_KEY), "dead_letters": await cache.client.xlen(DEAD_LETTER_KEY)}
+    try:
+        groups = await cache.client.xinfo_groups(STREAM_KEY)
+    except ResponseError:
+        return result
+    for group in groups:
+        if group["name"] == GROUP:
+            result.update(lag=group.get("lag"), pending=group["pending"], consumers=group["consumers"])
+    return result
+
+
+async def export_metrics() -> None:
+    """Refresh the stream gauges; registered as an async collect hook when VISIT_SINK is "stream"."""
+    result = await stats()
+    STREAM_LAG.set(result.get("lag") or 0)
+    STREAM_PENDING.set(result.get("pending", 0))
+    STREAM_DEAD_LETTERS.set(result["dead_letters"])
@@ -0,0 +1,33 @@
+"""Loads the most visited slugs into Redis, e.g. after a Redis restart or before switching traffic.
+
+Run with `python -m app.workers.cache_warmer [--top-k N] [--window-hours H] [--rate R]`.
+"""
+import argparse
+import asyncio
+import logging
+from app.config import CACHE_WARM_TOP_K, CACHE_WARM_WINDOW_HOURS, CACHE_WARM_BATCH_SIZE, CACHE_WARM_RATE_PER_S
+from app.services import cache_warmer
+from app.utils import cache
+
+
+async def main(args: argparse.Namespace) -> None:
+    cache.init_client()
+    try:
+        # This process serves no requests, so its L1 is not worth filling
+        await cache_warmer.warm(args.top_k, args.window_hours, args.batch_size, args.rate, redis=True, local=False)
+    finally:
+        await cache.close_client()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top-k", type=int, default=CACHE_WARM_TOP_K)
+    parser.add_argument("--window-hours", type=int, default=CACHE_WARM_WINDOW_HOURS)
+    parser.add_argument("--batch-size", type=int, default=CACHE_WARM_BATCH_SIZE)
+    parser.add_argument("--rate", type=int, default=CACHE_WARM_RATE_PER_S, help="slugs per second, 0 for no limit")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parse_args()))
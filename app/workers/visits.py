@@ -0,0 +1,121 @@
+"""Consumes the Redis visit stream and bulk-inserts visits into Postgres.
+
+Run one or more with `python -m app.workers.visits`; each joins the `visit-writers`
+consumer group under its own name, so the stream is split between them.
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+from app.config import (
+    VISIT_STREAM_BATCH_SIZE, VISIT_STREAM_BLOCK_MS, VISIT_STREAM_CLAIM_IDLE_MS, VISIT_STREAM_MAX_DELIVERIES
+)
+from app.services.visits import store_visits
+from app.utils import cache, visit_stream
+
+logger = logging.getLogger(__name__)
+
+
+class VisitStreamWorker:
+    """Reads visit entries as a consumer group member and acknowledges them only after commit.
+
+    Entries whose batch fails stay pending and are retried; entries left pending for
+    `claim_idle_ms` by any consumer (including a dead one) are claimed and processed here.
+    Claims walk the pending list with the XAUTOCLAIM cursor, so a batch that keeps failing
+    cannot hide the entries behind it. Claimed entries delivered more than `max_deliveries`
+    times are moved to the dead-letter stream instead of being retried again.
+    Delivery is at-least-once: a crash between commit and ack replays that batch.
+    """
+
+    def __init__(
+        self,
+        consumer: str | None = None,
+        batch_size: int = VISIT_STREAM_BATCH_SIZE,
+        block_ms: int = VISIT_STREAM_BLOCK_MS,
+        claim_idle_ms: int = VISIT_STREAM_CLAIM_IDLE_MS,
+        max_deliveries: int = VISIT_STREAM_MAX_DELIVERIES,
+        retry_delay: float = 1.0,
+    ):
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self._batch_size = batch_size
+        self._block_ms = block_ms
+        self._claim_idle_ms = claim_idle_ms
+        self._max_deliveries = max_deliveries
+        self._retry_delay = retry_delay
+        self._claim_cursor = visit_stream.CLAIM_START
+        self._stopping = asyncio.Event()
+        self.processed = 0
+        self.discarded = 0
+        self.dead_lettered = 0
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        await visit_stream.ensure_group()
+        logger.info(f"Visit stream consumer '{self.consumer}' started")
+        loop = asyncio.get_running_loop()
+        next_claim = loop.time()
+        while not self._stopping.is_set():
+            try:
+                entries = []
+                if loop.time() >= next_claim:
+                    entries = await self.claim()
+                    if self._claim_cursor == visit_stream.CLAIM_START:
+                        # The whole pending list was scanned; look again once more entries can be idle
+                        next_claim = loop.time() + self._claim_idle_ms / 1000
+                if not entries:
+                    entries = await visit_stream.read(self.consumer, self._batch_size, self._block_ms)
+                if entries:
+                    await self.process(entries)
+            except Exception as e:
+                logger.error(f"Visit stream consumer '{self.consumer}' failed: {e}")
+                await asyncio.sleep(self._retry_delay)
+        logger.info(f"Visit stream consumer '{self.consumer}' stopped")
+
+    async def claim(self) -> list:
+        """Claim the next stale entries, dead-lettering those already delivered too often."""
+        self._claim_cursor, entries = await visit_stream.claim_stale(
+            self.consumer, self._claim_idle_ms, self._batch_size, self._claim_cursor
+        )
+        counts = await visit_stream.delivery_counts([entry_id for entry_id, _ in entries])
+        exhausted = [entry for entry in entries if counts.get(entry[0], 0) > self._max_deliveries]
+        if not exhausted:
+            return entries
+        await visit_stream.dead_letter(exhausted)
+        self.dead_lettered += len(exhausted)
+        logger.error(
+            f"Moved {len(exhausted)} visit stream entries delivered more than {self._max_deliveries} times "
+            f"to {visit_stream.DEAD_LETTER_KEY}"
+        )
+        dead = {entry_id for entry_id, _ in exhausted}
+        return [entry for entry in entries if entry[0] not in dead]
+
+    async def process(self, entries: list) -> None:
+        """Insert one batch of entries and acknowledge it once committed."""
+        visits = [visit for _, visit in entries if visit is not None]
+        if len(visits) < len(entries):
+            self.discarded += len(entries) - len(visits)
+            logger.warning(f"Discarding {len(entries) - len(visits)} malformed visit stream entries")
+        if visits:
+            await store_visits(visits)
+        await visit_stream.ack([entry_id for entry_id, _ in entries])
+        self.processed += len(visits)
+
+
+async def main() -> None:
+    worker = VisitStreamWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    cache.init_client()
+    try:
+        await worker.run()
+    finally:
+        await cache.close_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""Compare two benchmark results: `python -m benchmarks.compare baseline.json candidate.json`."""
+import argparse
+import json
+
+# (label, path into a scenario result, True if lower is better)
+COLUMNS = [
+    ("rps", ("throughput_rps",), False),
+    ("p50 ms", ("latency", "p50_ms"), True),
+    ("p95 ms", ("latency", "p95_ms"), True),
+    ("p99 ms", ("latency", "p99_ms"), True),
+    ("db stmts/req", ("db", "statements_per_request"), True),
+    ("checkouts/req", ("db", "checkouts_per_request"), True),
+    ("redis cmds/req", ("redis", "commands_per_request"), True),
+    ("errors", ("errors",), True),
+]
+
+
+def _get(result: dict, path: tuple[str, ...]):
+    for key in path:
+        result = result.get(key) if isinstance(result, dict) else None
+    return result
+
+
+def _change(old, new) -> str:
+    if old is None or new is None:
+        return "n/a"
+    if old == 0:
+        return f"{new}" if new else "="
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(baseline: dict, candidate: dict) -> list[str]:
+    old = {(r["scenario"], r["variant"]): r for r in baseline["scenarios"]}
+    lines = [
+        f"baseline  {baseline['meta'].get('commit')}  ({baseline['meta'].get('target')})",
+        f"candidate {candidate['meta'].get('commit')}  ({candidate['meta'].get('target')})",
+        "",
+    ]
+    for result in candidate["scenarios"]:
+        key = (result["scenario"], result["variant"])
+        lines.append(f"{key[0]} [{key[1]}]")
+        if key not in old:
+            lines.append("  not in baseline")
+            continue
+        for label, path, _ in COLUMNS:
+            before, after = _get(old[key], path), _get(result, path)
+            lines.append(f"  {label:<15} {str(before):>12} -> {str(after):>12}  {_change(before, after)}")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+    with open(args.baseline) as f, open(args.candidate) as g:
+        print("\n".join(compare(json.load(f), json.load(g))))
@@ -0,0 +1,316 @@
+"""Load-generation benchmark for the URL shortener.
+
+Seeds `--urls` short links, then runs each scenario with `--concurrency` concurrent clients and
+writes one JSON document with throughput, latency percentiles and DB/Redis call counts per
+scenario. Compare two runs with `python -m benchmarks.compare old.json new.json`.
+
+    python -m benchmarks.run                                  # app in-process (ASGI), local Postgres/Redis
+    python -m benchmarks.run --base-url http://localhost:8000 # a running server (use one worker)
+    python -m benchmarks.run --scenarios redirect_warm --compare-fast-redirect
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime
+import httpx
+import redis.asyncio as redis
+from benchmarks.workload import SCENARIOS, Request, Scenario, build_plan, load_replay, percentile
+from app.config import ADMIN_TOKEN, REDIS_HOST, REDIS_PORT, SHORTEN_BATCH_MAX_URLS
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_metrics(text: str) -> dict[tuple[str, frozenset], float]:
+    """Prometheus text format samples keyed by (name, labels)."""
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            samples[(name, frozenset(_LABEL.findall(labels or "")))] = float(value)
+    return samples
+
+
+def _sum(samples: dict, name: str) -> float:
+    return sum(value for (sample, _), value in samples.items() if sample == name)
+
+
+class Probe:
+    """Reads the app's own counters (`/metrics`, `/admin/db-pool`) and Redis `INFO stats` around a scenario.
+
+    Counts cover everything the app did meanwhile, including background visit flushes. With several
+    server workers only the one answering the probe is counted, so benchmark a single worker.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, redis_client: redis.Redis):
+        self._client = client
+        self._redis = redis_client
+
+    async def snapshot(self) -> dict:
+        snapshot = {"db_statements": None, "db_checkouts": None, "cache": {}, "redis_commands": None}
+        response = await self._client.get("/metrics")
+        if response.status_code == 200:
+            samples = parse_metrics(response.text)
+            snapshot["db_statements"] = _sum(samples, "db_query_seconds_count")
+            for (name, labels), value in samples.items():
+                if name == "cache_lookups_total":
+                    labels = dict(labels)
+                    snapshot["cache"][f"{labels['cache']}.{labels['result']}"] = value
+        response = await self._client.get("/admin/db-pool")
+        if response.status_code == 200:
+            snapshot["db_checkouts"] = response.json()["checkouts"]
+        try:
+            snapshot["redis_commands"] = (await self._redis.info("stats"))["total_commands_processed"]
+        except redis.RedisError:
+            pass
+        return snapshot
+
+    @staticmethod
+    def delta(before: dict, after: dict, requests: int) -> dict:
+        def diff(key):
+            if before[key] is None or after[key] is None:
+                return None
+            return after[key] - before[key]
+
+        db_statements, db_checkouts, redis_commands = diff("db_statements"), diff("db_checkouts"), diff("redis_commands")
+        if redis_commands is not None:
+            redis_commands -= 1  # The INFO call of the first snapshot is counted too
+        per_request = lambda value: round(value / requests, 4) if value is not None and requests else None
+        return {
+            "db": {
+                "statements": db_statements,
+                "statements_per_request": per_request(db_statements),
+                "checkouts": db_checkouts,
+                "checkouts_per_request": per_request(db_checkouts),
+            },
+            "redis": {"commands": redis_commands, "commands_per_request": per_request(redis_commands)},
+            "cache_lookups": {
+                key: after["cache"][key] - before["cache"].get(key, 0)
+                for key in after["cache"]
+                if after["cache"][key] != before["cache"].get(key, 0)
+            },
+        }
+
+
+async def seed_urls(client: httpx.AsyncClient, count: int, run_id: str) -> list[str]:
+    """Create `count` fresh short links through /shorten/batch and return their slugs."""
+    slugs = []
+    for start in range(0, count, SHORTEN_BATCH_MAX_URLS):
+        long_urls = [f"https://bench.example/{run_id}/{i}" for i in range(start, min(start + SHORTEN_BATCH_MAX_URLS, count))]
+        response = await client.post("/shorten/batch", json={"long_urls": long_urls})
+        response.raise_for_status()
+        slugs.extend(item["slug"] for item in response.json())
+    return slugs
+
+
+async def prepare_cache(client: httpx.AsyncClient, slugs: list[str], state: str | None, concurrency: int) -> None:
+    """Warm: request every slug once. Cold: drop every slug from Redis and from every worker's L1."""
+    if state is None:
+        return
+    requests = [
+        Request("warm", "GET", f"/{slug}", expect=(307,)) if state == "warm"
+        else Request("cold", "DELETE", f"/admin/cache/slug/{slug}", expect=(204,))
+        for slug in slugs
+    ]
+    await execute(client, requests, concurrency)
+    if state == "warm":
+        # Let the visit writer flush the warm-up visits so they do not land in the measurement
+        await asyncio.sleep(1)
+
+
+async def execute(client: httpx.AsyncClient, plan: list[Request], concurrency: int) -> dict:
+    """Send the plan with `concurrency` closed-loop clients. Returns latencies and outcomes."""
+    latencies: dict[str, list[float]] = {}
+    statuses: Counter = Counter()
+    errors: Counter = Counter()
+    position = 0
+
+    async def client_loop():
+        nonlocal position
+        while position < len(plan):
+            request = plan[position]
+            position += 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(request.method, request.path, json=request.json)
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] += 1
+                continue
+            latencies.setdefault(request.kind, []).append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+            if response.status_code not in request.expect:
+                errors[f"{request.kind}:{response.status_code}"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return {"duration_s": time.perf_counter() - started, "latencies": latencies, "statuses": statuses, "errors": errors}
+
+
+def _latency_summary(values: list[float]) -> dict:
+    values = sorted(values)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "count": len(values),
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else None,
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, probe: Probe, scenario: Scenario, variant: str, slugs: list[str], args, run_id: str
+) -> dict:
+    plan = build_plan(scenario, slugs, args.requests, args.zipf_s, args.seed, f"{run_id}-{scenario.name}-{variant}")
+    await prepare_cache(client, slugs, scenario.cache, args.concurrency)
+    before = await probe.snapshot()
+    outcome = await execute(client, plan, args.concurrency)
+    # Let background work caused by the scenario (visit flushes) be counted
+    await asyncio.sleep(args.settle_s)
+    after = await probe.snapshot()
+
+    completed = sum(outcome["statuses"].values())
+    all_latencies = [value for values in outcome["latencies"].values() for value in values]
+    return {
+        "scenario": scenario.name,
+        "variant": variant,
+        "cache": scenario.cache,
+        "requests": len(plan),
+        "completed": completed,
+        "errors": sum(outcome["errors"].values()),
+        "error_kinds": dict(outcome["errors"]),
+        "duration_s": round(outcome["duration_s"], 3),
+        "throughput_rps": round(completed / outcome["duration_s"], 1) if outcome["duration_s"] else None,
+        "latency": _latency_summary(all_latencies),
+        "latency_by_kind": {kind: _latency_summary(values) for kind, values in outcome["latencies"].items()},
+        "status_counts": {str(status): count for status, count in sorted(outcome["statuses"].items())},
+        **Probe.delta(before, after, completed),
+    }
+
+
+@asynccontextmanager
+async def app_clients(args):
+    """Clients per variant: `{"server": ...}` for --base-url, else the app in-process with its lifespan
+    running, plus a `fast_path` variant wrapped in FastRedirectMiddleware for --compare-fast-redirect."""
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    # The /admin endpoints used for counters and cold caches need the admin token
+    headers = {"X-Admin-Token": args.admin_token} if args.admin_token else {}
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout, headers=headers) as client:
+            yield {"server": client}
+        return
+
+    from app.config import FAST_REDIRECT_ENABLED
+    from app.main import app
+    from app.middleware.fast_redirect import FastRedirectMiddleware, fixed_paths
+
+    variants = {"fast_path" if FAST_REDIRECT_ENABLED else "fastapi": app}
+    if args.compare_fast_redirect and not FAST_REDIRECT_ENABLED:
+        variants["fast_path"] = FastRedirectMiddleware(app, reserved_paths=fixed_paths(app))
+    async with app.router.lifespan_context(app):
+        clients = {
+            name: httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=asgi), base_url="http://bench", timeout=args.timeout, headers=headers
+            )
+            for name, asgi in variants.items()
+        }
+        try:
+            yield clients
+        finally:
+            for client in clients.values():
+                await client.aclose()
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args) -> dict:
+    scenarios = [SCENARIOS[name] for name in args.scenarios]
+    if args.replay:
+        replay = load_replay(args.replay)
+        replay.cache = args.replay_cache
+        scenarios.append(replay)
+    run_id = uuid.uuid4().hex[:8]
+    started_at = datetime.now().isoformat()
+    redis_client = redis.Redis(host=args.redis_host, port=args.redis_port)
+    results = []
+    try:
+        async with app_clients(args) as clients:
+            first = next(iter(clients.values()))
+            slugs = await seed_urls(first, args.urls, run_id)
+            probe = Probe(first, redis_client)
+            for scenario in scenarios:
+                # Only redirects differ between the in-process variants
+                names = list(clients) if "redirect" in scenario.mix or scenario.replay else list(clients)[:1]
+                for variant in names:
+                    result = await run_scenario(clients[variant], probe, scenario, variant, slugs, args, run_id)
+                    print(
+                        f"{scenario.name:<14} {variant:<9} {result['throughput_rps']:>9} rps  "
+                        f"p50 {result['latency']['p50_ms']}ms  p99 {result['latency']['p99_ms']}ms  "
+                        f"errors {result['errors']}",
+                        file=sys.stderr,
+                    )
+                    results.append(result)
+    finally:
+        await redis_client.aclose()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "started_at": started_at,
+            "target": args.base_url or "in-process",
+            "python": platform.python_version(),
+            "args": {key: value for key, value in vars(args).items() if key != "output"},
+        },
+        "scenarios": results,
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="benchmark a running server instead of the app in-process")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--replay", help="also replay a JSONL trace of {method, path, json?, expect?} requests")
+    parser.add_argument("--replay-cache", choices=["warm", "cold"], default="warm")
+    parser.add_argument("--requests", type=int, default=5000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--urls", type=int, default=10000, help="short links seeded before the run")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="slug popularity skew, 0 for uniform")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--settle-s", type=float, default=0.5, help="wait before reading counters after a scenario")
+    parser.add_argument("--compare-fast-redirect", action="store_true",
+                        help="in-process: also run redirect scenarios through FastRedirectMiddleware")
+    parser.add_argument("--admin-token", default=ADMIN_TOKEN, help="X-Admin-Token for the /admin endpoints")
+    parser.add_argument("--redis-host", default=REDIS_HOST)
+    parser.add_argument("--redis-port", type=int, default=REDIS_PORT)
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    result = asyncio.run(main(arguments))
+    if arguments.output:
+        with open(arguments.output, "w") as f:
+            json.dump(result, f, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
@@ -0,0 +1,118 @@
+"""Request plans for the benchmark scenarios: what to send, in which order, and what counts as success."""
+import json
+import math
+import random
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from itertools import accumulate
+
+
+@dataclass
+class Request:
+    kind: str
+    method: str
+    path: str
+    json: dict | None = None
+    expect: tuple[int, ...] = (200,)
+
+
+@dataclass
+class Scenario:
+    """`mix` maps request kinds to their share of the traffic. `cache` is "warm" (every seeded slug
+    requested once before measuring), "cold" (every seeded slug dropped from Redis and L1) or None."""
+
+    name: str
+    mix: dict[str, float]
+    cache: str | None = None
+    replay: list[dict] = field(default_factory=list)
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("redirect_warm", {"redirect": 1.0}, cache="warm"),
+        Scenario("redirect_cold", {"redirect": 1.0}, cache="cold"),
+        Scenario("shorten", {"shorten": 1.0}),
+        Scenario("stats", {"stats_top": 0.5, "stats_slug": 0.5}, cache="warm"),
+        Scenario("mixed", {"redirect": 0.9, "shorten": 0.05, "stats_top": 0.03, "stats_slug": 0.02}, cache="warm"),
+    )
+}
+
+
+class ZipfSampler:
+    """Picks ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s.
+
+    s = 0 is uniform; around 1 a few slugs take most of the traffic, as with real short links.
+    """
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self._cdf = list(accumulate(1 / (rank + 1) ** s for rank in range(n)))
+        self._rng = rng
+
+    def sample(self) -> int:
+        return bisect_left(self._cdf, self._rng.random() * self._cdf[-1])
+
+
+def build_plan(
+    scenario: Scenario, slugs: list[str], count: int, zipf_s: float, seed: int, run_id: str
+) -> list[Request]:
+    """The `count` requests of one scenario, generated up front so that generation is not timed."""
+    rng = random.Random(seed)
+    zipf = ZipfSampler(len(slugs), zipf_s, rng)
+    if scenario.replay:
+        # The trace is repeated if it is shorter than `count`
+        return [_replayed(scenario.replay[i % len(scenario.replay)], slugs[zipf.sample()]) for i in range(count)]
+
+    kinds = list(scenario.mix)
+    weights = list(scenario.mix.values())
+    plan = []
+    for i in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        slug = slugs[zipf.sample()]
+        if kind == "redirect":
+            plan.append(Request(kind, "GET", f"/{slug}", expect=(307,)))
+        elif kind == "shorten":
+            plan.append(Request(kind, "POST", "/shorten", json={"long_url": f"https://bench.example/{run_id}/new/{i}"}))
+        elif kind == "stats_top":
+            plan.append(Request(kind, "GET", "/stats?limit=10"))
+        elif kind == "stats_slug":
+            # A slug without flushed visits yet is a valid 404
+            plan.append(Request(kind, "GET", f"/stats/{slug}", expect=(200, 404)))
+        else:
+            raise ValueError(f"Unknown request kind '{kind}'")
+    return plan
+
+
+def _replayed(entry: dict, slug: str) -> Request:
+    return Request(
+        kind=entry.get("kind", "replay"),
+        method=entry["method"].upper(),
+        path=entry["path"].replace("{slug}", slug),
+        json=entry.get("json"),
+        expect=tuple(entry.get("expect", (200, 307))),
+    )
+
+
+def load_replay(path: str) -> Scenario:
+    """A scenario replaying a JSONL trace of `{"method", "path", "json"?, "expect"?, "kind"?}` lines.
+
+    `{slug}` in a path is replaced with a Zipf-distributed seeded slug.
+    """
+    entries = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "method" not in entry or "path" not in entry:
+                raise ValueError(f"{path}:{number} is not an HTTP request (needs 'method' and 'path')")
+            entries.append(entry)
+    return Scenario("replay", {}, replay=entries)
+
+
+def percentile(sorted_values: list[float], p: float) -> float | None:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
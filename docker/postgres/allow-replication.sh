@@ -0,0 +1,4 @@
+#!/bin/bash
+# Runs once when the primary's data directory is initialised: let db_replica stream WAL
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"